@@ -0,0 +1,12 @@
+"""
+pytest 共用夾具
+"""
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def jieba_ready():
+    """整個測試會話只載入一次 jieba 詞典，各測試只需按需 patch jieba.cut"""
+    from process_data import DataProcessor
+    DataProcessor.pre_warm()
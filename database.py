@@ -4,25 +4,236 @@ Supabase 數據庫連接和操作模組
 """
 
 import os
+import re
+import json
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, TYPE_CHECKING
+import threading
+from typing import List, Dict, Set, Any, Optional, Tuple, Callable, TYPE_CHECKING
 from datetime import datetime, timezone
-from dataclasses import asdict
+from dataclasses import fields
+from concurrent.futures import ThreadPoolExecutor
 
 if TYPE_CHECKING:
     from scraper import ThreadsPost
 
-from supabase import create_client, Client
+import httpx
+from cachetools import LRUCache, TTLCache
+from postgrest.exceptions import APIError
+from postgrest.types import CountMethod, ReturnMethod
+from retry.api import retry_call
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依賴
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # 載入環境變數
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 每次 upsert 請求的最大行數，過大會觸及 PostgREST 請求體上限，過小則浪費往返
+BATCH_SIZE = int(os.getenv('SUPABASE_UPSERT_BATCH', '500'))
+# 並發提交 upsert 分塊的最大線程數
+UPSERT_WORKERS = int(os.getenv('SUPABASE_UPSERT_WORKERS', '8'))
+# IN (...) 查詢每次最多攜帶的ID數，避免查詢字串超過 URL 長度限制
+IN_QUERY_CHUNK = 500
+# 已知存在的貼文ID本地緩存，重複輪詢時可省去數據庫往返
+EXISTING_ID_CACHE_SIZE = int(os.getenv('SUPABASE_ID_CACHE_SIZE', '100000'))
+EXISTING_ID_CACHE_TTL = int(os.getenv('SUPABASE_ID_CACHE_TTL', '3600'))
+# 已轉換行數據的緩存大小（同一次抓取的貼文重複提交時免去再次轉換）
+ROW_CACHE_SIZE = int(os.getenv('SUPABASE_ROW_CACHE_SIZE', '8192'))
+# 按用戶查詢貼文的短期緩存，重複輪詢同一帳號時免去查詢
+USER_POSTS_CACHE_SIZE = int(os.getenv('SUPABASE_USER_CACHE_SIZE', '1024'))
+USER_POSTS_CACHE_TTL = int(os.getenv('SUPABASE_USER_CACHE_TTL', '60'))
+
+# 超過此行數且配置了 DATABASE_URL 時，改用 asyncpg COPY 直連寫入
+COPY_THRESHOLD = int(os.getenv('SUPABASE_COPY_THRESHOLD', '1000'))
+# raw_posts 中由爬蟲寫入的欄位（順序即 COPY 的欄位順序）
+RAW_POST_COLUMNS = (
+    'post_id', 'username', 'content', 'timestamp', 'likes', 'replies',
+    'reposts', 'images', 'post_url', 'scraped_at'
+)
+
+# 分塊行數達到此值時以 orjson 序列化並直接調用 bulk_upsert_posts / bulk_insert_new_posts RPC，繞過 SDK 的 json 編碼
+RAW_UPSERT_THRESHOLD = int(os.getenv('SUPABASE_RAW_UPSERT_THRESHOLD', '200'))
+# raw_posts 欄位 -> bulk_upsert_posts 的陣列參數名
+BULK_UPSERT_PARAMS = {
+    'post_id': 'p_post_ids',
+    'username': 'p_usernames',
+    'content': 'p_contents',
+    'timestamp': 'p_timestamps',
+    'likes': 'p_likes',
+    'replies': 'p_replies',
+    'reposts': 'p_reposts',
+    'images': 'p_images',
+    'post_url': 'p_post_urls',
+    'scraped_at': 'p_scraped_ats'
+}
+
+# 暫時性錯誤（連接失敗、超時、429/5xx）的重試配置：指數退避加隨機抖動
+RETRY_ATTEMPTS = int(os.getenv('SUPABASE_RETRY_ATTEMPTS', '4'))
+RETRY_DELAY = float(os.getenv('SUPABASE_RETRY_DELAY', '1'))
+RETRY_MAX_DELAY = float(os.getenv('SUPABASE_RETRY_MAX_DELAY', '10'))
+_TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 共享 HTTP 連接池配置
+MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', '120'))
+MAX_KEEPALIVE = int(os.getenv('SUPABASE_MAX_KEEPALIVE', '80'))
+# 寫入使用獨立的小連接池，批量寫入高峰不會佔滿讀取連接
+WRITE_MAX_CONNECTIONS = int(os.getenv('SUPABASE_WRITE_MAX_CONNECTIONS', '8'))
+HTTP_TIMEOUT = float(os.getenv('SUPABASE_HTTP_TIMEOUT', '30'))
+
+# 已是 UTC ISO 8601 格式的時間戳，可跳過解析
+_ISO_UTC_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(\+00:00|Z)$')
+
+
+def _norm_ts(value: Any) -> Any:
+    """
+    將時間戳統一為 ISO 8601 字串（'Z' 轉為 '+00:00'）
+    
+    常見的 UTC 字串只做後綴替換，不經過 datetime 解析
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if not isinstance(value, str):
+        return value
+    if _ISO_UTC_RE.match(value):
+        return value if value.endswith('+00:00') else value[:-1] + '+00:00'
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+
+
+def _post_to_row(post: 'ThreadsPost') -> Dict[str, Any]:
+    """
+    將 ThreadsPost 轉換為 raw_posts 表的行數據
+    
+    使用淺拷貝代替 asdict()：後者會遞歸深拷貝 images 列表，而這裡只會整體替換該欄位；
+    ThreadsPost 使用 __slots__ 沒有 __dict__，因此按欄位逐一取值
+    """
+    row = {f.name: getattr(post, f.name) for f in fields(post)}
+    # 圖片列表以 JSONB 格式存儲
+    row['images'] = row['images'] or []
+    # 確保時間戳格式正確
+    row['timestamp'] = _norm_ts(row['timestamp'])
+    row['scraped_at'] = _norm_ts(row['scraped_at'])
+    return row
+
+
+class TransientDatabaseError(Exception):
+    """可重試的暫時性數據庫錯誤"""
+
+
+def _is_transient(error: Exception) -> bool:
+    """判斷錯誤是否為值得重試的暫時性錯誤"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in _TRANSIENT_STATUS_CODES
+    if isinstance(error, APIError):
+        # 非 JSON 錯誤響應（如網關 502）的 code 為 HTTP 狀態碼
+        try:
+            return int(error.code) in _TRANSIENT_STATUS_CODES
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _is_missing_rpc(error: Exception) -> bool:
+    """判斷錯誤是否因 RPC 函數尚未部署（PostgREST 404 / PGRST202，或 Postgres 42883）"""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    response = error.response
+    return response.status_code == 404 or any(
+        code in response.text for code in ('PGRST202', '42883')
+    )
+
+
+def _call_with_retry(func: Callable[..., Any], *args) -> Any:
+    """
+    執行數據庫請求，遇到暫時性錯誤時以指數退避重試
+    
+    非暫時性錯誤（如數據違反約束）直接拋出，不做重試
+    """
+    def attempt():
+        try:
+            return func(*args)
+        except Exception as e:
+            if _is_transient(e):
+                raise TransientDatabaseError(str(e)) from e
+            raise
+    
+    return retry_call(
+        attempt,
+        exceptions=TransientDatabaseError,
+        tries=RETRY_ATTEMPTS,
+        delay=RETRY_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        backoff=2,
+        jitter=(0, RETRY_DELAY),
+        logger=logger
+    )
+
+
+def _chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """將列表按固定大小切分"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _build_http_client(max_connections: int, max_keepalive: int) -> httpx.Client:
+    """
+    建立長連接的 httpx 客戶端，同一連接池內的請求共用 TCP/TLS 連接
+    
+    安裝了 h2 時啟用 HTTP/2，多個並發請求復用同一連接
+    """
+    return httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=300.0
+        ),
+        timeout=HTTP_TIMEOUT
+    )
+
+
 class SupabaseManager:
     """Supabase 數據庫管理器"""
     
+    _instance: Optional['SupabaseManager'] = None
+    _instance_lock = threading.Lock()
+    
+    @classmethod
+    def instance(cls) -> 'SupabaseManager':
+        """
+        獲取進程內共享的數據庫管理器（首次調用時才建立客戶端）
+        
+        所有調用方共用同一個客戶端與 HTTP 連接池，避免重複建立連接
+        
+        Returns:
+            SupabaseManager: 共享實例
+        """
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
     def __init__(self):
         self.url = os.getenv('SUPABASE_URL')
         self.key = os.getenv('SUPABASE_KEY')
@@ -30,8 +241,37 @@ class SupabaseManager:
         if not self.url or not self.key:
             raise ValueError("SUPABASE_URL 和 SUPABASE_KEY 環境變數必須設置")
         
+        # 可選的 Postgres 直連字串（Supavisor session 模式），用於大批量 COPY 寫入
+        self.database_url = os.getenv('DATABASE_URL')
+        
+        # 已知存在的貼文ID緩存（TTLCache 本身非線程安全，需配合鎖使用）
+        self._existing_cache = TTLCache(maxsize=EXISTING_ID_CACHE_SIZE, ttl=EXISTING_ID_CACHE_TTL)
+        # (username, limit) -> 貼文列表
+        self._user_cache = TTLCache(maxsize=USER_POSTS_CACHE_SIZE, ttl=USER_POSTS_CACHE_TTL)
+        # (post_id, scraped_at) -> 行數據
+        self._row_cache = LRUCache(maxsize=ROW_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+        # 未部署的批量寫入 RPC，發現後本進程內不再嘗試
+        self._missing_rpcs: Set[str] = set()
+        
+        # 可選的只讀副本地址，未配置時讀取也走主庫
+        self.read_url = os.getenv('SUPABASE_READ_URL') or self.url
+        
+        # 寫入與讀取分開連接池；寫入池同時供直接 PostgREST 請求使用
+        self._http = _build_http_client(WRITE_MAX_CONNECTIONS, WRITE_MAX_CONNECTIONS)
+        self._read_http = _build_http_client(MAX_CONNECTIONS, MAX_KEEPALIVE)
+        
         try:
-            self.client: Client = create_client(self.url, self.key)
+            self.client: Client = create_client(
+                self.url,
+                self.key,
+                options=ClientOptions(httpx_client=self._http)
+            )
+            self.read_client: Client = create_client(
+                self.read_url,
+                self.key,
+                options=ClientOptions(httpx_client=self._read_http)
+            )
             logger.info("Supabase 客戶端初始化成功")
         except Exception as e:
             logger.error(f"Supabase 客戶端初始化失敗: {e}")
@@ -49,33 +289,23 @@ class SupabaseManager:
         """
         try:
             # 轉換 ThreadsPost 為字典
-            post_data = asdict(post)
-            
-            # 轉換圖片列表為 JSONB 格式
-            post_data['images'] = post_data['images'] if post_data['images'] else []
-            
-            # 確保時間戳格式正確
-            if isinstance(post_data['timestamp'], str):
-                post_data['timestamp'] = datetime.fromisoformat(
-                    post_data['timestamp'].replace('Z', '+00:00')
-                ).isoformat()
+            post_data = self._row_for(post)
             
-            if isinstance(post_data['scraped_at'], str):
-                post_data['scraped_at'] = datetime.fromisoformat(
-                    post_data['scraped_at'].replace('Z', '+00:00')
-                ).isoformat()
-            
-            # 執行插入操作（使用 upsert 避免重複）
+            # 執行插入操作（使用 upsert 避免重複；不回傳行數據，只取計數）
             result = self.client.table('raw_posts').upsert(
                 post_data,
-                on_conflict='post_id'
+                on_conflict='post_id',
+                returning=ReturnMethod.minimal,
+                count=CountMethod.exact
             ).execute()
+            self._invalidate_user_posts({post.username})
             
-            if result.data:
+            if result.count:
+                self._remember_existing([post.post_id])
                 logger.debug(f"成功插入/更新貼文: {post.post_id}")
                 return True
             else:
-                logger.warning(f"插入貼文失敗，無數據返回: {post.post_id}")
+                logger.warning(f"插入貼文失敗，沒有寫入任何行: {post.post_id}")
                 return False
                 
         except Exception as e:
@@ -100,84 +330,412 @@ class SupabaseManager:
             return {'success': 0, 'failure': 0}
         
         # 轉換所有貼文為字典格式
-        posts_data = []
+        posts_data, failure_count = self._posts_to_rows(posts)
+        
+        # 大批量數據優先走 COPY 直連路徑，失敗時回退到 PostgREST
+        if posts_data and self._copy_enabled(len(posts_data)):
+            try:
+                copied = self._copy_upsert(posts_data)
+                self._remember_existing(row['post_id'] for row in posts_data)
+                self._invalidate_user_posts({row['username'] for row in posts_data})
+                logger.info(f"COPY 批量寫入成功: {copied} 篇貼文")
+                return {
+                    'success': copied,
+                    'failure': failure_count
+                }
+            except Exception as e:
+                logger.warning(f"COPY 批量寫入失敗，改用 PostgREST: {e}")
+        
+        # 分塊批量插入數據，多於一塊時並發提交
+        chunks = _chunked(posts_data, BATCH_SIZE)
+        results = self._map_concurrent(self._upsert_chunk, chunks, range(1, len(chunks) + 1))
+        
+        for chunk_success, chunk_failure in results:
+            success_count += chunk_success
+            failure_count += chunk_failure
+        
+        self._invalidate_user_posts({row['username'] for row in posts_data})
+        
+        if success_count:
+            logger.info(f"批量插入成功: {success_count} 篇貼文")
+        
+        return {
+            'success': success_count,
+            'failure': failure_count
+        }
+    
+    def insert_new_posts_only(self, posts: List['ThreadsPost']) -> Dict[str, int]:
+        """
+        只插入數據庫中尚不存在的貼文，已存在的貼文保持不變
+        
+        去重由數據庫的 ON CONFLICT DO NOTHING 完成，調用前無需再查詢已存在的ID；
+        本地緩存中已確認存在的貼文（重複抓取的常見情況）直接跳過，不發送請求
+        
+        Args:
+            posts: ThreadsPost 列表
+            
+        Returns:
+            Dict: 包含成功（新插入）、失敗和跳過（已存在）計數的字典
+        """
+        if not posts:
+            logger.warning("沒有貼文需要插入")
+            return {'success': 0, 'failure': 0, 'skipped': 0}
+        
+        with self._cache_lock:
+            unknown_posts = [post for post in posts if post.post_id not in self._existing_cache]
+        cached_skips = len(posts) - len(unknown_posts)
+        
+        if not unknown_posts:
+            logger.info(f"插入新貼文: {cached_skips} 篇均已存在（緩存命中），無需寫入")
+            return {'success': 0, 'failure': 0, 'skipped': cached_skips}
+        
+        posts_data, failure_count = self._posts_to_rows(unknown_posts)
+        
+        # 大批量數據優先走 COPY 直連路徑（ON CONFLICT DO NOTHING），失敗時回退到 PostgREST
+        if posts_data and self._copy_enabled(len(posts_data)):
+            try:
+                new_count = self._copy_upsert(posts_data, ignore_duplicates=True)
+                self._remember_existing(row['post_id'] for row in posts_data)
+                if new_count:
+                    self._invalidate_user_posts({row['username'] for row in posts_data})
+                skipped_count = len(posts_data) - new_count + cached_skips
+                logger.info(f"COPY 插入新貼文: 新增 {new_count}, 失敗 {failure_count}, 已存在 {skipped_count}")
+                return {
+                    'success': new_count,
+                    'failure': failure_count,
+                    'skipped': skipped_count
+                }
+            except Exception as e:
+                logger.warning(f"COPY 批量寫入失敗，改用 PostgREST: {e}")
+        
+        chunks = _chunked(posts_data, BATCH_SIZE)
+        results = self._map_concurrent(
+            self._upsert_chunk, chunks, range(1, len(chunks) + 1), [True] * len(chunks)
+        )
+        
+        new_count = sum(chunk_success for chunk_success, _ in results)
+        write_failures = sum(chunk_failure for _, chunk_failure in results)
+        skipped_count = len(posts_data) - new_count - write_failures + cached_skips
+        
+        if new_count:
+            self._invalidate_user_posts({row['username'] for row in posts_data})
+        
+        logger.info(f"插入新貼文: 新增 {new_count}, 失敗 {failure_count + write_failures}, 已存在 {skipped_count}")
+        return {
+            'success': new_count,
+            'failure': failure_count + write_failures,
+            'skipped': skipped_count
+        }
+    
+    def _row_for(self, post: 'ThreadsPost') -> Dict[str, Any]:
+        """
+        獲取貼文的行數據，同一次抓取（post_id + scraped_at 相同）的貼文只轉換一次
+        
+        返回的字典在緩存中共享，調用方不應修改
+        """
+        key = (post.post_id, post.scraped_at)
+        with self._cache_lock:
+            row = self._row_cache.get(key)
+        if row is None:
+            row = _post_to_row(post)
+            with self._cache_lock:
+                self._row_cache[key] = row
+        return row
+    
+    def _posts_to_rows(self, posts: List['ThreadsPost']) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        轉換貼文為行數據，跳過無法轉換的貼文
+        
+        Returns:
+            Tuple: (行數據列表, 轉換失敗數)
+        """
+        rows = []
+        failure_count = 0
         for post in posts:
             try:
-                post_data = asdict(post)
-                
-                # 處理圖片列表
-                post_data['images'] = post_data['images'] if post_data['images'] else []
-                
-                # 處理時間格式
-                if isinstance(post_data['timestamp'], str):
-                    post_data['timestamp'] = datetime.fromisoformat(
-                        post_data['timestamp'].replace('Z', '+00:00')
-                    ).isoformat()
-                
-                if isinstance(post_data['scraped_at'], str):
-                    post_data['scraped_at'] = datetime.fromisoformat(
-                        post_data['scraped_at'].replace('Z', '+00:00')
-                    ).isoformat()
-                
-                posts_data.append(post_data)
-                
+                rows.append(self._row_for(post))
             except Exception as e:
                 logger.error(f"處理貼文 {post.post_id} 數據失敗: {e}")
                 failure_count += 1
-                continue
+        return rows, failure_count
+    
+    def _copy_enabled(self, row_count: int) -> bool:
+        """是否對這批數據使用 asyncpg COPY 路徑"""
+        return ASYNCPG_AVAILABLE and bool(self.database_url) and row_count >= COPY_THRESHOLD
+    
+    @staticmethod
+    def _copy_records(posts_data: List[Dict[str, Any]]) -> List[tuple]:
+        """將行數據轉換為 COPY 所需的元組（時間戳為 datetime，JSONB 為文本）"""
+        records = []
+        for row in posts_data:
+            record = []
+            for column in RAW_POST_COLUMNS:
+                value = row.get(column)
+                if column in ('timestamp', 'scraped_at') and isinstance(value, str):
+                    value = datetime.fromisoformat(value)
+                elif column == 'images':
+                    value = json.dumps(value or [], ensure_ascii=False)
+                record.append(value)
+            records.append(tuple(record))
+        return records
+    
+    def _copy_upsert(self, posts_data: List[Dict[str, Any]],
+                     ignore_duplicates: bool = False) -> int:
+        """
+        通過 asyncpg 以 COPY 寫入臨時表，再合併到 raw_posts
         
-        # 批量插入數據
+        Args:
+            posts_data: 已轉換為字典的貼文數據
+            ignore_duplicates: 為 True 時已存在的貼文保持不變，返回值只計新插入的行
+            
+        Returns:
+            int: 寫入或更新的行數
+        """
+        coro = self._copy_upsert_async(self._copy_records(posts_data), ignore_duplicates)
         try:
-            if posts_data:
-                result = self.client.table('raw_posts').upsert(
-                    posts_data,
-                    on_conflict='post_id'
-                ).execute()
-                
-                if result.data:
-                    success_count = len(result.data)
-                    logger.info(f"批量插入成功: {success_count} 篇貼文")
-                else:
-                    logger.warning("批量插入失敗，無數據返回")
-                    failure_count += len(posts_data)
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        
+        # 調用方已有運行中的事件循環（異步調度器、notebook）時 asyncio.run 會拋錯，改在工作線程中執行
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coro).result()
+    
+    async def _copy_upsert_async(self, records: List[tuple],
+                                 ignore_duplicates: bool = False) -> int:
+        """COPY 寫入的異步實現"""
+        columns = ', '.join(RAW_POST_COLUMNS)
+        if ignore_duplicates:
+            on_conflict = "DO NOTHING"
+        else:
+            updates = ', '.join(
+                f"{column} = EXCLUDED.{column}" for column in RAW_POST_COLUMNS if column != 'post_id'
+            )
+            on_conflict = f"DO UPDATE SET {updates}, updated_at = NOW()"
+        
+        # 經 Supavisor 連接池連接時需關閉預處理語句緩存
+        conn = await asyncpg.connect(self.database_url, statement_cache_size=0)
+        try:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE raw_posts_staging "
+                    f"ON COMMIT DROP AS SELECT {columns} FROM raw_posts WITH NO DATA"
+                )
+                await conn.copy_records_to_table(
+                    'raw_posts_staging',
+                    records=records,
+                    columns=list(RAW_POST_COLUMNS)
+                )
+                status = await conn.execute(
+                    f"INSERT INTO raw_posts ({columns}) "
+                    f"SELECT DISTINCT ON (post_id) {columns} FROM raw_posts_staging "
+                    f"ON CONFLICT (post_id) {on_conflict}"
+                )
+        finally:
+            await conn.close()
+        
+        # 狀態字串形如 "INSERT 0 1234"
+        return int(status.split()[-1])
+    
+    def _map_concurrent(self, func: Callable[..., Any], *iterables) -> List[Any]:
+        """
+        以有界線程池並發執行互相獨立的請求，結果順序與輸入一致
+        
+        supabase 客戶端底層的 httpx 連接池是線程安全的，多個請求的往返延遲可以重疊；
+        只有一個任務時直接在當前線程執行，避免建立線程池的開銷
+        
+        Args:
+            func: 對每組參數執行的函數
+            *iterables: 傳給 func 的參數序列（同 map）
+            
+        Returns:
+            List: 每次調用的結果
+        """
+        args = list(zip(*iterables))
+        if len(args) <= 1 or UPSERT_WORKERS <= 1:
+            return [func(*a) for a in args]
+        
+        with ThreadPoolExecutor(max_workers=min(UPSERT_WORKERS, len(args))) as executor:
+            return list(executor.map(lambda a: func(*a), args))
+    
+    def _upsert_chunk(self, chunk: List[Dict[str, Any]], chunk_no: int,
+                      ignore_duplicates: bool = False) -> Tuple[int, int]:
+        """
+        upsert 單個分塊到 raw_posts 表
+        
+        暫時性錯誤會自動重試；其他錯誤改為逐行寫入，只丟棄有問題的行
+        
+        Args:
+            chunk: 已轉換為字典的貼文數據
+            chunk_no: 分塊序號（僅用於日誌）
+            ignore_duplicates: 為 True 時已存在的貼文保持不變，成功數只計新插入的行
+            
+        Returns:
+            Tuple: (成功數, 失敗數)
+        """
+        try:
+            return _call_with_retry(self._write_chunk, chunk, ignore_duplicates)
+            
+        except TransientDatabaseError as e:
+            logger.error(f"批量插入失敗，重試 {RETRY_ATTEMPTS} 次後放棄 (第 {chunk_no} 塊): {e}")
+            return 0, len(chunk)
             
         except Exception as e:
-            logger.error(f"批量插入失敗: {e}")
-            failure_count += len(posts_data)
+            if len(chunk) == 1:
+                logger.error(f"插入貼文 {chunk[0].get('post_id')} 失敗: {e}")
+                return 0, 1
+            
+            logger.warning(f"批量插入失敗，改為逐行寫入 (第 {chunk_no} 塊): {e}")
+            success_count = 0
+            failure_count = 0
+            for row in chunk:
+                row_success, row_failure = self._upsert_chunk([row], chunk_no, ignore_duplicates)
+                success_count += row_success
+                failure_count += row_failure
+            return success_count, failure_count
+    
+    def _write_chunk(self, chunk: List[Dict[str, Any]],
+                     ignore_duplicates: bool = False) -> Tuple[int, int]:
+        """執行單次分塊 upsert 請求，錯誤直接拋出"""
+        rpc = 'bulk_insert_new_posts' if ignore_duplicates else 'bulk_upsert_posts'
+        if ORJSON_AVAILABLE and len(chunk) >= RAW_UPSERT_THRESHOLD and rpc not in self._missing_rpcs:
+            try:
+                affected = self._raw_upsert(chunk, rpc)
+                self._remember_existing(row['post_id'] for row in chunk)
+                return affected, 0
+            except httpx.HTTPStatusError as e:
+                if not _is_missing_rpc(e):
+                    raise
+                # 函數尚未部署：本進程內停用該 RPC，此分塊改走 SDK upsert
+                self._missing_rpcs.add(rpc)
+                logger.warning(f"RPC {rpc} 不存在，改用 SDK upsert（請執行 database_schema.sql）")
         
-        return {
-            'success': success_count,
-            'failure': failure_count
+        if ignore_duplicates:
+            # ON CONFLICT DO NOTHING：計數只包含真正新插入的行，0 也是正常結果
+            result = self.client.table('raw_posts').upsert(
+                chunk,
+                on_conflict='post_id',
+                ignore_duplicates=True,
+                returning=ReturnMethod.minimal,
+                count=CountMethod.exact
+            ).execute()
+            self._remember_existing(row['post_id'] for row in chunk)
+            return result.count or 0, 0
+        
+        # return=minimal 省去回傳整批行數據，成功行數從 Content-Range 計數取得
+        result = self.client.table('raw_posts').upsert(
+            chunk,
+            on_conflict='post_id',
+            returning=ReturnMethod.minimal,
+            count=CountMethod.exact
+        ).execute()
+        
+        affected = result.count or 0
+        if affected:
+            self._remember_existing(row['post_id'] for row in chunk)
+            return affected, len(chunk) - affected
+        
+        logger.warning(f"批量插入失敗，沒有寫入任何行 ({len(chunk)} 篇貼文)")
+        return 0, len(chunk)
+    
+    @staticmethod
+    def _soa_payload(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """
+        將行數據轉置為 bulk_upsert_posts 的列陣列參數
+        
+        每個欄位名只出現一次，請求體約為逐行格式的一半；images 轉為 JSON 文本
+        """
+        payload = {
+            param: [row[column] for row in rows]
+            for column, param in BULK_UPSERT_PARAMS.items()
         }
+        payload['p_images'] = [orjson.dumps(images or []).decode() for images in payload['p_images']]
+        return payload
     
-    def get_existing_post_ids(self, post_ids: List[str]) -> List[str]:
+    def _raw_upsert(self, rows: List[Dict[str, Any]], rpc: str = 'bulk_upsert_posts') -> int:
+        """
+        以 orjson 序列化列陣列參數，直接 POST 到 bulk_upsert_posts RPC
+        
+        中文內容較多時 orjson 比標準庫 json 快數倍，且輸出 UTF-8 不做轉義
+        
+        Args:
+            rows: 已轉換為字典的貼文數據
+            rpc: 調用的函數名；bulk_insert_new_posts 時已存在的貼文保持不變
+            
+        Returns:
+            int: 寫入或更新的行數（bulk_insert_new_posts 只計新插入的行）
+        """
+        response = self._http.post(
+            f"{self.url}/rest/v1/rpc/{rpc}",
+            content=orjson.dumps(self._soa_payload(rows)),
+            headers={
+                'apikey': self.key,
+                'Authorization': f"Bearer {self.key}",
+                'Content-Type': 'application/json'
+            }
+        )
+        response.raise_for_status()
+        return int(orjson.loads(response.content) or 0)
+    
+    def _remember_existing(self, post_ids) -> None:
+        """將確認存在的貼文ID寫入本地緩存"""
+        with self._cache_lock:
+            for post_id in post_ids:
+                self._existing_cache[post_id] = True
+    
+    def _fetch_existing_chunk(self, post_ids: List[str]) -> Set[str]:
+        """查詢單個分塊中已存在的貼文ID"""
+        result = self.client.table('raw_posts').select('post_id').in_(
+            'post_id', post_ids
+        ).execute()
+        return {row['post_id'] for row in (result.data or [])}
+    
+    def _invalidate_user_posts(self, usernames: Set[str]) -> None:
+        """寫入後移除受影響用戶的貼文查詢緩存"""
+        with self._cache_lock:
+            for key in [key for key in self._user_cache.keys() if key[0] in usernames]:
+                self._user_cache.pop(key, None)
+    
+    def get_existing_post_ids(self, post_ids: List[str]) -> Set[str]:
         """
         檢查哪些貼文ID已經存在於數據庫中
         
+        已緩存的ID直接命中，只有未知的ID才會查詢數據庫
+        
         Args:
             post_ids: 要檢查的貼文ID列表
             
         Returns:
-            List[str]: 已存在的貼文ID列表
+            Set[str]: 已存在的貼文ID集合
         """
         try:
             if not post_ids:
-                return []
-            
-            result = self.client.table('raw_posts').select('post_id').in_(
-                'post_id', post_ids
-            ).execute()
-            
-            if result.data:
-                existing_ids = [row['post_id'] for row in result.data]
-                logger.debug(f"發現 {len(existing_ids)} 個已存在的貼文ID")
-                return existing_ids
-            
-            return []
+                return set()
+            
+            cached_hits = set()
+            to_query = []
+            with self._cache_lock:
+                for pid in dict.fromkeys(post_ids):
+                    if pid in self._existing_cache:
+                        cached_hits.add(pid)
+                    else:
+                        to_query.append(pid)
+            
+            # 分塊查詢未緩存的ID，多塊時並發發送
+            id_chunks = _chunked(to_query, IN_QUERY_CHUNK)
+            fetched = set()
+            for chunk_ids in self._map_concurrent(self._fetch_existing_chunk, id_chunks):
+                fetched.update(chunk_ids)
+            self._remember_existing(fetched)
+            
+            existing_ids = cached_hits | fetched
+            if existing_ids:
+                logger.debug(f"發現 {len(existing_ids)} 個已存在的貼文ID (緩存命中 {len(cached_hits)})")
+            return existing_ids
             
         except Exception as e:
             logger.error(f"檢查已存在貼文ID失敗: {e}")
-            return []
+            return set()
     
     def get_posts_by_username(self, username: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -190,12 +748,22 @@ class SupabaseManager:
         Returns:
             List[Dict]: 貼文數據列表
         """
+        key = (username, limit)
+        with self._cache_lock:
+            cached = self._user_cache.get(key)
+        if cached is not None:
+            logger.debug(f"用戶 {username} 的貼文命中緩存")
+            return list(cached)
+        
         try:
-            result = self.client.table('raw_posts').select('*').eq(
+            result = self.read_client.table('raw_posts').select('*').eq(
                 'username', username
             ).order('timestamp', desc=True).limit(limit).execute()
             
             if result.data:
+                # 緩存不可變的元組，調用方修改返回的列表不會影響之後的命中
+                with self._cache_lock:
+                    self._user_cache[key] = tuple(result.data)
                 logger.info(f"獲取用戶 {username} 的 {len(result.data)} 篇貼文")
                 return result.data
             
@@ -218,7 +786,7 @@ class SupabaseManager:
             List[Dict]: 貼文數據列表
         """
         try:
-            result = self.client.table('raw_posts').select('*').gte(
+            result = self.read_client.table('raw_posts').select('*').gte(
                 'timestamp', start_date.isoformat()
             ).lte(
                 'timestamp', end_date.isoformat()
@@ -234,6 +802,31 @@ class SupabaseManager:
             logger.error(f"根據日期範圍獲取貼文失敗: {e}")
             return []
     
+    def get_timestamp_range(self) -> Optional[Dict[str, str]]:
+        """
+        獲取貼文時間範圍（單次 RPC 同時取得最早與最新時間）
+        
+        Returns:
+            Optional[Dict]: {'oldest': ..., 'newest': ...}，表為空或失敗時返回 None
+        """
+        try:
+            result = self.read_client.rpc('post_timestamp_range').execute()
+            data = result.data or {}
+            if isinstance(data, list):
+                data = data[0] if data else {}
+            
+            if data.get('oldest') and data.get('newest'):
+                return {
+                    'oldest': data['oldest'],
+                    'newest': data['newest']
+                }
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"獲取貼文時間範圍失敗: {e}")
+            return None
+    
     def get_posts_count(self) -> int:
         """
         獲取數據庫中的貼文總數
@@ -242,8 +835,9 @@ class SupabaseManager:
             int: 貼文總數
         """
         try:
-            result = self.client.table('raw_posts').select(
-                'post_id', count='exact'
+            # head=True 只回傳 Content-Range 計數頭，不傳輸任何行數據
+            result = self.read_client.table('raw_posts').select(
+                'post_id', count='exact', head=True
             ).execute()
             
             count = result.count if result.count is not None else 0
@@ -269,6 +863,11 @@ class SupabaseManager:
                 'post_id', post_id
             ).execute()
             
+            with self._cache_lock:
+                self._existing_cache.pop(post_id, None)
+                # 不知道被刪貼文屬於哪個用戶，直接清空用戶緩存
+                self._user_cache.clear()
+            
             if result.data:
                 logger.info(f"成功刪除貼文: {post_id}")
                 return True
@@ -280,6 +879,43 @@ class SupabaseManager:
             logger.error(f"刪除貼文 {post_id} 失敗: {e}")
             return False
     
+    def delete_posts_batch(self, post_ids: List[str]) -> int:
+        """
+        批量刪除貼文，每個分塊只發送一次 IN (...) 刪除請求
+        
+        Args:
+            post_ids: 要刪除的貼文ID列表
+            
+        Returns:
+            int: 實際刪除的貼文數量
+        """
+        if not post_ids:
+            return 0
+        
+        unique_ids = list(dict.fromkeys(post_ids))
+        id_chunks = _chunked(unique_ids, IN_QUERY_CHUNK)
+        
+        try:
+            deleted = sum(self._map_concurrent(self._delete_chunk, id_chunks))
+        except Exception as e:
+            logger.error(f"批量刪除貼文失敗: {e}")
+            deleted = 0
+        finally:
+            with self._cache_lock:
+                for post_id in unique_ids:
+                    self._existing_cache.pop(post_id, None)
+                self._user_cache.clear()
+        
+        logger.info(f"批量刪除 {deleted} 篇貼文 (請求 {len(unique_ids)} 篇)")
+        return deleted
+    
+    def _delete_chunk(self, post_ids: List[str]) -> int:
+        """刪除單個分塊的貼文，返回刪除數量"""
+        result = self.client.table('raw_posts').delete().in_(
+            'post_id', post_ids
+        ).execute()
+        return len(result.data or [])
+    
     def test_connection(self) -> bool:
         """
         測試數據庫連接
@@ -288,9 +924,9 @@ class SupabaseManager:
             bool: 連接是否成功
         """
         try:
-            # 嘗試執行一個簡單的查詢
-            result = self.client.table('raw_posts').select(
-                'post_id', count='exact'
+            # 嘗試執行一個簡單的 HEAD 查詢（不計數、不回傳行數據）
+            self.read_client.table('raw_posts').select(
+                'post_id', head=True
             ).limit(1).execute()
             
             logger.info("Supabase 連接測試成功")
@@ -333,49 +969,23 @@ class SupabaseManager:
         }
         
         try:
-            # 獲取貼文總數
-            posts_result = self.client.table('raw_posts').select(
-                'post_id', count='exact'
-            ).execute()
-            stats['total_posts'] = posts_result.count or 0
-            
-            # 獲取唯一用戶數
-            users_result = self.client.table('raw_posts').select(
-                'username', count='exact'
-            ).execute()
-            if users_result.data:
-                unique_users = set(row['username'] for row in users_result.data)
-                stats['unique_users'] = len(unique_users)
-            
-            # 獲取總互動數
-            interactions_result = self.client.table('raw_posts').select(
-                'likes, replies, reposts'
-            ).execute()
-            if interactions_result.data:
-                total = sum(
-                    row['likes'] + row['replies'] + row['reposts']
-                    for row in interactions_result.data
-                )
-                stats['total_interactions'] = total
-            
-            # 獲取日期範圍
-            date_result = self.client.table('raw_posts').select(
-                'timestamp'
-            ).order('timestamp', desc=False).limit(1).execute()
-            
-            if date_result.data:
-                oldest = date_result.data[0]['timestamp']
-                
-                latest_result = self.client.table('raw_posts').select(
-                    'timestamp'
-                ).order('timestamp', desc=True).limit(1).execute()
-                
-                if latest_result.data:
-                    newest = latest_result.data[0]['timestamp']
-                    stats['date_range'] = {
-                        'oldest': oldest,
-                        'newest': newest
-                    }
+            # 由數據庫端 stats_summary() 函數一次完成聚合，只回傳單行結果
+            result = self.read_client.rpc('stats_summary').execute()
+            summary = result.data or {}
+            if isinstance(summary, list):
+                summary = summary[0] if summary else {}
+            
+            stats['total_posts'] = summary.get('total_posts') or 0
+            stats['unique_users'] = summary.get('unique_users') or 0
+            stats['total_interactions'] = summary.get('total_interactions') or 0
+            
+            oldest = summary.get('oldest')
+            newest = summary.get('newest')
+            if oldest and newest:
+                stats['date_range'] = {
+                    'oldest': oldest,
+                    'newest': newest
+                }
             
             logger.info(f"數據庫統計: {stats}")
             return stats
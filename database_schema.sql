@@ -151,4 +151,130 @@ SELECT
 FROM processed_keyword_trends
 WHERE date >= CURRENT_DATE - INTERVAL '7 days'
 GROUP BY keyword
-ORDER BY avg_momentum DESC, total_interactions DESC;
\ No newline at end of file
+ORDER BY avg_momentum DESC, total_interactions DESC;
+
+-- RPC 函數：數據庫統計摘要
+-- 在伺服器端一次完成聚合，避免將整張 raw_posts 表傳回客戶端計算
+CREATE OR REPLACE FUNCTION stats_summary()
+RETURNS JSON
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT json_build_object(
+        'total_posts', COUNT(*),
+        'unique_users', COUNT(DISTINCT username),
+        'total_interactions', COALESCE(SUM(COALESCE(likes, 0) + COALESCE(replies, 0) + COALESCE(reposts, 0)), 0),
+        'oldest', MIN(timestamp),
+        'newest', MAX(timestamp)
+    )
+    FROM raw_posts;
+$$;
+
+-- RPC 函數：貼文時間範圍
+-- 一次查詢同時取得最早與最新時間（可利用 idx_raw_posts_timestamp 索引）
+CREATE OR REPLACE FUNCTION post_timestamp_range()
+RETURNS JSON
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT json_build_object(
+        'oldest', MIN(timestamp),
+        'newest', MAX(timestamp)
+    )
+    FROM raw_posts;
+$$;
+
+-- RPC 函數：批量 upsert 原始貼文
+-- 以列陣列（struct-of-arrays）傳參，避免每行重複欄位名稱；images 以 JSON 文本傳入
+CREATE OR REPLACE FUNCTION bulk_upsert_posts(
+    p_post_ids TEXT[],
+    p_usernames TEXT[],
+    p_contents TEXT[],
+    p_timestamps TIMESTAMPTZ[],
+    p_likes INTEGER[],
+    p_replies INTEGER[],
+    p_reposts INTEGER[],
+    p_images TEXT[],
+    p_post_urls TEXT[],
+    p_scraped_ats TIMESTAMPTZ[]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+-- 寫入函數以調用者權限執行，與直接 upsert raw_posts 受同樣的權限和 RLS 限制
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    INSERT INTO raw_posts (
+        post_id, username, content, timestamp, likes, replies,
+        reposts, images, post_url, scraped_at
+    )
+    SELECT DISTINCT ON (u.post_id)
+        u.post_id, u.username, u.content, u.ts, u.likes, u.replies,
+        u.reposts, COALESCE(u.images::jsonb, '[]'::jsonb), u.post_url, u.scraped_at
+    FROM unnest(
+        p_post_ids, p_usernames, p_contents, p_timestamps, p_likes,
+        p_replies, p_reposts, p_images, p_post_urls, p_scraped_ats
+    ) AS u(post_id, username, content, ts, likes, replies, reposts, images, post_url, scraped_at)
+    ON CONFLICT (post_id) DO UPDATE SET
+        username = EXCLUDED.username,
+        content = EXCLUDED.content,
+        timestamp = EXCLUDED.timestamp,
+        likes = EXCLUDED.likes,
+        replies = EXCLUDED.replies,
+        reposts = EXCLUDED.reposts,
+        images = EXCLUDED.images,
+        post_url = EXCLUDED.post_url,
+        scraped_at = EXCLUDED.scraped_at,
+        updated_at = NOW();
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+-- RPC 函數：批量插入新貼文，已存在的貼文保持不變（ON CONFLICT DO NOTHING）
+-- 參數與 bulk_upsert_posts 相同，返回值只計真正新插入的行
+CREATE OR REPLACE FUNCTION bulk_insert_new_posts(
+    p_post_ids TEXT[],
+    p_usernames TEXT[],
+    p_contents TEXT[],
+    p_timestamps TIMESTAMPTZ[],
+    p_likes INTEGER[],
+    p_replies INTEGER[],
+    p_reposts INTEGER[],
+    p_images TEXT[],
+    p_post_urls TEXT[],
+    p_scraped_ats TIMESTAMPTZ[]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    INSERT INTO raw_posts (
+        post_id, username, content, timestamp, likes, replies,
+        reposts, images, post_url, scraped_at
+    )
+    SELECT DISTINCT ON (u.post_id)
+        u.post_id, u.username, u.content, u.ts, u.likes, u.replies,
+        u.reposts, COALESCE(u.images::jsonb, '[]'::jsonb), u.post_url, u.scraped_at
+    FROM unnest(
+        p_post_ids, p_usernames, p_contents, p_timestamps, p_likes,
+        p_replies, p_reposts, p_images, p_post_urls, p_scraped_ats
+    ) AS u(post_id, username, content, ts, likes, replies, reposts, images, post_url, scraped_at)
+    ON CONFLICT (post_id) DO NOTHING;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
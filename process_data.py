@@ -3,29 +3,46 @@ Threads 數據處理腳本
 從 Supabase 讀取原始數據，進行分析處理，並將結果存回數據庫
 """
 
+import hashlib
 import logging
+import math
 import os
 import re
+import sqlite3
 import jieba
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Sequence
 from collections import defaultdict, Counter
+from contextlib import closing
 from dataclasses import dataclass
+from functools import lru_cache
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
 import warnings
 
 # 機器學習和NLP相關
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-from sklearn.cluster import KMeans
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.decomposition import LatentDirichletAllocation
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.utils import murmurhash3_32
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
 from nltk.corpus import stopwords
 
+# 可選：numba 編譯指標計算核心
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    prange = range
+    NUMBA_AVAILABLE = False
+
 # 自定義模組
-from database import SupabaseManager
+from database import SupabaseManager, BATCH_SIZE
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -53,7 +70,361 @@ try:
 except Exception as e:
     logger.warning(f"NLTK數據下載失敗: {e}")
 
-@dataclass
+# 分詞並行化設定：待分詞文本數達到門檻才啟用進程池
+TOKENIZE_PARALLEL_MIN = int(os.getenv('TOKENIZE_PARALLEL_MIN', '2000'))
+TOKENIZE_WORKERS = int(os.getenv('TOKENIZE_WORKERS', str(os.cpu_count() or 1)))
+TOKENIZE_CHUNKSIZE = 64
+
+# 情感分析並行化設定：貼文數達到門檻才以進程池分批計算，每批 SENTIMENT_BATCH_SIZE 篇
+SENTIMENT_PARALLEL_MIN = int(os.getenv('SENTIMENT_PARALLEL_MIN', '2000'))
+SENTIMENT_WORKERS = int(os.getenv('SENTIMENT_WORKERS', str(TOKENIZE_WORKERS)))
+SENTIMENT_BATCH_SIZE = 64
+
+# 各聚類摘要計算的執行緒數（1 表示依序計算）
+CLUSTER_WORKERS = int(os.getenv('CLUSTER_WORKERS', str(min(8, os.cpu_count() or 1))))
+
+# 批次主題聚類的進程數（各數據框互不依賴，每個進程處理一個）
+CLUSTER_BATCH_WORKERS = int(os.getenv('CLUSTER_BATCH_WORKERS', str(os.cpu_count() or 1)))
+
+# 互動數欄位
+INTERACTION_COLUMNS = ('likes', 'replies', 'reposts')
+
+# 關鍵詞只保留純中英文詞（同時排除數字）
+_KEYWORD_RE = re.compile(r'[a-zA-Z\u4e00-\u9fff]+')
+
+# 子進程中使用的停用詞表，由 _init_tokenize_worker 設置
+_worker_stopwords: frozenset = frozenset()
+
+# 子進程中使用的數據處理器，由 _init_cluster_worker 設置
+_worker_processor = None
+
+# jieba 詞典是否已在本進程載入
+_JIEBA_READY = False
+
+
+def _ensure_jieba() -> None:
+    """每個進程只載入一次 jieba 詞典"""
+    global _JIEBA_READY
+    if not _JIEBA_READY:
+        jieba.initialize()
+        _JIEBA_READY = True
+
+
+@lru_cache(maxsize=4)
+def _load_vader(analyzer_cls):
+    """建立並快取情感分析器實例（VADER 詞典只從磁碟讀取一次）"""
+    return analyzer_cls()
+
+
+def _get_vader():
+    """取得本進程共用的情感分析器"""
+    return _load_vader(SentimentIntensityAnalyzer)
+
+
+def _segment(text: str, stopwords_set) -> str:
+    """
+    中文分詞並過濾停用詞和單字，結果以空格分隔
+    
+    定義在模組層級，以便傳送到進程池中執行
+    """
+    if not isinstance(text, str) or not text.strip():
+        return ''
+    lowered = text.lower()
+    try:
+        words = list(jieba.cut(lowered))
+    except Exception:
+        # 分詞失敗時退回以空白切分，單篇異常文本不影響整批分析
+        words = lowered.split()
+    return ' '.join(
+        word for word in (word.strip() for word in words)
+        if len(word) > 1 and word not in stopwords_set
+    )
+
+
+def _init_tokenize_worker(stopwords_set: frozenset) -> None:
+    """進程池初始化：載入 jieba 詞典並設置子進程的停用詞表"""
+    global _worker_stopwords
+    _ensure_jieba()
+    _worker_stopwords = stopwords_set
+
+
+def _tokenize_worker(text: str) -> str:
+    """進程池中執行的分詞函數"""
+    return _segment(text, _worker_stopwords)
+
+
+def _init_cluster_worker(processor: 'DataProcessor') -> None:
+    """進程池初始化：設置子進程的數據處理器（不含數據庫連接）"""
+    global _worker_processor
+    _worker_processor = processor
+
+
+def _cluster_worker(df: pd.DataFrame) -> List['TopicSummary']:
+    """進程池中執行的主題聚類，每次處理一個數據框"""
+    return _worker_processor.perform_topic_clustering(df)
+
+
+# 主題類別及其判斷用關鍵詞（依序比對，先符合者優先）
+_TOPIC_CATEGORIES = (
+    ('科技趨勢', ('ai', '人工智慧', '科技', '技術', '軟體', '程式', '數據')),
+    ('財經動態', ('投資', '股票', '金融', '經濟', '市場', '價格', '利率')),
+    ('社會議題', ('社會', '政治', '新聞', '事件', '討論', '觀點')),
+    ('生活分享', ('生活', '健康', '美食', '旅行', '娛樂', '電影', '音樂')),
+)
+
+# 每個類別的關鍵詞預先編譯為單一交替正則，一次掃描即可判斷是否包含任一關鍵詞
+_TOPIC_CATEGORY_PATTERNS = tuple(
+    (category, re.compile('|'.join(map(re.escape, category_keywords))))
+    for category, category_keywords in _TOPIC_CATEGORIES
+)
+
+
+@lru_cache(maxsize=1024)
+def _topic_name_for(primary_keyword: str) -> str:
+    """
+    根據首個關鍵詞判斷主題類別並生成名稱
+    
+    穩定的主題在每次重新聚類時首個關鍵詞相同，快取後直接命中
+    """
+    for category, pattern in _TOPIC_CATEGORY_PATTERNS:
+        if pattern.search(primary_keyword):
+            return f"{category} - {primary_keyword}"
+    return f"熱門話題 - {primary_keyword}"
+
+
+def _compound_or_nan(analyzer, content: Any) -> float:
+    """單篇貼文的 compound 分數，空白內容或分析失敗時為 NaN"""
+    if not (isinstance(content, str) and content.strip()):
+        return np.nan
+    try:
+        return float(analyzer.polarity_scores(content)['compound'])
+    except Exception:
+        return np.nan
+
+
+def _sentiment_worker(texts: List[Any]) -> List[float]:
+    """進程池中執行的情感分析，每次處理一個小批次"""
+    analyzer = _get_vader()
+    return [_compound_or_nan(analyzer, text) for text in texts]
+
+
+def _hours_since(timestamps: pd.Series, current_time: datetime) -> np.ndarray:
+    """計算距今的小時數"""
+    return (current_time - timestamps).dt.total_seconds().to_numpy(dtype=np.float64) / 3600
+
+
+def _day_buckets(timestamps: pd.Series) -> np.ndarray:
+    """
+    將時間戳轉為整數日序號（自 1970-01-01 起的天數）
+    
+    帶時區的時間戳以其本地日期計算，與 .dt.date 一致；NaT 轉為極小值，不會落入任何日期範圍
+    """
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    取分數最高的 k 個索引，按分數降序排列（同分時索引小者在前）
+    
+    以 np.partition 找出門檻值後只排序候選項，避免對全部分數排序
+    """
+    n = scores.shape[0]
+    if k >= n:
+        candidates = np.arange(n)
+    else:
+        threshold = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= threshold)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
+def _hash_column(term: str, n_features: int) -> int:
+    """計算詞在 HashingVectorizer 中對應的欄位（與 sklearn FeatureHasher 相同的 murmurhash3 映射）"""
+    h = murmurhash3_32(term, seed=0)
+    if h == -2147483648:
+        return (2147483647 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+
+def _normalize_by_max(values: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """以最大值歸一化（忽略NaN，最大值不為正時保持原值）"""
+    max_value = np.nanmax(values) if values.size else 0.0
+    if max_value > 0:
+        return values / max_value * scale
+    return values
+
+
+def _nan_mean(values) -> Optional[float]:
+    """有效（非NaN）數值的平均值，沒有有效數值時返回 None"""
+    scores = np.asarray(values, dtype=np.float64)
+    valid = scores[~np.isnan(scores)]
+    return float(valid.mean()) if valid.size else None
+
+
+def _heat_kernel(likes: np.ndarray, replies: np.ndarray, reposts: np.ndarray,
+                 content_length: np.ndarray, hours: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    熱度密度計算核心
+    
+    Returns:
+        Tuple: (time_decay, base_heat, length_factor, heat_density)
+    """
+    # 時間衰減函數（指數衰減），24小時為基準
+    decay_rate = 0.1
+    time_decay = np.exp(-decay_rate * hours / 24)
+    
+    # 基礎熱度分數：回覆權重最高，轉發次之
+    base_heat = likes * 1.0 + replies * 2.0 + reposts * 1.5
+    
+    # 內容長度的對數歸一化影響
+    length_factor = np.log1p(content_length) / 10
+    
+    # 歸一化到0-100範圍
+    heat_density = _normalize_by_max(base_heat * time_decay * (1 + length_factor), 100)
+    
+    return time_decay, base_heat, length_factor, heat_density
+
+
+def _freshness_kernel(hours: np.ndarray) -> np.ndarray:
+    """新鮮度評分：指數衰減並限制在0-1範圍內"""
+    return np.clip(np.exp(-hours / 24), 0, 1)
+
+
+def _engagement_kernel(total: np.ndarray, user_avg: np.ndarray) -> np.ndarray:
+    """參與率：相對於用戶平均互動數的比率，取對數歸一化"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = total / np.where(np.isnan(user_avg), 1.0, user_avg)
+    # 無窮大值和空值視為1.0
+    rate[~np.isfinite(rate)] = 1.0
+    return np.log1p(rate)
+
+
+def _viral_kernel(reposts: np.ndarray, total: np.ndarray, hours: np.ndarray,
+                  content_flags: np.ndarray, freshness: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    病毒傳播潛力計算核心
+    
+    Returns:
+        Tuple: (repost_ratio, interaction_velocity, viral_potential)
+    """
+    # 轉發率（轉發/總互動）
+    repost_ratio = reposts / (total + 1)
+    
+    # 互動速度（互動數/發布時間）
+    interaction_velocity = total / (hours + 1)
+    
+    viral_potential = (
+        repost_ratio * 0.4 +
+        np.log1p(interaction_velocity) * 0.3 +
+        content_flags * 0.1 +
+        freshness * 0.2
+    )
+    
+    # 歸一化到0-1範圍
+    return repost_ratio, interaction_velocity, _normalize_by_max(viral_potential)
+
+
+def _fused_metrics_loop(likes, replies, reposts, total, hours, content_length, content_flags, user_avg):
+    """
+    逐元素計算所有貼文指標（未歸一化）
+    
+    與各 numpy 核心的運算相同，但在同一次迴圈中完成，供 numba 編譯後
+    免去中間陣列的配置；熱度密度和病毒傳播潛力的歸一化由呼叫方完成
+    
+    Returns:
+        Tuple: (time_decay, base_heat, length_factor, heat_raw, freshness,
+                engagement, repost_ratio, interaction_velocity, viral_raw)
+    """
+    n = likes.shape[0]
+    time_decay = np.empty(n)
+    base_heat = np.empty(n)
+    length_factor = np.empty(n)
+    heat_raw = np.empty(n)
+    freshness = np.empty(n)
+    engagement = np.empty(n)
+    repost_ratio = np.empty(n)
+    velocity = np.empty(n)
+    viral_raw = np.empty(n)
+    
+    for i in prange(n):
+        hour = hours[i]
+        time_decay[i] = math.exp(-0.1 * hour / 24)
+        base_heat[i] = likes[i] * 1.0 + replies[i] * 2.0 + reposts[i] * 1.5
+        length_factor[i] = math.log1p(content_length[i]) / 10
+        heat_raw[i] = base_heat[i] * time_decay[i] * (1 + length_factor[i])
+        
+        fresh = math.exp(-hour / 24)
+        freshness[i] = min(max(fresh, 0.0), 1.0) if fresh == fresh else fresh
+        
+        avg = user_avg[i]
+        if avg != avg:
+            avg = 1.0
+        rate = total[i] / avg if avg != 0 else 1.0
+        if not math.isfinite(rate):
+            rate = 1.0
+        engagement[i] = math.log1p(rate)
+        
+        repost_ratio[i] = reposts[i] / (total[i] + 1)
+        velocity[i] = total[i] / (hour + 1)
+        viral_raw[i] = (
+            repost_ratio[i] * 0.4 +
+            math.log1p(velocity[i]) * 0.3 +
+            content_flags[i] * 0.1 +
+            freshness[i] * 0.2
+        )
+    
+    return (time_decay, base_heat, length_factor, heat_raw, freshness,
+            engagement, repost_ratio, velocity, viral_raw)
+
+
+# 安裝 numba 時編譯為多核心機器碼，否則使用各 numpy 核心
+_fused_metrics_jit = (
+    njit(parallel=True, cache=True)(_fused_metrics_loop) if NUMBA_AVAILABLE else None
+)
+
+
+def _trending_score_loop(offset_seconds, interactions, freshness):
+    """
+    單次迴圈計算主題趨勢分數
+    
+    時間跨度取最早到最晚（忽略NaN），互動速度乘以平均新鮮度（忽略NaN）
+    後縮放到 0-1；與 numba 編譯版本共用
+    """
+    n = offset_seconds.shape[0]
+    if n < 2:
+        return 0.0
+    
+    first = math.inf
+    last = -math.inf
+    total = 0.0
+    fresh_sum = 0.0
+    fresh_count = 0
+    for i in range(n):
+        t = offset_seconds[i]
+        if t == t:
+            if t < first:
+                first = t
+            if t > last:
+                last = t
+        total += interactions[i]
+        f = freshness[i]
+        if f == f:
+            fresh_sum += f
+            fresh_count += 1
+    
+    time_diff = (last - first) / 3600
+    if not time_diff > 0 or fresh_count == 0:
+        return 0.0
+    
+    trending_score = total / time_diff * (fresh_sum / fresh_count)
+    return min(trending_score / 100, 1.0)
+
+
+_trending_score_jit = njit(cache=True)(_trending_score_loop) if NUMBA_AVAILABLE else None
+
+@dataclass(slots=True)
 class PostMetrics:
     """貼文指標數據結構"""
     post_id: str
@@ -63,7 +434,7 @@ class PostMetrics:
     engagement_rate: float
     viral_potential: float
 
-@dataclass 
+@dataclass(slots=True)
 class TopicSummary:
     """主題摘要數據結構"""
     topic_id: int
@@ -75,7 +446,51 @@ class TopicSummary:
     dominant_sentiment: str
     trending_score: float
 
-@dataclass
+@dataclass(slots=True)
+class _ClusterColumns:
+    """聚類摘要用到的熱點欄位（結構化陣列，各聚類以行位置索引）"""
+    contents: np.ndarray
+    total_interactions: np.ndarray
+    heat_density: np.ndarray
+    freshness: np.ndarray
+    offset_seconds: np.ndarray
+    sentiment: Optional[np.ndarray]
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> '_ClusterColumns':
+        """一次把數據框欄位轉為 numpy 陣列；缺少的時間或新鮮度欄位以 NaN 填充"""
+        missing = np.full(len(df), np.nan)
+        if 'timestamp' in df.columns:
+            timestamps = df['timestamp']
+            offset_seconds = (timestamps - timestamps.min()).dt.total_seconds().to_numpy(dtype=np.float64)
+        else:
+            offset_seconds = missing
+        return cls(
+            contents=df['content'].to_numpy(dtype=object),
+            total_interactions=df['total_interactions'].to_numpy(dtype=np.float64),
+            heat_density=df['heat_density'].to_numpy(dtype=np.float64),
+            freshness=(df['freshness_score'].to_numpy(dtype=np.float64)
+                       if 'freshness_score' in df.columns else missing),
+            offset_seconds=offset_seconds,
+            sentiment=df['sentiment'].to_numpy(dtype=np.float64) if 'sentiment' in df.columns else None
+        )
+    
+    def group_stats(self, labels: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        單次 bincount 計算每組的互動總數和平均熱度密度（忽略NaN）
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 每組互動總數、每組平均熱度密度（沒有有效值時為 NaN）
+        """
+        totals = np.bincount(labels, weights=self.total_interactions, minlength=n_groups)
+        valid = ~np.isnan(self.heat_density)
+        heat_sums = np.bincount(labels[valid], weights=self.heat_density[valid], minlength=n_groups)
+        heat_counts = np.bincount(labels[valid], minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            heat_means = heat_sums / heat_counts
+        return totals, heat_means
+
+@dataclass(slots=True)
 class KeywordTrend:
     """關鍵字趨勢數據結構"""
     keyword: str
@@ -85,21 +500,64 @@ class KeywordTrend:
     average_sentiment: float
     momentum_score: float
 
+class _TokenDiskCache:
+    """
+    分詞結果的磁碟緩存（sqlite3），跨次執行共用
+    
+    以文本內容雜湊為鍵；雜湊以停用詞表為金鑰，停用詞變更後舊結果自動失效
+    """
+    
+    QUERY_CHUNK = 500
+    
+    def __init__(self, path: str, stopwords_set: frozenset):
+        self.path = path
+        self._salt = hashlib.blake2b(
+            '\n'.join(sorted(stopwords_set)).encode('utf-8'), digest_size=16
+        ).digest()
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS tokens (key BLOB PRIMARY KEY, tokens TEXT NOT NULL)')
+    
+    def _key(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16, key=self._salt).digest()
+    
+    def get_many(self, texts: Sequence[str]) -> Dict[str, str]:
+        """批次查詢，返回已緩存文本的分詞結果"""
+        keys = {self._key(text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+        with closing(sqlite3.connect(self.path)) as conn:
+            for start in range(0, len(key_list), self.QUERY_CHUNK):
+                chunk = key_list[start:start + self.QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                for key, tokens in conn.execute(
+                    f'SELECT key, tokens FROM tokens WHERE key IN ({placeholders})', chunk
+                ):
+                    found[keys[key]] = tokens
+        return found
+    
+    def set_many(self, items: Dict[str, str]) -> None:
+        """批次寫入分詞結果"""
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO tokens (key, tokens) VALUES (?, ?)',
+                ((self._key(text), tokens) for text, tokens in items.items())
+            )
+
 class DataProcessor:
     """數據處理器主類"""
     
     def __init__(self):
-        self.db_manager = SupabaseManager()
+        self.db_manager = SupabaseManager.instance()
         
-        # 初始化中文分詞
-        jieba.initialize()
+        # 初始化中文分詞（每個進程只載入一次詞典）
+        _ensure_jieba()
         
         # 載入中文停用詞
         self.chinese_stopwords = self._load_chinese_stopwords()
         
         # 初始化情感分析器
         try:
-            self.sentiment_analyzer = SentimentIntensityAnalyzer()
+            self.sentiment_analyzer = _get_vader()
         except Exception as e:
             logger.warning(f"情感分析器初始化失敗: {e}")
             self.sentiment_analyzer = None
@@ -107,10 +565,61 @@ class DataProcessor:
         # 配置參數
         self.min_interactions_threshold = int(os.getenv('MIN_INTERACTIONS_THRESHOLD', '5'))
         self.max_topics = int(os.getenv('MAX_TOPICS', '20'))
+        self.min_cluster_size = int(os.getenv('MIN_CLUSTER_SIZE', '2'))
         self.keyword_min_freq = int(os.getenv('KEYWORD_MIN_FREQ', '3'))
         
-    def _load_chinese_stopwords(self) -> set:
-        """載入中文停用詞"""
+        # 關鍵詞提取和主題聚類的特徵雜湊空間大小（HashingVectorizer 的 n_features），
+        # 取 2**18 使一元和二元詞的雜湊碰撞可忽略
+        self.tfidf_hash_features = 2 ** 18
+        
+        # 分詞結果緩存：原文 -> 空格分隔的詞序列，同一文本在各分析步驟只分詞一次
+        self._token_cache = LRUCache(maxsize=int(os.getenv('TOKEN_CACHE_SIZE', '50000')))
+        
+        # 分詞結果磁碟緩存：設定 TOKEN_DISK_CACHE_PATH 後，重疊時間窗口的貼文跨次執行不必重新分詞
+        self._token_disk_cache = None
+        token_disk_cache_path = os.getenv('TOKEN_DISK_CACHE_PATH', '')
+        if token_disk_cache_path:
+            try:
+                self._token_disk_cache = _TokenDiskCache(token_disk_cache_path, self.chinese_stopwords)
+            except Exception as e:
+                logger.warning(f"分詞磁碟緩存初始化失敗: {e}")
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """傳送到子進程時不攜帶數據庫連接、情感分析器和分詞緩存"""
+        state = self.__dict__.copy()
+        state['db_manager'] = None
+        state['sentiment_analyzer'] = self.sentiment_analyzer is not None
+        state['_token_cache'] = self._token_cache.maxsize
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """在子進程中重新取得情感分析器並建立空的分詞緩存"""
+        self.__dict__.update(state)
+        _ensure_jieba()
+        self.sentiment_analyzer = None
+        if state['sentiment_analyzer']:
+            try:
+                self.sentiment_analyzer = _get_vader()
+            except Exception as e:
+                logger.warning(f"情感分析器初始化失敗: {e}")
+        self._token_cache = LRUCache(maxsize=state['_token_cache'])
+    
+    @classmethod
+    def pre_warm(cls) -> None:
+        """
+        預先載入 jieba 詞典和情感分析器
+        
+        在排程器啟動或建立進程池前調用，之後的 DataProcessor 實例和
+        fork 出的子進程直接共用已載入的資源，不必在首次分析時等待
+        """
+        _ensure_jieba()
+        try:
+            _get_vader()
+        except Exception as e:
+            logger.warning(f"情感分析器預載入失敗: {e}")
+        
+    def _load_chinese_stopwords(self) -> frozenset:
+        """載入中文停用詞（不可變集合，可直接傳給分詞子進程）"""
         stopwords_set = set()
         
         # 基本中文停用詞
@@ -140,21 +649,97 @@ class DataProcessor:
         }
         stopwords_set.update(social_media_stopwords)
         
-        return stopwords_set
+        return frozenset(stopwords_set)
+    
+    def _tokenize(self, text: str) -> str:
+        """
+        中文分詞並過濾停用詞和單字，結果以空格分隔
+        
+        同一文本只會分詞一次，結果保存在 _token_cache 中
+        
+        Args:
+            text: 原始文本
+            
+        Returns:
+            str: 空格分隔的詞序列
+        """
+        if not isinstance(text, str) or not text.strip():
+            return ''
+        
+        tokens = self._token_cache.get(text)
+        if tokens is None:
+            tokens = _segment(text, self.chinese_stopwords)
+            self._token_cache[text] = tokens
+        return tokens
+    
+    def _tokenize_many(self, texts: List[str]) -> List[str]:
+        """
+        批次分詞
+        
+        先查詢記憶體和磁碟緩存；未快取的文本數達到 TOKENIZE_PARALLEL_MIN 時
+        使用多進程分詞，否則逐一呼叫 _tokenize。新的分詞結果會寫回磁碟緩存
+        
+        Args:
+            texts: 原始文本列表
+            
+        Returns:
+            List[str]: 與輸入順序對應的詞序列
+        """
+        pending = list(dict.fromkeys(
+            text for text in texts
+            if isinstance(text, str) and text.strip() and text not in self._token_cache
+        ))
+        
+        if pending and self._token_disk_cache is not None:
+            try:
+                cached = self._token_disk_cache.get_many(pending)
+                for text, tokens in cached.items():
+                    self._token_cache[text] = tokens
+                pending = [text for text in pending if text not in cached]
+            except Exception as e:
+                logger.warning(f"讀取分詞磁碟緩存失敗: {e}")
+        
+        if len(pending) >= TOKENIZE_PARALLEL_MIN and TOKENIZE_WORKERS > 1:
+            try:
+                with Pool(
+                    processes=TOKENIZE_WORKERS,
+                    initializer=_init_tokenize_worker,
+                    initargs=(self.chinese_stopwords,)
+                ) as pool:
+                    results = pool.map(_tokenize_worker, pending, chunksize=TOKENIZE_CHUNKSIZE)
+                for text, tokens in zip(pending, results):
+                    self._token_cache[text] = tokens
+                logger.info(f"並行分詞完成: {len(pending)} 篇文本, {TOKENIZE_WORKERS} 個進程")
+            except Exception as e:
+                logger.warning(f"並行分詞失敗，改用單進程: {e}")
+        
+        results = [self._tokenize(text) for text in texts]
+        
+        if pending and self._token_disk_cache is not None:
+            try:
+                self._token_disk_cache.set_many({
+                    text: self._token_cache[text] for text in pending if text in self._token_cache
+                })
+            except Exception as e:
+                logger.warning(f"寫入分詞磁碟緩存失敗: {e}")
+        
+        return results
     
-    def fetch_raw_posts(self, days_back: int = 7) -> pd.DataFrame:
+    def fetch_raw_posts(self, days_back: int = 7,
+                        current_time: Optional[datetime] = None) -> pd.DataFrame:
         """
         從數據庫獲取原始貼文數據
         
         Args:
             days_back: 回溯天數
+            current_time: 分析基準時間，未提供時使用當前時間
             
         Returns:
             pd.DataFrame: 貼文數據框
         """
         try:
             # 計算日期範圍
-            end_date = datetime.now(timezone.utc)
+            end_date = current_time or datetime.now(timezone.utc)
             start_date = end_date - timedelta(days=days_back)
             
             # 從數據庫獲取數據
@@ -164,19 +749,27 @@ class DataProcessor:
                 logger.warning("沒有找到符合條件的貼文數據")
                 return pd.DataFrame()
             
-            # 轉換為DataFrame
-            df = pd.DataFrame(posts_data)
-            
-            # 數據清理和類型轉換
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['scraped_at'] = pd.to_datetime(df['scraped_at'])
-            df['likes'] = df['likes'].fillna(0).astype(int)
-            df['replies'] = df['replies'].fillna(0).astype(int)
-            df['reposts'] = df['reposts'].fillna(0).astype(int)
-            df['content'] = df['content'].fillna('')
+            # 逐列建立陣列後再組成DataFrame，避免逐行推斷類型和 fillna/astype 鏈
+            columns = list(dict.fromkeys(key for record in posts_data for key in record))
+            data = {}
+            for column in columns:
+                values = [record.get(column) for record in posts_data]
+                if column in INTERACTION_COLUMNS:
+                    # None/NaN 視為 0
+                    data[column] = np.nan_to_num(
+                        np.array(values, dtype=np.float64), nan=0.0
+                    ).astype(np.int64)
+                elif column == 'content':
+                    data[column] = [value if isinstance(value, str) else '' for value in values]
+                elif column in ('timestamp', 'scraped_at'):
+                    data[column] = pd.to_datetime(values)
+                else:
+                    data[column] = values
+            
+            df = pd.DataFrame(data)
             
             # 計算總互動數
-            df['total_interactions'] = df['likes'] + df['replies'] + df['reposts']
+            df['total_interactions'] = data['likes'] + data['replies'] + data['reposts']
             
             logger.info(f"成功載入 {len(df)} 篇貼文數據")
             return df
@@ -185,47 +778,155 @@ class DataProcessor:
             logger.error(f"獲取原始貼文數據失敗: {e}")
             return pd.DataFrame()
     
-    def calculate_heat_density(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _interaction_arrays(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """取出讚、回覆、轉發和總互動數的 float64 陣列"""
+        return (
+            df['likes'].to_numpy(dtype=np.float64),
+            df['replies'].to_numpy(dtype=np.float64),
+            df['reposts'].to_numpy(dtype=np.float64),
+            df['total_interactions'].to_numpy(dtype=np.float64)
+        )
+    
+    def _content_length(self, df: pd.DataFrame) -> np.ndarray:
+        """內容長度"""
+        return df['content'].str.len().fillna(0).to_numpy(dtype=np.int64)
+    
+    def _content_flags(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        計算貼文熱度密度
+        內容特徵：是否包含話題標籤、提及和連結
+        
+        單次遍歷內容，以位元組合記錄三個特徵後再拆分
+        """
+        contents = df['content'].tolist()
+        packed = np.fromiter(
+            (
+                ('#' in content) | (('@' in content) << 1) | (('http' in content) << 2)
+                if isinstance(content, str) else 0
+                for content in contents
+            ),
+            dtype=np.uint8,
+            count=len(contents)
+        ).astype(np.int64)
+        return packed & 1, (packed >> 1) & 1, (packed >> 2) & 1
+    
+    def _user_average_interactions(self, df: pd.DataFrame) -> np.ndarray:
+        """每篇貼文所屬用戶的平均互動數"""
+        # 以類別型用戶名作為分組鍵，分組時使用整數編碼而非字串雜湊
+        user_keys = df['username'].astype('category')
+        return (
+            df.groupby(user_keys, observed=True)['total_interactions']
+            .transform('mean')
+            .to_numpy(dtype=np.float64)
+        )
+    
+    def _assign_columns(self, df: pd.DataFrame, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """將計算好的陣列寫回數據框"""
+        for name, values in columns.items():
+            df[name] = values
+        return df
+    
+    def compute_all_metrics(self, df: pd.DataFrame,
+                            current_time: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        一次計算熱度密度、新鮮度、參與率和病毒傳播潛力
+        
+        與依序呼叫四個 calculate_* 方法結果相同，但所需欄位只讀取一次，
+        發布時間只計算一次，所有運算在numpy陣列上完成後一次寫回
         
         Args:
             df: 貼文數據框
+            current_time: 分析基準時間，未提供時使用當前時間
             
         Returns:
-            pd.DataFrame: 包含熱度密度的數據框
+            pd.DataFrame: 包含所有貼文指標的數據框
         """
         if df.empty:
             return df
         
         try:
-            # 計算時間衰減因子
-            current_time = datetime.now(timezone.utc)
-            df['hours_since_post'] = (current_time - df['timestamp']).dt.total_seconds() / 3600
-            
-            # 時間衰減函數（指數衰減）
-            decay_rate = 0.1  # 衰減率
-            df['time_decay'] = np.exp(-decay_rate * df['hours_since_post'] / 24)  # 24小時為基準
+            hours = _hours_since(df['timestamp'], current_time or datetime.now(timezone.utc))
+            likes, replies, reposts, total = self._interaction_arrays(df)
+            content_length = self._content_length(df)
+            has_hashtag, has_mention, has_url = self._content_flags(df)
+            user_avg = self._user_average_interactions(df)
+            
+            content_flags = has_hashtag + has_mention + has_url
+            
+            if _fused_metrics_jit is not None:
+                (time_decay, base_heat, length_factor, heat_raw, freshness,
+                 engagement, repost_ratio, velocity, viral_raw) = _fused_metrics_jit(
+                    likes, replies, reposts, total, hours,
+                    content_length.astype(np.float64), content_flags.astype(np.float64), user_avg
+                )
+                heat_density = _normalize_by_max(heat_raw, 100)
+                viral = _normalize_by_max(viral_raw)
+            else:
+                time_decay, base_heat, length_factor, heat_density = _heat_kernel(
+                    likes, replies, reposts, content_length, hours
+                )
+                freshness = _freshness_kernel(hours)
+                engagement = _engagement_kernel(total, user_avg)
+                repost_ratio, velocity, viral = _viral_kernel(
+                    reposts, total, hours, content_flags, freshness
+                )
+            
+            self._assign_columns(df, {
+                'hours_since_post': hours,
+                'time_decay': time_decay,
+                'base_heat': base_heat,
+                'content_length': content_length,
+                'length_factor': length_factor,
+                'heat_density': heat_density,
+                'freshness_score': freshness,
+                'user_avg_interactions': user_avg,
+                'engagement_rate': engagement,
+                'repost_ratio': repost_ratio,
+                'interaction_velocity': velocity,
+                'has_hashtag': has_hashtag,
+                'has_mention': has_mention,
+                'has_url': has_url,
+                'viral_potential': viral
+            })
+            
+            logger.info(f"完成 {len(df)} 篇貼文的指標計算")
+            return df
             
-            # 基礎熱度分數
-            df['base_heat'] = (
-                df['likes'] * 1.0 +      # 讚的權重
-                df['replies'] * 2.0 +    # 回覆的權重（更高，表示更多互動）
-                df['reposts'] * 1.5      # 轉發的權重
-            )
+        except Exception as e:
+            logger.error(f"計算貼文指標失敗: {e}")
+            return df
+    
+    def calculate_heat_density(self, df: pd.DataFrame,
+                               current_time: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        計算貼文熱度密度
+        
+        Args:
+            df: 貼文數據框
+            current_time: 分析基準時間，未提供時使用當前時間
             
-            # 考慮內容長度對熱度的影響
-            df['content_length'] = df['content'].str.len()
-            df['length_factor'] = np.log1p(df['content_length']) / 10  # 對數歸一化
+        Returns:
+            pd.DataFrame: 包含熱度密度的數據框
+        """
+        if df.empty:
+            return df
+        
+        try:
+            hours = _hours_since(df['timestamp'], current_time or datetime.now(timezone.utc))
+            likes, replies, reposts, _ = self._interaction_arrays(df)
+            content_length = self._content_length(df)
             
-            # 計算最終熱度密度
-            df['heat_density'] = (
-                df['base_heat'] * df['time_decay'] * (1 + df['length_factor'])
+            time_decay, base_heat, length_factor, heat_density = _heat_kernel(
+                likes, replies, reposts, content_length, hours
             )
             
-            # 歸一化到0-100範圍
-            if df['heat_density'].max() > 0:
-                df['heat_density'] = (df['heat_density'] / df['heat_density'].max()) * 100
+            self._assign_columns(df, {
+                'hours_since_post': hours,
+                'time_decay': time_decay,
+                'base_heat': base_heat,
+                'content_length': content_length,
+                'length_factor': length_factor,
+                'heat_density': heat_density
+            })
             
             logger.info(f"完成 {len(df)} 篇貼文的熱度密度計算")
             return df
@@ -234,12 +935,14 @@ class DataProcessor:
             logger.error(f"計算熱度密度失敗: {e}")
             return df
     
-    def calculate_freshness_score(self, df: pd.DataFrame) -> pd.DataFrame:
+    def calculate_freshness_score(self, df: pd.DataFrame,
+                                  current_time: Optional[datetime] = None) -> pd.DataFrame:
         """
         計算貼文新鮮度分數
         
         Args:
             df: 貼文數據框
+            current_time: 分析基準時間，未提供時使用當前時間
             
         Returns:
             pd.DataFrame: 包含新鮮度分數的數據框
@@ -248,14 +951,13 @@ class DataProcessor:
             return df
         
         try:
-            current_time = datetime.now(timezone.utc)
-            df['hours_since_post'] = (current_time - df['timestamp']).dt.total_seconds() / 3600
+            hours = _hours_since(df['timestamp'], current_time or datetime.now(timezone.utc))
             
             # 新鮮度評分：24小時內為1.0，之後指數衰減
-            df['freshness_score'] = np.exp(-df['hours_since_post'] / 24) 
-            
-            # 確保分數在0-1範圍內
-            df['freshness_score'] = df['freshness_score'].clip(0, 1)
+            self._assign_columns(df, {
+                'hours_since_post': hours,
+                'freshness_score': _freshness_kernel(hours)
+            })
             
             return df
             
@@ -277,18 +979,14 @@ class DataProcessor:
             return df
         
         try:
-            # 計算每個用戶的平均互動數
-            user_avg_interactions = df.groupby('username')['total_interactions'].mean()
-            
             # 計算當前貼文相對於該用戶平均表現的比率
-            df['user_avg_interactions'] = df['username'].map(user_avg_interactions)
-            df['engagement_rate'] = df['total_interactions'] / df['user_avg_interactions'].fillna(1)
-            
-            # 處理無窮大值和空值
-            df['engagement_rate'] = df['engagement_rate'].replace([np.inf, -np.inf], 1.0).fillna(1.0)
+            user_avg = self._user_average_interactions(df)
+            total = df['total_interactions'].to_numpy(dtype=np.float64)
             
-            # 歸一化到合理範圍
-            df['engagement_rate'] = np.log1p(df['engagement_rate'])
+            self._assign_columns(df, {
+                'user_avg_interactions': user_avg,
+                'engagement_rate': _engagement_kernel(total, user_avg)
+            })
             
             return df
             
@@ -310,29 +1008,26 @@ class DataProcessor:
             return df
         
         try:
-            # 病毒傳播潛力基於多個因素
-            # 1. 轉發率（轉發/總互動）
-            df['repost_ratio'] = df['reposts'] / (df['total_interactions'] + 1)
-            
-            # 2. 互動速度（互動數/發布時間）
-            df['interaction_velocity'] = df['total_interactions'] / (df['hours_since_post'] + 1)
-            
-            # 3. 內容特徵（是否包含熱門關鍵字、話題標籤等）
-            df['has_hashtag'] = df['content'].str.contains('#', na=False).astype(int)
-            df['has_mention'] = df['content'].str.contains('@', na=False).astype(int)
-            df['has_url'] = df['content'].str.contains('http', na=False).astype(int)
-            
-            # 綜合計算病毒傳播潛力
-            df['viral_potential'] = (
-                df['repost_ratio'] * 0.4 +
-                np.log1p(df['interaction_velocity']) * 0.3 +
-                (df['has_hashtag'] + df['has_mention'] + df['has_url']) * 0.1 +
-                df['freshness_score'] * 0.2
+            # 病毒傳播潛力基於轉發率、互動速度、內容特徵和新鮮度
+            _, _, reposts, total = self._interaction_arrays(df)
+            has_hashtag, has_mention, has_url = self._content_flags(df)
+            
+            repost_ratio, velocity, viral = _viral_kernel(
+                reposts,
+                total,
+                df['hours_since_post'].to_numpy(dtype=np.float64),
+                has_hashtag + has_mention + has_url,
+                df['freshness_score'].to_numpy(dtype=np.float64)
             )
             
-            # 歸一化到0-1範圍
-            if df['viral_potential'].max() > 0:
-                df['viral_potential'] = df['viral_potential'] / df['viral_potential'].max()
+            self._assign_columns(df, {
+                'repost_ratio': repost_ratio,
+                'interaction_velocity': velocity,
+                'has_hashtag': has_hashtag,
+                'has_mention': has_mention,
+                'has_url': has_url,
+                'viral_potential': viral
+            })
             
             return df
             
@@ -340,13 +1035,15 @@ class DataProcessor:
             logger.error(f"計算病毒傳播潛力失敗: {e}")
             return df
     
-    def extract_keywords(self, texts: List[str], max_features: int = 100) -> List[Tuple[str, float]]:
+    def extract_keywords(self, texts: List[str], max_features: int = 100,
+                         tokens: Optional[List[str]] = None) -> List[Tuple[str, float]]:
         """
         從文本中提取關鍵詞
         
         Args:
             texts: 文本列表
             max_features: 最大特徵數
+            tokens: 已分詞的文本（與 texts 一一對應），提供時不再重複分詞
             
         Returns:
             List[Tuple[str, float]]: 關鍵詞和權重的元組列表
@@ -355,22 +1052,15 @@ class DataProcessor:
             return []
         
         try:
-            # 預處理文本
+            if tokens is None:
+                tokens = [self._tokenize(text) for text in texts]
+            
+            # 在分詞結果上進一步過濾數字和非中英文詞
             processed_texts = []
-            for text in texts:
-                if pd.isna(text) or not text.strip():
-                    continue
-                
-                # 中文分詞
-                words = jieba.cut(text.lower())
-                
-                # 過濾停用詞和短詞
+            for text_tokens in tokens:
                 filtered_words = [
-                    word.strip() for word in words 
-                    if (len(word.strip()) > 1 and 
-                        word.strip() not in self.chinese_stopwords and
-                        not word.strip().isdigit() and
-                        re.match(r'^[a-zA-Z\u4e00-\u9fff]+$', word.strip()))
+                    word for word in text_tokens.split()
+                    if _KEYWORD_RE.fullmatch(word)
                 ]
                 
                 if filtered_words:
@@ -379,30 +1069,85 @@ class DataProcessor:
             if not processed_texts:
                 return []
             
-            # 使用TF-IDF提取關鍵詞
-            vectorizer = TfidfVectorizer(
+            # 使用TF-IDF提取關鍵詞：特徵雜湊單次掃描，不建立完整詞彙表
+            tfidf_matrix, feature_names = self._hashed_tfidf(
+                processed_texts,
                 max_features=max_features,
                 min_df=self.keyword_min_freq,
-                max_df=0.8,
-                ngram_range=(1, 2)
+                max_df=0.8
             )
             
-            tfidf_matrix = vectorizer.fit_transform(processed_texts)
-            feature_names = vectorizer.get_feature_names_out()
-            
-            # 計算每個詞的平均TF-IDF分數
-            mean_scores = np.mean(tfidf_matrix.toarray(), axis=0)
-            
-            # 創建關鍵詞-分數對
-            keyword_scores = list(zip(feature_names, mean_scores))
-            keyword_scores.sort(key=lambda x: x[1], reverse=True)
+            # 直接在稀疏矩陣上計算每個詞的平均TF-IDF分數，避免轉為稠密矩陣
+            mean_scores = np.asarray(tfidf_matrix.mean(axis=0)).ravel()
             
-            return keyword_scores[:50]  # 返回前50個關鍵詞
+            # 以部分排序取前50個關鍵詞，創建關鍵詞-分數對
+            top_indices = _top_k_indices(mean_scores, 50)
+            return [(feature_names[i], float(mean_scores[i])) for i in top_indices]
             
         except Exception as e:
             logger.error(f"提取關鍵詞失敗: {e}")
             return []
     
+    def _hashed_tfidf(self, processed_texts: List[str],
+                      max_features: int = 200, min_df: int = 2,
+                      max_df: float = 0.8) -> Tuple[Any, np.ndarray]:
+        """
+        以特徵雜湊建立TF-IDF矩陣（關鍵詞提取和主題聚類共用）
+        
+        HashingVectorizer 單次掃描且不保存詞彙表；文檔頻率篩選和 max_features
+        在雜湊欄位上進行，與 TfidfVectorizer 的 min_df/max_df/max_features 相同。
+        只有最終選出的欄位會反查對應的詞（雜湊碰撞時取出現次數最多的詞）
+        
+        Args:
+            processed_texts: 空格分隔的分詞結果
+            max_features: 保留的最大特徵數
+            min_df: 最小文檔頻率
+            max_df: 最大文檔頻率比例
+            
+        Returns:
+            Tuple[sparse matrix, np.ndarray]: TF-IDF矩陣和對應的特徵名稱
+        """
+        n_features = self.tfidf_hash_features
+        hasher = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            tokenizer=str.split,
+            token_pattern=None,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+        counts = hasher.transform(processed_texts)
+        
+        # 文檔頻率篩選後以部分選取取出詞頻最高的 max_features 個欄位（不排序全部候選）
+        doc_freq = np.bincount(counts.indices, minlength=n_features)
+        eligible = np.flatnonzero((doc_freq >= min_df) & (doc_freq <= max_df * counts.shape[0]))
+        if eligible.size == 0:
+            raise ValueError("篩選後沒有剩餘的特徵")
+        
+        term_totals = np.asarray(counts.sum(axis=0)).ravel()
+        selected = np.sort(eligible[_top_k_indices(term_totals[eligible], max_features)])
+        
+        # 固定為 float32（舊版 sklearn 的 TfidfTransformer 會升級為 float64），聚類距離計算搬移的位元組減半
+        tfidf_matrix = TfidfTransformer().fit_transform(counts[:, selected]).astype(np.float32, copy=False)
+        
+        # 反查選中欄位對應的詞
+        column_position = {int(column): position for position, column in enumerate(selected)}
+        term_counts: Dict[int, Counter] = defaultdict(Counter)
+        analyzer = hasher.build_analyzer()
+        for text in processed_texts:
+            for term in analyzer(text):
+                position = column_position.get(_hash_column(term, n_features))
+                if position is not None:
+                    term_counts[position][term] += 1
+        
+        feature_names = np.array([
+            term_counts[position].most_common(1)[0][0] if term_counts[position] else ''
+            for position in range(len(selected))
+        ], dtype=object)
+        
+        return tfidf_matrix, feature_names
+    
     def perform_topic_clustering(self, df: pd.DataFrame) -> List[TopicSummary]:
         """
         執行主題聚類分析
@@ -418,86 +1163,80 @@ class DataProcessor:
             return []
         
         try:
-            # 過濾掉互動數過低的貼文
-            filtered_df = df[df['total_interactions'] >= self.min_interactions_threshold].copy()
+            # 在分詞和向量化之前過濾掉互動數過低的貼文（numpy 布林遮罩，結果已是新數據框無需再複製）
+            keep_mask = df['total_interactions'].to_numpy() >= self.min_interactions_threshold
+            filtered_df = df[keep_mask]
             
             if len(filtered_df) < 3:
                 logger.warning("符合條件的貼文數量太少，無法進行聚類")
                 return []
             
-            # 提取文本特徵
-            texts = filtered_df['content'].fillna('').tolist()
-            processed_texts = []
-            
-            for text in texts:
-                words = jieba.cut(text.lower())
-                filtered_words = [
-                    word.strip() for word in words 
-                    if (len(word.strip()) > 1 and 
-                        word.strip() not in self.chinese_stopwords)
-                ]
-                processed_texts.append(' '.join(filtered_words))
-            
-            # 使用TF-IDF向量化
-            vectorizer = TfidfVectorizer(
-                max_features=200,
-                min_df=2,
-                max_df=0.8,
-                ngram_range=(1, 2)
-            )
+            # 提取文本特徵（優先使用 run_full_analysis 預先計算的分詞結果）
+            if 'tokens' in filtered_df.columns:
+                processed_texts = filtered_df['tokens'].tolist()
+            else:
+                processed_texts = [self._tokenize(text) for text in filtered_df['content'].tolist()]
             
-            tfidf_matrix = vectorizer.fit_transform(processed_texts)
+            # 使用特徵雜湊 + TF-IDF 向量化
+            tfidf_matrix, feature_names = self._hashed_tfidf(processed_texts)
             
             # 確定聚類數量
             n_clusters = min(self.max_topics, max(2, len(filtered_df) // 10))
             
-            # K-means聚類
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-            cluster_labels = kmeans.fit_predict(tfidf_matrix)
+            # Mini-batch K-means聚類
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_clusters,
+                random_state=42,
+                batch_size=1024,
+                n_init=3,
+                max_iter=100
+            )
+            cluster_labels = kmeans.fit_predict(tfidf_matrix).astype(np.int32, copy=False)
             
             # 分析每個聚類
-            feature_names = vectorizer.get_feature_names_out()
-            topics = []
-            
-            for cluster_id in range(n_clusters):
-                cluster_mask = cluster_labels == cluster_id
-                cluster_posts = filtered_df[cluster_mask]
-                
-                if len(cluster_posts) < 2:
-                    continue
+            cluster_centers = np.asarray(kmeans.cluster_centers_, dtype=np.float32)
+            # 一次取出所有聚類中心權重最高的10個特徵
+            top_k = min(10, cluster_centers.shape[1])
+            top_indices_all = np.argpartition(-cluster_centers, top_k - 1, axis=1)[:, :top_k]
+            top_values = np.take_along_axis(cluster_centers, top_indices_all, axis=1)
+            top_indices_all = np.take_along_axis(
+                top_indices_all, np.argsort(-top_values, axis=1, kind='stable'), axis=1
+            )
+            # 熱點欄位一次轉為 numpy 陣列，各聚類只做整數索引，不再切割數據框
+            columns = _ClusterColumns.from_frame(filtered_df)
+            
+            # 單次穩定排序將貼文按聚類分組，取代每個聚類掃描一次整個標籤陣列
+            order = np.argsort(cluster_labels, kind='stable')
+            bounds = np.searchsorted(cluster_labels[order], np.arange(n_clusters + 1))
+            # 各聚類的互動總數和平均熱度以單次分組聚合一併算出
+            interaction_totals, heat_means = columns.group_stats(cluster_labels, n_clusters)
+            
+            def summarize(cluster_id: int) -> Optional[TopicSummary]:
+                rows = order[bounds[cluster_id]:bounds[cluster_id + 1]]
+                # 貼文數不足的雜訊聚類直接略過，不做關鍵詞、情感和趨勢計算
+                if len(rows) < self.min_cluster_size:
+                    return None
                 
                 # 獲取聚類中心的特徵
-                cluster_center = kmeans.cluster_centers_[cluster_id]
-                top_indices = cluster_center.argsort()[-10:][::-1]
-                cluster_keywords = [feature_names[i] for i in top_indices if cluster_center[i] > 0]
-                
+                cluster_center = cluster_centers[cluster_id]
+                cluster_keywords = [feature_names[i] for i in top_indices_all[cluster_id] if cluster_center[i] > 0]
                 if not cluster_keywords:
-                    continue
-                
-                # 生成主題名稱
-                topic_name = self._generate_topic_name(cluster_keywords, cluster_posts['content'].tolist())
-                
-                # 計算主題統計
-                total_interactions = cluster_posts['total_interactions'].sum()
-                avg_heat_density = cluster_posts['heat_density'].mean()
-                post_count = len(cluster_posts)
-                
-                # 分析情感傾向
-                dominant_sentiment = self._analyze_cluster_sentiment(cluster_posts['content'].tolist())
-                
-                # 計算趨勢分數
-                trending_score = self._calculate_trending_score(cluster_posts)
+                    return None
                 
-                topics.append(TopicSummary(
-                    topic_id=cluster_id + 1,
-                    topic_keywords=cluster_keywords[:5],
-                    topic_name=topic_name,
-                    post_count=post_count,
-                    average_heat_density=avg_heat_density,
-                    total_interactions=total_interactions,
-                    dominant_sentiment=dominant_sentiment,
-                    trending_score=trending_score
-                ))
+                return self._summarize_cluster(
+                    cluster_id, columns, rows, cluster_keywords,
+                    group_stats=(interaction_totals[cluster_id], heat_means[cluster_id])
+                )
+            
+            # 各聚類的摘要互不依賴，可交給執行緒池並行計算；結果保持聚類順序
+            workers = min(CLUSTER_WORKERS, n_clusters)
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    summaries = list(executor.map(summarize, range(n_clusters)))
+            else:
+                summaries = [summarize(cluster_id) for cluster_id in range(n_clusters)]
+            
+            topics = [topic for topic in summaries if topic is not None]
             
             logger.info(f"完成主題聚類分析，識別出 {len(topics)} 個主題")
             return topics
@@ -506,47 +1245,154 @@ class DataProcessor:
             logger.error(f"主題聚類分析失敗: {e}")
             return []
     
+    def perform_topic_clustering_batch(self, dfs: Sequence[pd.DataFrame],
+                                       workers: Optional[int] = None) -> List[List[TopicSummary]]:
+        """
+        對多個互不依賴的數據框（例如各時間窗口）分別執行主題聚類
+        
+        TF-IDF 和 K-means 受 GIL 限制，因此以進程池讓每個進程處理一個數據框；
+        進程池失敗或只有一個數據框時依序計算
+        
+        Args:
+            dfs: 貼文數據框列表
+            workers: 進程數，未提供時使用 CLUSTER_BATCH_WORKERS
+            
+        Returns:
+            List[List[TopicSummary]]: 與輸入順序對應的主題摘要列表
+        """
+        workers = min(workers or CLUSTER_BATCH_WORKERS, len(dfs))
+        
+        if workers > 1:
+            try:
+                with Pool(
+                    processes=workers,
+                    initializer=_init_cluster_worker,
+                    initargs=(self,)
+                ) as pool:
+                    results = pool.map(_cluster_worker, dfs, chunksize=1)
+                logger.info(f"並行主題聚類完成: {len(dfs)} 個數據框, {workers} 個進程")
+                return results
+            except Exception as e:
+                logger.warning(f"並行主題聚類失敗，改用單進程: {e}")
+        
+        return [self.perform_topic_clustering(df) for df in dfs]
+    
+    def _summarize_cluster(self, cluster_id: int, columns: _ClusterColumns, rows: np.ndarray,
+                           cluster_keywords: List[str],
+                           group_stats: Optional[Tuple[float, float]] = None) -> TopicSummary:
+        """
+        計算單個聚類的主題摘要
+        
+        rows 為聚類貼文在 columns 中的行位置；group_stats 為 group_stats()
+        預先算出的（互動總數, 平均熱度密度），未提供時從 rows 計算
+        """
+        contents = columns.contents[rows].tolist()
+        
+        # 生成主題名稱
+        topic_name = self._generate_topic_name(cluster_keywords, contents)
+        
+        # 計算主題統計
+        if group_stats is None:
+            total_interactions = columns.total_interactions[rows].sum()
+            avg_heat_density = _nan_mean(columns.heat_density[rows])
+        else:
+            total_interactions, avg_heat_density = group_stats
+        total_interactions = int(total_interactions)
+        avg_heat_density = float('nan') if avg_heat_density is None else float(avg_heat_density)
+        post_count = len(rows)
+        
+        # 分析情感傾向
+        dominant_sentiment = self._analyze_cluster_sentiment(
+            contents,
+            compound_scores=columns.sentiment[rows] if columns.sentiment is not None else None
+        )
+        
+        # 計算趨勢分數
+        trending_score = self._trending_score_from_arrays(
+            columns.offset_seconds[rows],
+            columns.total_interactions[rows],
+            columns.freshness[rows]
+        )
+        
+        return TopicSummary(
+            topic_id=cluster_id + 1,
+            topic_keywords=cluster_keywords[:5],
+            topic_name=topic_name,
+            post_count=post_count,
+            average_heat_density=avg_heat_density,
+            total_interactions=total_interactions,
+            dominant_sentiment=dominant_sentiment,
+            trending_score=trending_score
+        )
+    
     def _generate_topic_name(self, keywords: List[str], contents: List[str]) -> str:
         """生成主題名稱"""
         if not keywords:
             return "未知主題"
         
-        # 簡單的主題命名邏輯
-        primary_keyword = keywords[0]
-        
-        # 根據關鍵詞特徵判斷主題類別
-        tech_keywords = ['ai', '人工智慧', '科技', '技術', '軟體', '程式', '數據']
-        finance_keywords = ['投資', '股票', '金融', '經濟', '市場', '價格', '利率']
-        social_keywords = ['社會', '政治', '新聞', '事件', '討論', '觀點']
-        life_keywords = ['生活', '健康', '美食', '旅行', '娛樂', '電影', '音樂']
-        
-        if any(keyword in primary_keyword for keyword in tech_keywords):
-            return f"科技趨勢 - {primary_keyword}"
-        elif any(keyword in primary_keyword for keyword in finance_keywords):
-            return f"財經動態 - {primary_keyword}"
-        elif any(keyword in primary_keyword for keyword in social_keywords):
-            return f"社會議題 - {primary_keyword}"
-        elif any(keyword in primary_keyword for keyword in life_keywords):
-            return f"生活分享 - {primary_keyword}"
-        else:
-            return f"熱門話題 - {primary_keyword}"
+        # 簡單的主題命名邏輯：名稱只取決於首個關鍵詞
+        return _topic_name_for(keywords[0])
+    
+    def _sentiment_scores(self, contents: Sequence[str],
+                          mini_batch_size: int = SENTIMENT_BATCH_SIZE) -> np.ndarray:
+        """
+        計算每篇貼文的 VADER compound 分數
+        
+        空白內容或分析失敗的貼文記為 NaN，計算平均時會被略過。
+        使用 VADER 且貼文數達到 SENTIMENT_PARALLEL_MIN 時，按 mini_batch_size
+        分批交給進程池計算（VADER 為純 Python，執行緒無法並行）
+        
+        Args:
+            contents: 貼文內容列表
+            mini_batch_size: 每個進程任務處理的貼文數
+            
+        Returns:
+            np.ndarray: 與輸入順序對應的情感分數
+        """
+        if not self.sentiment_analyzer:
+            return np.full(len(contents), np.nan)
+        
+        if (len(contents) >= SENTIMENT_PARALLEL_MIN and SENTIMENT_WORKERS > 1
+                and isinstance(self.sentiment_analyzer, SentimentIntensityAnalyzer)):
+            texts = list(contents)
+            batches = [texts[i:i + mini_batch_size] for i in range(0, len(texts), mini_batch_size)]
+            try:
+                with Pool(processes=SENTIMENT_WORKERS) as pool:
+                    results = pool.map(_sentiment_worker, batches)
+                logger.info(f"並行情感分析完成: {len(texts)} 篇貼文, {SENTIMENT_WORKERS} 個進程")
+                return np.fromiter(
+                    (score for batch in results for score in batch),
+                    dtype=np.float64, count=len(texts)
+                )
+            except Exception as e:
+                logger.warning(f"並行情感分析失敗，改用單進程: {e}")
+        
+        analyzer = self.sentiment_analyzer
+        return np.fromiter(
+            (_compound_or_nan(analyzer, content) for content in contents),
+            dtype=np.float64, count=len(contents)
+        )
     
-    def _analyze_cluster_sentiment(self, contents: List[str]) -> str:
-        """分析聚類的情感傾向"""
-        if not self.sentiment_analyzer or not contents:
+    def _analyze_cluster_sentiment(self, contents: List[str],
+                                   compound_scores: Optional[Sequence[float]] = None,
+                                   mini_batch_size: int = SENTIMENT_BATCH_SIZE) -> str:
+        """
+        分析聚類的情感傾向
+        
+        提供 compound_scores（預先計算的每篇貼文情感分數）時不再重複分析；
+        否則以 mini_batch_size 分批計算
+        """
+        if not self.sentiment_analyzer or not len(contents):
             return "neutral"
         
         try:
-            sentiment_scores = []
-            for content in contents:
-                if content and content.strip():
-                    scores = self.sentiment_analyzer.polarity_scores(content)
-                    sentiment_scores.append(scores['compound'])
+            if compound_scores is None:
+                compound_scores = self._sentiment_scores(contents, mini_batch_size)
             
-            if not sentiment_scores:
-                return "neutral"
+            avg_sentiment = _nan_mean(compound_scores)
             
-            avg_sentiment = np.mean(sentiment_scores)
+            if avg_sentiment is None:
+                return "neutral"
             
             if avg_sentiment > 0.1:
                 return "positive"
@@ -559,28 +1405,60 @@ class DataProcessor:
             return "neutral"
     
     def _calculate_trending_score(self, cluster_posts: pd.DataFrame) -> float:
-        """計算主題的趨勢分數"""
+        """計算主題的趨勢分數（數據框介面，轉為陣列後交給 _trending_score_from_arrays）"""
         try:
-            # 基於時間分佈和互動增長計算趨勢分數
-            posts_sorted = cluster_posts.sort_values('timestamp')
+            if len(cluster_posts) < 2:
+                return 0.0
+            
+            timestamps = cluster_posts['timestamp']
+            return self._trending_score_from_arrays(
+                (timestamps - timestamps.min()).dt.total_seconds().to_numpy(dtype=np.float64),
+                cluster_posts['total_interactions'].to_numpy(dtype=np.float64),
+                cluster_posts['freshness_score'].to_numpy(dtype=np.float64)
+            )
             
-            if len(posts_sorted) < 2:
+        except Exception:
+            return 0.0
+    
+    def _trending_score_from_arrays(self, offset_seconds: np.ndarray, interactions: np.ndarray,
+                                    freshness: np.ndarray) -> float:
+        """
+        以陣列計算主題的趨勢分數
+        
+        只需要時間跨度（最早到最晚）、互動總數和平均新鮮度，
+        以 O(n) 的 min/max 取代排序；安裝 numba 時以編譯核心單次掃描完成
+        
+        Args:
+            offset_seconds: 相對任一基準時間的秒數（NaN 表示缺少時間）
+            interactions: 互動總數
+            freshness: 新鮮度分數
+        """
+        try:
+            if len(offset_seconds) < 2:
                 return 0.0
             
-            # 計算時間跨度內的互動增長趨勢
-            time_diff = (posts_sorted['timestamp'].iloc[-1] - posts_sorted['timestamp'].iloc[0]).total_seconds() / 3600
+            if _trending_score_jit is not None:
+                return float(_trending_score_jit(offset_seconds, interactions, freshness))
             
-            if time_diff <= 0:
+            # 計算時間跨度內的互動增長趨勢（NaN 不參與 min/max）
+            valid_times = offset_seconds[~np.isnan(offset_seconds)]
+            if not valid_times.size:
+                return 0.0
+            time_diff = (valid_times.max() - valid_times.min()) / 3600
+            
+            if not time_diff > 0:
                 return 0.0
             
             # 互動密度隨時間的變化
-            interaction_velocity = posts_sorted['total_interactions'].sum() / time_diff
+            interaction_velocity = interactions.sum() / time_diff
             
             # 結合新鮮度和互動速度
-            avg_freshness = posts_sorted['freshness_score'].mean()
+            avg_freshness = _nan_mean(freshness)
+            if avg_freshness is None:
+                return 0.0
             trending_score = interaction_velocity * avg_freshness
             
-            return min(trending_score / 100, 1.0)  # 歸一化到0-1
+            return float(min(trending_score / 100, 1.0))  # 歸一化到0-1
             
         except Exception:
             return 0.0
@@ -604,46 +1482,80 @@ class DataProcessor:
             df['date'] = df['timestamp'].dt.date
             
             # 提取所有文本的關鍵詞
-            all_keywords = self.extract_keywords(df['content'].tolist(), max_features=50)
+            all_keywords = self.extract_keywords(
+                df['content'].tolist(),
+                max_features=50,
+                tokens=df['tokens'].tolist() if 'tokens' in df.columns else None
+            )
             top_keywords = [kw[0] for kw in all_keywords[:20]]  # 取前20個關鍵詞
             
             keyword_trends = []
             
-            for keyword in top_keywords:
-                # 找到包含該關鍵詞的貼文
-                keyword_posts = df[df['content'].str.contains(keyword, case=False, na=False)]
+            # 單次掃描建立關鍵詞到貼文行號的倒排索引
+            postings = self._build_keyword_postings(df['content'].tolist(), top_keywords)
+            
+            kept_keywords = [
+                keyword for keyword in top_keywords
+                if len(postings[keyword]) >= self.keyword_min_freq
+            ]
+            if not kept_keywords:
+                logger.info("完成 0 個關鍵詞的趨勢分析")
+                return keyword_trends
+            
+            # 展開為 (關鍵詞, 貼文) 配對後一次完成所有關鍵詞的按日分組統計
+            rows = np.concatenate([postings[keyword] for keyword in kept_keywords])
+            codes = np.repeat(
+                np.arange(len(kept_keywords)),
+                [len(postings[keyword]) for keyword in kept_keywords]
+            )
+            if 'sentiment' not in df.columns:
+                df['sentiment'] = self._sentiment_scores(df['content'].tolist())
+            expanded = df.iloc[rows][
+                ['date', 'post_id', 'total_interactions', 'content', 'sentiment']
+            ].reset_index(drop=True)
+            expanded['keyword'] = pd.Categorical.from_codes(codes, categories=kept_keywords)
+            
+            daily_stats = expanded.groupby(['keyword', 'date'], observed=True, sort=True).agg(
+                post_count=('post_id', 'count'),
+                total_interactions=('total_interactions', 'sum'),
+                contents=('content', list),
+                sentiments=('sentiment', list)
+            )
+            
+            keyword_masks = {}
+            day_buckets = _day_buckets(df['timestamp'])
+            
+            # 計算每個關鍵詞每天的趨勢數據
+            for (keyword, date), post_count, total_interactions, contents, sentiments in zip(
+                daily_stats.index,
+                daily_stats['post_count'].tolist(),
+                daily_stats['total_interactions'].tolist(),
+                daily_stats['contents'].tolist(),
+                daily_stats['sentiments'].tolist()
+            ):
+                keyword_mask = keyword_masks.get(keyword)
+                if keyword_mask is None:
+                    keyword_mask = np.zeros(len(df), dtype=bool)
+                    keyword_mask[postings[keyword]] = True
+                    keyword_masks[keyword] = keyword_mask
                 
-                if len(keyword_posts) < self.keyword_min_freq:
-                    continue
+                # 計算動量分數（基於最近幾天的變化）
+                momentum_score = self._calculate_keyword_momentum(
+                    keyword, date, df, days=3,
+                    keyword_mask=keyword_mask, day_buckets=day_buckets
+                )
                 
-                # 按日期分組統計
-                daily_stats = keyword_posts.groupby('date').agg({
-                    'post_id': 'count',
-                    'total_interactions': 'sum',
-                    'timestamp': 'count'
-                }).rename(columns={'post_id': 'post_count'})
+                # 情感分析
+                avg_sentiment = self._analyze_sentiment_for_posts(contents, compound_scores=sentiments)
                 
-                # 計算每天的趨勢數據
-                for date, stats in daily_stats.iterrows():
-                    # 計算動量分數（基於最近幾天的變化）
-                    momentum_score = self._calculate_keyword_momentum(
-                        keyword, date, df, days=3
-                    )
-                    
-                    # 情感分析
-                    keyword_posts_day = keyword_posts[keyword_posts['date'] == date]
-                    avg_sentiment = self._analyze_sentiment_for_posts(
-                        keyword_posts_day['content'].tolist()
-                    )
-                    
-                    keyword_trends.append(KeywordTrend(
-                        keyword=keyword,
-                        date=date.isoformat(),
-                        post_count=int(stats['post_count']),
-                        total_interactions=int(stats['total_interactions']),
-                        average_sentiment=avg_sentiment,
-                        momentum_score=momentum_score
-                    ))
+                keyword_trends.append(KeywordTrend(
+                    keyword=keyword,
+                    date=date.isoformat(),
+                    post_count=int(post_count),
+                    total_interactions=int(total_interactions),
+                    average_sentiment=avg_sentiment,
+                    momentum_score=momentum_score
+                ))
             
             logger.info(f"完成 {len(set(kt.keyword for kt in keyword_trends))} 個關鍵詞的趨勢分析")
             return keyword_trends
@@ -652,57 +1564,100 @@ class DataProcessor:
             logger.error(f"關鍵詞趨勢分析失敗: {e}")
             return []
     
-    def _calculate_keyword_momentum(self, keyword: str, current_date, df: pd.DataFrame, days: int = 3) -> float:
-        """計算關鍵詞動量分數"""
+    def _build_keyword_postings(self, contents: List[str], keywords: List[str]) -> Dict[str, List[int]]:
+        """
+        建立關鍵詞倒排索引
+        
+        對所有貼文只掃描一次，以不分大小寫的子字串比對記錄每個關鍵詞出現的行號
+        
+        Args:
+            contents: 貼文內容列表
+            keywords: 關鍵詞列表
+            
+        Returns:
+            Dict[str, List[int]]: 關鍵詞 -> 包含該詞的貼文行號
+        """
+        lowered_keywords = [(keyword, keyword.lower()) for keyword in keywords]
+        postings: Dict[str, List[int]] = {keyword: [] for keyword in keywords}
+        
+        for i, content in enumerate(contents):
+            if not isinstance(content, str) or not content:
+                continue
+            text = content.lower()
+            for keyword, needle in lowered_keywords:
+                if needle in text:
+                    postings[keyword].append(i)
+        
+        return postings
+    
+    def _calculate_keyword_momentum(self, keyword: str, current_date, df: pd.DataFrame, days: int = 3,
+                                    keyword_mask: Optional[np.ndarray] = None,
+                                    day_buckets: Optional[np.ndarray] = None) -> float:
+        """
+        計算關鍵詞動量分數
+        
+        keyword_mask 和 day_buckets（由 _day_buckets 計算）可由呼叫方預先計算後傳入，
+        在多個關鍵詞和日期間共用
+        """
         try:
-            # 獲取關鍵詞在最近幾天的出現頻率
-            end_date = pd.to_datetime(current_date)
-            start_date = end_date - timedelta(days=days)
-            
-            recent_posts = df[
-                (df['timestamp'].dt.date >= start_date.date()) & 
-                (df['timestamp'].dt.date <= end_date.date()) &
-                (df['content'].str.contains(keyword, case=False, na=False))
+            # 獲取關鍵詞在最近幾天的出現頻率（以整數日序號比較）
+            end_day = int(np.datetime64(pd.to_datetime(current_date).date(), 'D').astype(np.int64))
+            start_day = end_day - days
+            
+            if keyword_mask is None:
+                keyword_mask = df['content'].str.contains(keyword, case=False, na=False, regex=False)
+            if day_buckets is None:
+                day_buckets = _day_buckets(df['timestamp'])
+            
+            recent_days = day_buckets[
+                (day_buckets >= start_day) &
+                (day_buckets <= end_day) &
+                np.asarray(keyword_mask, dtype=bool)
             ]
             
-            if len(recent_posts) < 2:
+            if len(recent_days) < 2:
                 return 0.0
             
-            # 按天分組計算頻率變化
-            daily_counts = recent_posts.groupby(recent_posts['timestamp'].dt.date).size()
+            # 按天統計頻率，只保留有貼文的日期
+            daily_counts = np.bincount(recent_days - start_day)
+            values = daily_counts[daily_counts > 0]
             
-            if len(daily_counts) < 2:
+            if len(values) < 2:
                 return 0.0
             
             # 計算變化率
-            values = daily_counts.values
-            momentum = (values[-1] - values[0]) / (len(values) - 1) if len(values) > 1 else 0
+            momentum = (values[-1] - values[0]) / (len(values) - 1)
             
-            return max(0, momentum)  # 只關注正向動量
+            return max(0, float(momentum))  # 只關注正向動量
             
         except Exception:
             return 0.0
     
-    def _analyze_sentiment_for_posts(self, contents: List[str]) -> float:
-        """分析貼文列表的平均情感分數"""
-        if not self.sentiment_analyzer or not contents:
+    def _analyze_sentiment_for_posts(self, contents: List[str],
+                                     compound_scores: Optional[Sequence[float]] = None) -> float:
+        """
+        分析貼文列表的平均情感分數
+        
+        提供 compound_scores（預先計算的每篇貼文情感分數）時不再重複分析
+        """
+        if not self.sentiment_analyzer or not len(contents):
             return 0.0
         
         try:
-            scores = []
-            for content in contents:
-                if content and content.strip():
-                    sentiment_scores = self.sentiment_analyzer.polarity_scores(content)
-                    scores.append(sentiment_scores['compound'])
+            if compound_scores is None:
+                compound_scores = self._sentiment_scores(contents)
             
-            return np.mean(scores) if scores else 0.0
+            avg_sentiment = _nan_mean(compound_scores)
+            
+            return avg_sentiment if avg_sentiment is not None else 0.0
             
         except Exception:
             return 0.0
     
     def save_processed_data(self, post_metrics: List[PostMetrics], 
                           topic_summaries: List[TopicSummary],
-                          keyword_trends: List[KeywordTrend]) -> Dict[str, int]:
+                          keyword_trends: List[KeywordTrend],
+                          current_time: Optional[datetime] = None) -> Dict[str, int]:
         """
         保存處理後的數據到數據庫
         
@@ -710,6 +1665,7 @@ class DataProcessor:
             post_metrics: 貼文指標列表
             topic_summaries: 主題摘要列表  
             keyword_trends: 關鍵詞趨勢列表
+            current_time: 處理時間，未提供時使用當前時間
             
         Returns:
             Dict[str, int]: 保存結果統計
@@ -722,81 +1678,60 @@ class DataProcessor:
         }
         
         try:
-            # 保存貼文指標
-            if post_metrics:
-                for metric in post_metrics:
-                    try:
-                        metric_data = {
-                            'post_id': metric.post_id,
-                            'total_interactions': metric.total_interactions,
-                            'heat_density': metric.heat_density,
-                            'freshness_score': metric.freshness_score,
-                            'engagement_rate': metric.engagement_rate,
-                            'viral_potential': metric.viral_potential,
-                            'processed_at': datetime.now(timezone.utc).isoformat()
-                        }
-                        
-                        result = self.db_manager.client.table('processed_post_metrics').upsert(
-                            metric_data, on_conflict='post_id'
-                        ).execute()
-                        
-                        if result.data:
-                            results['post_metrics_saved'] += 1
-                        
-                    except Exception as e:
-                        logger.error(f"保存貼文指標失敗: {e}")
-                        results['errors'] += 1
+            # 處理時間對整批數據只計算一次
+            processed_at = (current_time or datetime.now(timezone.utc)).isoformat()
+            
+            # 保存貼文指標（同一 post_id 只保留最後一條，避免同批 upsert 衝突）
+            metric_rows = list({
+                metric.post_id: {
+                    'post_id': metric.post_id,
+                    'total_interactions': metric.total_interactions,
+                    'heat_density': metric.heat_density,
+                    'freshness_score': metric.freshness_score,
+                    'engagement_rate': metric.engagement_rate,
+                    'viral_potential': metric.viral_potential,
+                    'processed_at': processed_at
+                }
+                for metric in post_metrics
+            }.values())
+            saved, errors = self._save_rows('processed_post_metrics', metric_rows, on_conflict='post_id')
+            results['post_metrics_saved'] += saved
+            results['errors'] += errors
             
             # 保存主題摘要
-            if topic_summaries:
-                for topic in topic_summaries:
-                    try:
-                        topic_data = {
-                            'topic_keywords': topic.topic_keywords,
-                            'topic_name': topic.topic_name,
-                            'post_count': topic.post_count,
-                            'average_heat_density': topic.average_heat_density,
-                            'total_interactions': topic.total_interactions,
-                            'dominant_sentiment': topic.dominant_sentiment,
-                            'trending_score': topic.trending_score,
-                            'processed_at': datetime.now(timezone.utc).isoformat()
-                        }
-                        
-                        result = self.db_manager.client.table('processed_topic_summary').insert(
-                            topic_data
-                        ).execute()
-                        
-                        if result.data:
-                            results['topics_saved'] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"保存主題摘要失敗: {e}")
-                        results['errors'] += 1
-            
-            # 保存關鍵詞趨勢
-            if keyword_trends:
-                for trend in keyword_trends:
-                    try:
-                        trend_data = {
-                            'keyword': trend.keyword,
-                            'date': trend.date,
-                            'post_count': trend.post_count,
-                            'total_interactions': trend.total_interactions,
-                            'average_sentiment': trend.average_sentiment,
-                            'momentum_score': trend.momentum_score,
-                            'processed_at': datetime.now(timezone.utc).isoformat()
-                        }
-                        
-                        result = self.db_manager.client.table('processed_keyword_trends').upsert(
-                            trend_data, on_conflict='keyword,date'
-                        ).execute()
-                        
-                        if result.data:
-                            results['trends_saved'] += 1
-                            
-                    except Exception as e:
-                        logger.error(f"保存關鍵詞趨勢失敗: {e}")
-                        results['errors'] += 1
+            topic_rows = [
+                {
+                    'topic_keywords': topic.topic_keywords,
+                    'topic_name': topic.topic_name,
+                    'post_count': topic.post_count,
+                    'average_heat_density': topic.average_heat_density,
+                    'total_interactions': topic.total_interactions,
+                    'dominant_sentiment': topic.dominant_sentiment,
+                    'trending_score': topic.trending_score,
+                    'processed_at': processed_at
+                }
+                for topic in topic_summaries
+            ]
+            saved, errors = self._save_rows('processed_topic_summary', topic_rows)
+            results['topics_saved'] += saved
+            results['errors'] += errors
+            
+            # 保存關鍵詞趨勢（同一 keyword+date 只保留最後一條）
+            trend_rows = list({
+                (trend.keyword, trend.date): {
+                    'keyword': trend.keyword,
+                    'date': trend.date,
+                    'post_count': trend.post_count,
+                    'total_interactions': trend.total_interactions,
+                    'average_sentiment': trend.average_sentiment,
+                    'momentum_score': trend.momentum_score,
+                    'processed_at': processed_at
+                }
+                for trend in keyword_trends
+            }.values())
+            saved, errors = self._save_rows('processed_keyword_trends', trend_rows, on_conflict='keyword,date')
+            results['trends_saved'] += saved
+            results['errors'] += errors
             
             logger.info(f"數據保存完成: {results}")
             return results
@@ -806,6 +1741,39 @@ class DataProcessor:
             results['errors'] += 1
             return results
     
+    def _save_rows(self, table: str, rows: List[Dict[str, Any]],
+                   on_conflict: Optional[str] = None) -> Tuple[int, int]:
+        """
+        按 BATCH_SIZE 分批寫入數據表，每批一次請求
+        
+        Args:
+            table: 數據表名稱
+            rows: 要寫入的行數據
+            on_conflict: upsert 的衝突欄位，None 表示直接插入
+            
+        Returns:
+            Tuple[int, int]: (成功寫入行數, 失敗行數)
+        """
+        saved = 0
+        errors = 0
+        
+        for i in range(0, len(rows), BATCH_SIZE):
+            batch = rows[i:i + BATCH_SIZE]
+            try:
+                query = self.db_manager.client.table(table)
+                if on_conflict:
+                    result = query.upsert(batch, on_conflict=on_conflict).execute()
+                else:
+                    result = query.insert(batch).execute()
+                
+                saved += len(result.data or [])
+                
+            except Exception as e:
+                logger.error(f"保存 {table} 失敗 ({len(batch)} 行): {e}")
+                errors += len(batch)
+        
+        return saved, errors
+    
     def run_full_analysis(self, days_back: int = 7) -> Dict[str, Any]:
         """
         執行完整的數據分析流程
@@ -831,9 +1799,12 @@ class DataProcessor:
         start_time = datetime.now()
         
         try:
+            # 整個流程共用同一個基準時間，避免各步驟間的時間漂移
+            current_time = datetime.now(timezone.utc)
+            
             # 1. 獲取原始數據
             logger.info("步驟 1: 獲取原始貼文數據")
-            df = self.fetch_raw_posts(days_back)
+            df = self.fetch_raw_posts(days_back, current_time=current_time)
             
             if df.empty:
                 logger.warning("沒有數據可供分析")
@@ -841,24 +1812,27 @@ class DataProcessor:
             
             results_summary['posts_processed'] = len(df)
             
+            # 每篇貼文只分詞一次，供聚類和關鍵詞分析共用
+            df['tokens'] = self._tokenize_many(df['content'].tolist())
+            # 每篇貼文只做一次情感分析，供聚類和關鍵詞趨勢共用
+            df['sentiment'] = self._sentiment_scores(df['content'].tolist())
+            
             # 2. 計算貼文指標
             logger.info("步驟 2: 計算貼文指標")
-            df = self.calculate_heat_density(df)
-            df = self.calculate_freshness_score(df)
-            df = self.calculate_engagement_rate(df)
-            df = self.calculate_viral_potential(df)
-            
-            # 創建貼文指標對象
-            post_metrics = []
-            for _, row in df.iterrows():
-                post_metrics.append(PostMetrics(
-                    post_id=row['post_id'],
-                    total_interactions=int(row['total_interactions']),
-                    heat_density=float(row['heat_density']),
-                    freshness_score=float(row['freshness_score']),
-                    engagement_rate=float(row['engagement_rate']),
-                    viral_potential=float(row['viral_potential'])
-                ))
+            df = self.compute_all_metrics(df, current_time=current_time)
+            
+            # 創建貼文指標對象（直接遍歷列數組，避免 iterrows 為每行建立 Series）
+            post_metrics = [
+                PostMetrics(*values)
+                for values in zip(
+                    df['post_id'].tolist(),
+                    df['total_interactions'].to_numpy(np.int64).tolist(),
+                    df['heat_density'].to_numpy(np.float64).tolist(),
+                    df['freshness_score'].to_numpy(np.float64).tolist(),
+                    df['engagement_rate'].to_numpy(np.float64).tolist(),
+                    df['viral_potential'].to_numpy(np.float64).tolist()
+                )
+            ]
             
             results_summary['metrics_calculated'] = len(post_metrics)
             
@@ -874,7 +1848,9 @@ class DataProcessor:
             
             # 5. 保存處理結果
             logger.info("步驟 5: 保存分析結果")
-            save_results = self.save_processed_data(post_metrics, topic_summaries, keyword_trends)
+            save_results = self.save_processed_data(
+                post_metrics, topic_summaries, keyword_trends, current_time=current_time
+            )
             results_summary['save_results'] = save_results
             
             # 計算執行時間
@@ -3,14 +3,20 @@ Threads 數據爬蟲腳本
 實現穩定抓取 Threads 平台貼文數據並存入 Supabase
 """
 
+import gzip
 import json
 import time
 import random
 import hashlib
 import logging
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple, Iterator
+from dataclasses import dataclass, fields
 import os
 
 import requests
@@ -20,7 +26,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from fake_useragent import UserAgent
 from retry import retry
 from dotenv import load_dotenv
@@ -47,7 +53,74 @@ except ImportError:
     SUPABASE_AVAILABLE = False
     logger.warning("Supabase 模組不可用，將僅保存到 JSON 文件")
 
-@dataclass
+# 可選：xxhash 生成貼文ID（POST_ID_HASH=xxh128 時啟用）
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# 可選：orjson 序列化 JSON 輸出（不可用時退回標準庫 json）
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 預先抽取的 User-Agent 數量
+UA_POOL_SIZE = 32
+
+# 從 aria-label 中提取互動數量
+_DIGIT_RE = re.compile(r'\d+')
+
+# 在瀏覽器中一次提取頁面上所有貼文的欄位，避免每篇貼文多次 find_element 往返
+_POST_EXTRACTOR_JS = """
+const attr = (root, selector, name) => {
+    const el = root.querySelector(selector);
+    return el ? el.getAttribute(name) : null;
+};
+return Array.from(document.querySelectorAll('[data-testid="post"]')).slice(0, arguments[0]).map(e => {
+    const text = e.querySelector('[data-testid="post-text"]');
+    return {
+        content: text ? text.innerText : null,
+        timestamp: attr(e, 'time', 'datetime'),
+        has_time: e.querySelector('time') !== null,
+        like: attr(e, arguments[1].like, 'aria-label'),
+        reply: attr(e, arguments[1].reply, 'aria-label'),
+        repost: attr(e, arguments[1].repost, 'aria-label'),
+        images: Array.from(e.querySelectorAll('img[src*="cdninstagram"]'))
+            .map(img => img.src)
+            .filter(src => src && src.includes('cdninstagram'))
+    };
+});
+"""
+
+# 每個帳號最多抓取的貼文數
+MAX_POSTS_PER_ACCOUNT = 20
+
+# 頁面上貼文元素的選擇器
+POST_SELECTOR = '[data-testid="post"]'
+_POST_COUNT_JS = f"return document.querySelectorAll('{POST_SELECTOR}').length"
+
+# 個人頁面 HTML 中的用戶 ID 和 LSD token，用於調用 GraphQL 接口
+_USER_ID_RE = re.compile(r'"user_id":"(\d+)"')
+_LSD_RE = re.compile(r'"LSD",\[\],\{"token":"([^"]+)"')
+
+def _canonical_timestamp(timestamp: str) -> str:
+    """
+    將 ISO 8601 時間戳統一為精確到秒的 UTC 格式（YYYY-MM-DDTHH:MM:SSZ）
+    
+    無時區的時間視為 UTC；無法解析時原樣返回
+    """
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return timestamp
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+@dataclass(slots=True)
 class ThreadsPost:
     """Threads 貼文數據結構"""
     post_id: str
@@ -61,39 +134,218 @@ class ThreadsPost:
     post_url: str
     scraped_at: str
 
+# ThreadsPost 欄位名稱，供淺拷貝轉換使用
+_POST_FIELDS = tuple(f.name for f in fields(ThreadsPost))
+
+
+def _post_to_dict(post: ThreadsPost) -> Dict[str, Any]:
+    """將 ThreadsPost 淺拷貝為字典，避免 asdict() 遞歸深拷貝 images 列表"""
+    return {name: getattr(post, name) for name in _POST_FIELDS}
+
+
+def _dumps_line(record: Dict[str, Any]) -> bytes:
+    """將單筆記錄序列化為一行 UTF-8 JSON（含換行）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+def _load_accounts_file() -> List[str]:
+    """從 accounts.json 載入要爬取的帳號列表"""
+    try:
+        with open('accounts.json', 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            # 駐留用戶名，所有貼文共享同一字串對象
+            return [sys.intern(username) for username in data.get('accounts', [])]
+    except FileNotFoundError:
+        logger.error("accounts.json 文件未找到")
+        return []
+    except json.JSONDecodeError as e:
+        logger.error(f"解析 accounts.json 失敗: {e}")
+        return []
+
+
+@dataclass(frozen=True, slots=True)
+class ScraperConfig:
+    """爬蟲配置：環境變數和帳號列表，建立後不可修改，可在執行緒間共享"""
+    base_url: str
+    delay_min: int
+    delay_max: int
+    timeout: int
+    retry_attempts: int
+    headless: bool
+    max_workers: int
+    # 輸出文件格式：json（縮排的 JSON 陣列）或 jsonl.gz（gzip 壓縮、每行一篇貼文）
+    output_format: str
+    # 每次滾動後等待新貼文出現的最長秒數，逾時視為已到底
+    scroll_wait_timeout: float
+    post_id_hash: str
+    graphql_doc_id: str
+    app_id: str
+    accounts: Tuple[str, ...]
+    
+    @classmethod
+    def from_env(cls) -> 'ScraperConfig':
+        """從環境變數和 accounts.json 建立配置"""
+        return cls(
+            base_url=os.getenv('THREADS_BASE_URL', 'https://www.threads.com'),
+            delay_min=int(os.getenv('SCRAPER_DELAY_MIN', '2')),
+            delay_max=int(os.getenv('SCRAPER_DELAY_MAX', '5')),
+            timeout=int(os.getenv('SCRAPER_TIMEOUT', '30')),
+            retry_attempts=int(os.getenv('SCRAPER_RETRY_ATTEMPTS', '3')),
+            headless=os.getenv('HEADLESS_MODE', 'true').lower() == 'true',
+            max_workers=max(1, int(os.getenv('SCRAPER_WORKERS', '4'))),
+            output_format=os.getenv('SCRAPER_OUTPUT_FORMAT', 'json').lower(),
+            scroll_wait_timeout=float(os.getenv('SCRAPER_SCROLL_WAIT', '2')),
+            post_id_hash=os.getenv('POST_ID_HASH', 'md5').lower(),
+            graphql_doc_id=os.getenv('THREADS_GRAPHQL_DOC_ID', ''),
+            app_id=os.getenv('THREADS_APP_ID', '238260118697367'),
+            accounts=tuple(_load_accounts_file())
+        )
+
+
+@lru_cache(maxsize=1)
+def _get_config() -> ScraperConfig:
+    """
+    取得進程內共享的爬蟲配置，首次調用時載入
+    
+    修改環境變數或 accounts.json 後需調用 _get_config.cache_clear() 重新載入
+    """
+    return ScraperConfig.from_env()
+
 class ThreadsScraper:
     """Threads 爬蟲主類"""
     
+    # 阻擋圖片和字型下載：圖片只需 <img src> 網址，不需實際像素
+    CHROME_CONTENT_PREFS = {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.fonts': 2,
+    }
+    
+    # 各互動類型對應的元素選擇器
+    INTERACTION_SELECTORS = {
+        'like': '[aria-label*="like"], [aria-label*="讚"]',
+        'reply': '[aria-label*="reply"], [aria-label*="回覆"]',
+        'repost': '[aria-label*="repost"], [aria-label*="轉發"]'
+    }
+    
     def __init__(self):
-        self.base_url = os.getenv('THREADS_BASE_URL', 'https://www.threads.com')
-        self.delay_min = int(os.getenv('SCRAPER_DELAY_MIN', '2'))
-        self.delay_max = int(os.getenv('SCRAPER_DELAY_MAX', '5'))
-        self.timeout = int(os.getenv('SCRAPER_TIMEOUT', '30'))
-        self.retry_attempts = int(os.getenv('SCRAPER_RETRY_ATTEMPTS', '3'))
-        self.headless = os.getenv('HEADLESS_MODE', 'true').lower() == 'true'
+        config = _get_config()
+        self.base_url = config.base_url
+        self.delay_min = config.delay_min
+        self.delay_max = config.delay_max
+        self.timeout = config.timeout
+        self.retry_attempts = config.retry_attempts
+        self.headless = config.headless
+        self.max_workers = config.max_workers
+        self.output_format = config.output_format
+        self.scroll_wait_timeout = config.scroll_wait_timeout
+        
+        # 貼文ID雜湊算法：預設 md5 以保持與既有數據一致；xxh128 同為32位十六進位但更快
+        # 加上 -canonical 後綴（如 md5-canonical）時先標準化時間戳和內容再雜湊，會使既有貼文ID失去對應
+        algorithm, _, mode = config.post_id_hash.partition('-')
+        self.post_id_hash = algorithm
+        self.post_id_canonical = mode == 'canonical'
+        if self.post_id_hash == 'xxh128' and not XXHASH_AVAILABLE:
+            logger.warning("xxhash 未安裝，貼文ID改用 md5")
+            self.post_id_hash = 'md5'
+        
+        # GraphQL 接口配置：設置 doc_id 後優先以 HTTP 抓取，失敗時退回 Selenium
+        self.graphql_doc_id = config.graphql_doc_id
+        self.app_id = config.app_id
+        self._user_ids: Dict[str, str] = {}
+        # Selenium 路徑的貼文URL按用戶緩存
+        self._placeholder_urls: Dict[str, str] = {}
         
         self.ua = UserAgent()
+        # 預先抽取一組 User-Agent，之後只做 random.choice（避免在多執行緒中共用 fake_useragent 的內部狀態）
+        self._ua_pool = list(dict.fromkeys(self.ua.random for _ in range(UA_POOL_SIZE)))
         self.session = self._create_session()
+        
+        # 每個執行緒使用各自的 WebDriver（Selenium driver 非執行緒安全）
+        self._local = threading.local()
+        self._drivers: Dict[int, webdriver.Chrome] = {}
+        self._drivers_lock = threading.Lock()
         self.driver = None
         
-        # 載入帳號列表
-        self.accounts = self._load_accounts()
+        # 帳號列表隨配置只載入一次
+        self.accounts = list(config.accounts)
         
         # 初始化 Supabase 管理器
         self.db_manager = None
         if SUPABASE_AVAILABLE:
             try:
-                self.db_manager = SupabaseManager()
+                self.db_manager = SupabaseManager.instance()
                 logger.info("Supabase 數據庫連接已建立")
             except Exception as e:
                 logger.error(f"無法連接到 Supabase: {e}")
                 self.db_manager = None
         
+    @property
+    def driver(self) -> Optional[webdriver.Chrome]:
+        """當前執行緒的 WebDriver"""
+        return getattr(self._local, 'driver', None)
+    
+    @driver.setter
+    def driver(self, value: Optional[webdriver.Chrome]):
+        self._local.driver = value
+        with self._drivers_lock:
+            if value is None:
+                self._drivers.pop(threading.get_ident(), None)
+            else:
+                self._drivers[threading.get_ident()] = value
+    
+    def _quit_drivers(self, keep_current: bool = False):
+        """關閉已建立的 WebDriver，可選擇保留當前執行緒的實例"""
+        current = threading.get_ident()
+        with self._drivers_lock:
+            targets = [
+                (ident, driver) for ident, driver in self._drivers.items()
+                if not (keep_current and ident == current)
+            ]
+            for ident, _ in targets:
+                del self._drivers[ident]
+        
+        for _, driver in targets:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning(f"關閉 Chrome Driver 失敗: {e}")
+        
+        if not keep_current:
+            self._local.driver = None
+    
+    def _discard_driver(self):
+        """關閉並移除當前執行緒的 WebDriver，下次調用 _init_driver 時重新建立"""
+        driver = self.driver
+        self.driver = None
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"關閉 Chrome Driver 失敗: {e}")
+    
+    def _driver_wait(self, driver, timeout: float) -> WebDriverWait:
+        """取得綁定 driver 的 WebDriverWait，同一 driver 的相同逾時只建立一次"""
+        cached = getattr(self._local, 'waits', None)
+        if cached is None or cached[0] is not driver:
+            cached = (driver, {})
+            self._local.waits = cached
+        
+        waits = cached[1]
+        if timeout not in waits:
+            waits[timeout] = WebDriverWait(driver, timeout)
+        return waits[timeout]
+    
+    def _random_user_agent(self) -> str:
+        """從預先抽取的 User-Agent 中隨機選擇一個"""
+        return random.choice(self._ua_pool)
+    
     def _create_session(self) -> requests.Session:
         """創建HTTP會話"""
         session = requests.Session()
         session.headers.update({
-            'User-Agent': self.ua.random,
+            'User-Agent': self._random_user_agent(),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-TW,zh;q=0.9,en;q=0.8',
             'Accept-Encoding': 'gzip, deflate, br',
@@ -104,16 +356,7 @@ class ThreadsScraper:
     
     def _load_accounts(self) -> List[str]:
         """載入要爬取的帳號列表"""
-        try:
-            with open('accounts.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('accounts', [])
-        except FileNotFoundError:
-            logger.error("accounts.json 文件未找到")
-            return []
-        except json.JSONDecodeError as e:
-            logger.error(f"解析 accounts.json 失敗: {e}")
-            return []
+        return _load_accounts_file()
     
     def _init_driver(self) -> webdriver.Chrome:
         """初始化 Chrome WebDriver"""
@@ -129,7 +372,12 @@ class ThreadsScraper:
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_argument(f'--user-agent={self.ua.random}')
+        chrome_options.add_experimental_option('prefs', self.CHROME_CONTENT_PREFS)
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-background-networking')
+        chrome_options.add_argument(f'--user-agent={self._random_user_agent()}')
         
         try:
             self.driver = webdriver.Chrome(options=chrome_options)
@@ -145,9 +393,19 @@ class ThreadsScraper:
         time.sleep(delay)
     
     def _generate_post_id(self, username: str, content: str, timestamp: str) -> str:
-        """生成貼文唯一ID"""
-        raw_string = f"{username}_{content[:100]}_{timestamp}"
-        return hashlib.md5(raw_string.encode('utf-8')).hexdigest()
+        """
+        生成貼文唯一ID
+        
+        啟用 -canonical 時，時間戳和內容先標準化，GraphQL（taken_at 轉成的 +00:00 時間、caption.text）與
+        Selenium（<time datetime> 的 ...000Z、innerText）兩條路徑對同一篇貼文產生相同ID
+        """
+        if self.post_id_canonical:
+            content = ' '.join(content.split())
+            timestamp = _canonical_timestamp(timestamp)
+        raw_string = f"{username}_{content[:100]}_{timestamp}".encode('utf-8')
+        if self.post_id_hash == 'xxh128':
+            return xxhash.xxh3_128_hexdigest(raw_string)
+        return hashlib.md5(raw_string).hexdigest()
     
     def _extract_post_data_selenium(self, username: str) -> List[ThreadsPost]:
         """使用 Selenium 提取用戶貼文數據"""
@@ -160,50 +418,257 @@ class ThreadsScraper:
             logger.info(f"正在爬取用戶: {username}")
             
             driver.get(user_url)
-            self._random_delay()
             
-            # 等待頁面載入
-            wait = WebDriverWait(driver, self.timeout)
+            # 等待第一篇貼文出現；沒有貼文的頁面逾時後照常繼續
+            try:
+                self._driver_wait(driver, self.timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, POST_SELECTOR))
+                )
+            except TimeoutException:
+                logger.warning(f"{username} 頁面未出現貼文")
             
-            # 滾動頁面載入更多貼文
-            last_height = driver.execute_script("return document.body.scrollHeight")
+            # 滾動頁面載入更多貼文：等到貼文數增加即繼續，不再固定休眠
+            post_count = self._count_posts(driver)
             scroll_attempts = 0
             max_scrolls = 5  # 限制滾動次數避免無限滾動
             
-            while scroll_attempts < max_scrolls:
+            while scroll_attempts < max_scrolls and post_count < MAX_POSTS_PER_ACCOUNT:
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                self._random_delay()
                 
-                new_height = driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
+                new_count = self._wait_for_more_posts(driver, post_count)
+                if new_count is None:
                     break
-                    
-                last_height = new_height
+                
+                post_count = new_count
                 scroll_attempts += 1
             
-            # 提取貼文元素
-            post_elements = driver.find_elements(By.CSS_SELECTOR, '[data-testid="post"]')
+            # 提取貼文數據：優先以單次腳本取得所有欄位，失敗時逐個元素解析
+            post_records = self._extract_post_records(driver)
+            # 同一批貼文共用一個抓取時間
+            scraped_at = datetime.now(timezone.utc).isoformat()
             
-            for element in post_elements[:20]:  # 限制每次最多抓取20篇貼文
-                try:
-                    post_data = self._parse_post_element(element, username)
+            if post_records is not None:
+                for record in post_records:
+                    post_data = self._parse_post_record(record, username, scraped_at)
                     if post_data:
                         posts.append(post_data)
-                except Exception as e:
-                    logger.warning(f"解析貼文失敗: {e}")
-                    continue
+            else:
+                post_elements = driver.find_elements(By.CSS_SELECTOR, POST_SELECTOR)
+                
+                for element in post_elements[:MAX_POSTS_PER_ACCOUNT]:  # 限制每次最多抓取的貼文數
+                    try:
+                        post_data = self._parse_post_element(element, username, scraped_at)
+                        if post_data:
+                            posts.append(post_data)
+                    except Exception as e:
+                        logger.warning(f"解析貼文失敗: {e}")
+                        continue
             
             logger.info(f"成功爬取 {username} 的 {len(posts)} 篇貼文")
             
         except TimeoutException:
             logger.error(f"載入 {username} 頁面超時")
+        except WebDriverException as e:
+            # 瀏覽器崩潰或會話失效：丟棄此 driver，讓重試和同執行緒的後續帳號改用新實例
+            logger.error(f"爬取 {username} 時 Chrome Driver 失效: {e}")
+            self._discard_driver()
+            raise
         except Exception as e:
             logger.error(f"爬取 {username} 失敗: {e}")
         
         return posts
     
-    def _parse_post_element(self, element, username: str) -> Optional[ThreadsPost]:
-        """解析單個貼文元素"""
+    def _fetch_profile_tokens(self, username: str) -> Tuple[str, str]:
+        """
+        從用戶個人頁面取得用戶 ID 和 LSD token
+        
+        Returns:
+            Tuple[str, str]: (用戶 ID, LSD token)
+        """
+        response = self.session.get(
+            f"{self.base_url}/@{username}",
+            headers={'User-Agent': self._random_user_agent()},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        
+        html = response.text
+        user_id = self._user_ids.get(username)
+        if not user_id:
+            match = _USER_ID_RE.search(html)
+            if not match:
+                raise ValueError(f"無法從頁面取得 {username} 的用戶 ID")
+            user_id = self._user_ids[username] = match.group(1)
+        
+        lsd_match = _LSD_RE.search(html)
+        return user_id, lsd_match.group(1) if lsd_match else ''
+    
+    def _extract_post_data_http(self, username: str) -> Optional[List[ThreadsPost]]:
+        """
+        透過 GraphQL 接口直接抓取用戶貼文
+        
+        Returns:
+            Optional[List[ThreadsPost]]: 貼文列表；請求或解析失敗時返回 None
+        """
+        try:
+            user_id, lsd = self._fetch_profile_tokens(username)
+            
+            response = self.session.post(
+                f"{self.base_url}/api/graphql",
+                data={
+                    'lsd': lsd,
+                    'doc_id': self.graphql_doc_id,
+                    'variables': json.dumps({'userID': user_id})
+                },
+                headers={
+                    'User-Agent': self._random_user_agent(),
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'X-IG-App-ID': self.app_id,
+                    'X-FB-LSD': lsd
+                },
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            
+            payload = json.loads(response.content)
+            threads = payload['data']['mediaData']['threads']
+            
+            posts = []
+            scraped_at = datetime.now(timezone.utc).isoformat()
+            for thread in threads:
+                for item in thread.get('thread_items') or []:
+                    post = self._parse_graphql_post(item.get('post') or {}, username, scraped_at)
+                    if post:
+                        posts.append(post)
+                    if len(posts) >= MAX_POSTS_PER_ACCOUNT:  # 與 Selenium 路徑共用上限
+                        break
+                if len(posts) >= MAX_POSTS_PER_ACCOUNT:
+                    break
+            
+            logger.info(f"透過 GraphQL 抓取 {username} 的 {len(posts)} 篇貼文")
+            return posts
+            
+        except Exception as e:
+            logger.warning(f"GraphQL 抓取 {username} 失敗，改用 Selenium: {e}")
+            return None
+    
+    def _parse_graphql_post(self, post: Dict[str, Any], username: str, scraped_at: str) -> Optional[ThreadsPost]:
+        """解析 GraphQL 返回的單篇貼文"""
+        taken_at = post.get('taken_at')
+        if not taken_at:
+            return None
+        
+        content = (post.get('caption') or {}).get('text') or ''
+        timestamp_str = datetime.fromtimestamp(taken_at, tz=timezone.utc).isoformat()
+        app_info = post.get('text_post_app_info') or {}
+        
+        images = []
+        for media in [post] + (post.get('carousel_media') or []):
+            candidates = (media.get('image_versions2') or {}).get('candidates') or []
+            if candidates and candidates[0].get('url'):
+                images.append(candidates[0]['url'])
+        
+        code = post.get('code')
+        post_url = f"{self.base_url}/@{username}/post/{code}" if code else f"{self.base_url}/@{username}"
+        
+        return ThreadsPost(
+            post_id=self._generate_post_id(username, content, timestamp_str),
+            username=username,
+            content=content,
+            timestamp=timestamp_str,
+            likes=int(post.get('like_count') or 0),
+            replies=int(app_info.get('direct_reply_count') or 0),
+            reposts=int(app_info.get('repost_count') or 0),
+            images=images,
+            post_url=post_url,
+            scraped_at=scraped_at
+        )
+    
+    def _count_posts(self, driver) -> int:
+        """以單次腳本取得頁面上目前的貼文數"""
+        try:
+            return int(driver.execute_script(_POST_COUNT_JS) or 0)
+        except Exception:
+            return 0
+    
+    def _wait_for_more_posts(self, driver, prev_count: int) -> Optional[int]:
+        """
+        滾動後等待貼文數超過 prev_count
+        
+        Returns:
+            Optional[int]: 新的貼文數；逾時未增加時返回 None
+        """
+        def grown(d):
+            count = self._count_posts(d)
+            return count if count > prev_count else False
+        
+        try:
+            return self._driver_wait(driver, self.scroll_wait_timeout).until(grown)
+        except TimeoutException:
+            return None
+    
+    def _extract_post_records(self, driver) -> Optional[List[Dict[str, Any]]]:
+        """
+        以單次 execute_script 取得頁面上所有貼文的原始欄位
+        
+        Returns:
+            Optional[List[Dict]]: 貼文欄位列表；腳本執行失敗時返回 None
+        """
+        try:
+            records = driver.execute_script(
+                _POST_EXTRACTOR_JS, MAX_POSTS_PER_ACCOUNT, self.INTERACTION_SELECTORS
+            )
+        except Exception as e:
+            logger.warning(f"批量提取貼文失敗，改為逐個元素解析: {e}")
+            return None
+        return records if isinstance(records, list) else None
+    
+    def _parse_post_record(self, record: Dict[str, Any], username: str, scraped_at: str) -> Optional[ThreadsPost]:
+        """解析 _POST_EXTRACTOR_JS 返回的單篇貼文欄位"""
+        content = record.get('content')
+        # 與逐個元素解析一致：缺少內容或時間元素的貼文略過
+        if content is None or not record.get('has_time'):
+            return None
+        
+        timestamp_str = record.get('timestamp') or scraped_at
+        
+        return ThreadsPost(
+            post_id=self._generate_post_id(username, content, timestamp_str),
+            username=username,
+            content=content,
+            timestamp=timestamp_str,
+            likes=self._count_from_label(record.get('like')),
+            replies=self._count_from_label(record.get('reply')),
+            reposts=self._count_from_label(record.get('repost')),
+            images=list(record.get('images') or []),
+            post_url=self._placeholder_post_url(username),
+            scraped_at=scraped_at
+        )
+    
+    def _placeholder_post_url(self, username: str) -> str:
+        """Selenium 路徑取不到貼文代碼時使用的URL，同一用戶的貼文共享同一字串"""
+        url = self._placeholder_urls.get(username)
+        if url is None:
+            url = self._placeholder_urls.setdefault(username, f"{self.base_url}/@{username}/post/placeholder")
+        return url
+    
+    def _count_from_label(self, aria_label: Optional[str]) -> int:
+        """從 aria-label 中提取第一個數字"""
+        if not aria_label:
+            return 0
+        match = _DIGIT_RE.search(aria_label)
+        return int(match.group()) if match else 0
+    
+    def _parse_post_element(self, element, username: str, scraped_at: Optional[str] = None) -> Optional[ThreadsPost]:
+        """
+        解析單個貼文元素
+        
+        Args:
+            scraped_at: 本批貼文的抓取時間，未提供時取當前時間
+        """
+        if scraped_at is None:
+            scraped_at = datetime.now(timezone.utc).isoformat()
+        
         try:
             # 提取貼文內容
             content_elem = element.find_element(By.CSS_SELECTOR, '[data-testid="post-text"]')
@@ -216,7 +681,7 @@ class ThreadsScraper:
             
             # 提取時間戳
             timestamp_elem = element.find_element(By.CSS_SELECTOR, 'time')
-            timestamp_str = timestamp_elem.get_attribute('datetime') if timestamp_elem else datetime.now(timezone.utc).isoformat()
+            timestamp_str = timestamp_elem.get_attribute('datetime') if timestamp_elem else scraped_at
             
             # 提取圖片
             images = []
@@ -227,7 +692,7 @@ class ThreadsScraper:
                     images.append(src)
             
             # 生成貼文URL和ID
-            post_url = f"{self.base_url}/@{username}/post/placeholder"
+            post_url = self._placeholder_post_url(username)
             post_id = self._generate_post_id(username, content, timestamp_str)
             
             return ThreadsPost(
@@ -240,7 +705,7 @@ class ThreadsScraper:
                 reposts=reposts,
                 images=images,
                 post_url=post_url,
-                scraped_at=datetime.now(timezone.utc).isoformat()
+                scraped_at=scraped_at
             )
             
         except NoSuchElementException:
@@ -253,26 +718,14 @@ class ThreadsScraper:
         """提取互動數量"""
         try:
             # 根據不同的互動類型查找對應元素
-            selectors = {
-                'like': '[aria-label*="like"], [aria-label*="讚"]',
-                'reply': '[aria-label*="reply"], [aria-label*="回覆"]',
-                'repost': '[aria-label*="repost"], [aria-label*="轉發"]'
-            }
-            
-            selector = selectors.get(interaction_type, '')
+            selector = self.INTERACTION_SELECTORS.get(interaction_type, '')
             if not selector:
                 return 0
                 
             interaction_elem = element.find_element(By.CSS_SELECTOR, selector)
             aria_label = interaction_elem.get_attribute('aria-label')
             
-            if aria_label:
-                # 從 aria-label 中提取數字
-                import re
-                numbers = re.findall(r'\d+', aria_label)
-                return int(numbers[0]) if numbers else 0
-            
-            return 0
+            return self._count_from_label(aria_label)
             
         except (NoSuchElementException, ValueError):
             return 0
@@ -280,30 +733,108 @@ class ThreadsScraper:
     @retry(tries=3, delay=2, backoff=2)
     def scrape_user_posts(self, username: str) -> List[ThreadsPost]:
         """爬取指定用戶的貼文"""
+        username = sys.intern(username)
         try:
-            posts = self._extract_post_data_selenium(username)
+            posts = self._extract_post_data_http(username) if self.graphql_doc_id else None
+            if posts is None:
+                posts = self._extract_post_data_selenium(username)
             logger.info(f"成功爬取用戶 {username}: {len(posts)} 篇貼文")
             return posts
         except Exception as e:
             logger.error(f"爬取用戶 {username} 失敗: {e}")
             raise
     
+    def _scrape_account(self, username: str) -> List[ThreadsPost]:
+        """爬取單一帳號，失敗時記錄並返回空列表"""
+        try:
+            posts = self.scrape_user_posts(username)
+            self._random_delay()  # 在同一執行緒的不同用戶之間增加延遲
+            return posts
+        except Exception as e:
+            logger.error(f"跳過用戶 {username}: {e}")
+            return []
+    
+    def _iter_account_posts(self) -> Iterator[Tuple[str, List[ThreadsPost]]]:
+        """
+        按帳號列表順序逐一產出 (用戶名, 貼文列表)
+        
+        帳號數多於一個且 SCRAPER_WORKERS 大於 1 時以執行緒池並行爬取，
+        每個執行緒建立一個 WebDriver 並在其處理的所有帳號間重用，失效時才重建
+        """
+        workers = min(self.max_workers, len(self.accounts))
+        
+        if workers <= 1:
+            for username in self.accounts:
+                yield username, self._scrape_account(username)
+            return
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scraper') as executor:
+                yield from zip(self.accounts, executor.map(self._scrape_account, self.accounts))
+        finally:
+            # 工作執行緒已結束，關閉它們建立的 WebDriver
+            self._quit_drivers(keep_current=True)
+    
     def scrape_all_accounts(self) -> List[ThreadsPost]:
-        """爬取所有帳號的貼文"""
-        all_posts = []
+        """
+        爬取所有帳號的貼文
         
-        for username in self.accounts:
-            try:
-                posts = self.scrape_user_posts(username)
-                all_posts.extend(posts)
-                self._random_delay()  # 在不同用戶之間增加延遲
-            except Exception as e:
-                logger.error(f"跳過用戶 {username}: {e}")
-                continue
+        結果按帳號列表順序合併，並行方式見 _iter_account_posts
+        """
+        all_posts = []
+        for _, posts in self._iter_account_posts():
+            all_posts.extend(posts)
         
         logger.info(f"總共爬取了 {len(all_posts)} 篇貼文")
         return all_posts
     
+    def scrape_and_save(self, save_to_db: bool = True, save_to_json: bool = True) -> Tuple[List[ThreadsPost], Dict[str, Any]]:
+        """
+        爬取所有帳號並在背景執行緒中保存
+        
+        每個帳號完成後立即提交其貼文的數據庫寫入，與後續帳號的爬取重疊；
+        全部完成後寫入一個 JSON 文件
+        
+        Returns:
+            Tuple: (所有貼文, 與 save_posts 相同格式的保存結果統計)
+        """
+        all_posts = []
+        results = {
+            'database': {'success': 0, 'failure': 0, 'skipped': 0},
+            'json': {'saved': False, 'filename': None}
+        }
+        
+        if save_to_db and not self.db_manager:
+            logger.warning("數據庫不可用，跳過數據庫保存")
+        
+        db_futures = []
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='scraper-io') as io_executor:
+            for done, (username, posts) in enumerate(self._iter_account_posts(), 1):
+                all_posts.extend(posts)
+                if save_to_db and self.db_manager and posts:
+                    db_futures.append((posts, io_executor.submit(self.save_to_database, posts)))
+                logger.info(f"進度: {done}/{len(self.accounts)} 個帳號完成（{username}: {len(posts)} 篇）")
+            
+            logger.info(f"總共爬取了 {len(all_posts)} 篇貼文")
+            
+            json_future = None
+            if save_to_json and all_posts:
+                json_future = io_executor.submit(self._save_json_result, all_posts)
+            
+            for posts, future in db_futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"保存到數據庫失敗: {e}")
+                    result = {'failure': len(posts)}
+                for key in results['database']:
+                    results['database'][key] += result.get(key, 0)
+            
+            if json_future is not None:
+                results['json'] = json_future.result()
+        
+        return all_posts, results
+    
     def save_to_database(self, posts: List[ThreadsPost]) -> Dict[str, int]:
         """將貼文數據保存到 Supabase 數據庫"""
         if not self.db_manager:
@@ -314,37 +845,55 @@ class ThreadsScraper:
             logger.warning("沒有貼文需要保存")
             return {'success': 0, 'failure': 0}
         
-        # 檢查哪些貼文已存在
-        post_ids = [post.post_id for post in posts]
-        existing_ids = self.db_manager.get_existing_post_ids(post_ids)
-        
-        # 過濾出新貼文
-        new_posts = [post for post in posts if post.post_id not in existing_ids]
-        
-        if existing_ids:
-            logger.info(f"跳過 {len(existing_ids)} 個已存在的貼文")
+        # 同一批內重複的貼文ID只保留第一篇，以集合做 O(1) 成員判斷，
+        # 避免重複行被分到不同分塊後並發寫入同一主鍵
+        seen_ids = set()
+        unique_posts = []
+        for post in posts:
+            if post.post_id not in seen_ids:
+                seen_ids.add(post.post_id)
+                unique_posts.append(post)
+        duplicate_count = len(posts) - len(unique_posts)
         
-        if not new_posts:
-            logger.info("所有貼文都已存在，無需保存")
-            return {'success': 0, 'failure': 0, 'skipped': len(existing_ids)}
-        
-        # 批量插入新貼文
-        result = self.db_manager.insert_raw_posts_batch(new_posts)
-        result['skipped'] = len(existing_ids)
+        # 分批插入，已存在的貼文由數據庫端 ON CONFLICT DO NOTHING 跳過，
+        # 省去預先查詢已存在 ID 的往返；跳過數由返回的插入行數推算
+        result = self.db_manager.insert_new_posts_only(unique_posts)
+        if duplicate_count:
+            result = {**result, 'skipped': result['skipped'] + duplicate_count}
         
         logger.info(f"數據庫保存結果: 成功 {result['success']}, 失敗 {result['failure']}, 跳過 {result['skipped']}")
         return result
     
+    def _output_filename(self) -> str:
+        """按時間戳和 SCRAPER_OUTPUT_FORMAT 生成輸出文件名"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if self.output_format == 'jsonl.gz':
+            return f"threads_posts_{timestamp}.jsonl.gz"
+        return f"threads_posts_{timestamp}.json"
+    
     def save_to_json(self, posts: List[ThreadsPost], filename: str = None):
-        """將貼文數據保存為JSON文件"""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"threads_posts_{timestamp}.json"
+        """
+        將貼文數據保存為JSON文件
         
-        posts_data = [asdict(post) for post in posts]
+        文件名以 .jsonl.gz 結尾時逐篇寫入 gzip 壓縮的 JSON Lines，
+        不需先建立完整列表，下游也可逐行讀取；否則寫入縮排的 JSON 陣列
+        """
+        if not filename:
+            filename = self._output_filename()
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(posts_data, f, ensure_ascii=False, indent=2, default=str)
+        if filename.endswith('.jsonl.gz'):
+            with gzip.open(filename, 'wb', compresslevel=3) as f:
+                for post in posts:
+                    f.write(_dumps_line(_post_to_dict(post)))
+        elif ORJSON_AVAILABLE:
+            posts_data = [_post_to_dict(post) for post in posts]
+            # ThreadsPost 欄位皆為 JSON 原生型別，直接輸出 UTF-8 bytes
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(posts_data, option=orjson.OPT_INDENT_2))
+        else:
+            posts_data = [_post_to_dict(post) for post in posts]
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(posts_data, f, ensure_ascii=False, indent=2, default=str)
         
         logger.info(f"數據已保存到 {filename}")
     
@@ -377,21 +926,23 @@ class ThreadsScraper:
         
         # 保存到JSON文件
         if save_to_json:
-            try:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"threads_posts_{timestamp}.json"
-                self.save_to_json(posts, filename)
-                results['json'] = {'saved': True, 'filename': filename}
-            except Exception as e:
-                logger.error(f"保存JSON文件失敗: {e}")
-                results['json'] = {'saved': False, 'filename': None}
+            results['json'] = self._save_json_result(posts)
         
         return results
     
+    def _save_json_result(self, posts: List[ThreadsPost]) -> Dict[str, Any]:
+        """以時間戳命名保存 JSON 文件，返回保存結果"""
+        try:
+            filename = self._output_filename()
+            self.save_to_json(posts, filename)
+            return {'saved': True, 'filename': filename}
+        except Exception as e:
+            logger.error(f"保存JSON文件失敗: {e}")
+            return {'saved': False, 'filename': None}
+    
     def close(self):
         """清理資源"""
-        if self.driver:
-            self.driver.quit()
+        self._quit_drivers()
         if self.session:
             self.session.close()
 
@@ -400,13 +951,10 @@ def main():
     scraper = ThreadsScraper()
     
     try:
-        # 爬取所有帳號的貼文
-        posts = scraper.scrape_all_accounts()
+        # 爬取所有帳號的貼文，每個帳號完成後即在背景保存到數據庫，最後保存JSON文件
+        posts, save_results = scraper.scrape_and_save(save_to_db=True, save_to_json=True)
         
         if posts:
-            # 保存數據（同時保存到數據庫和JSON文件）
-            save_results = scraper.save_posts(posts, save_to_db=True, save_to_json=True)
-            
             # 輸出保存結果
             db_result = save_results['database']
             json_result = save_results['json']
@@ -20,10 +20,9 @@ class TestClusteringAnalysis:
     """聚類分析測試類"""
     
     @pytest.fixture
-    def processor(self):
+    def processor(self, jieba_ready):
         """創建測試用的數據處理器"""
         with patch('process_data.SupabaseManager'), \
-             patch('process_data.jieba'), \
              patch('process_data.SentimentIntensityAnalyzer'):
             processor = DataProcessor()
             return processor
@@ -33,8 +32,7 @@ class TestClusteringAnalysis:
         """創建聚類分析測試數據"""
         base_time = datetime.now(timezone.utc)
         
-        # 創建不同主題的測試貼文
-        data = []
+        # 創建不同主題的測試貼文（每個主題5篇）
         
         # 科技主題貼文
         tech_posts = [
@@ -63,48 +61,36 @@ class TestClusteringAnalysis:
             '電影音樂娛樂推薦'
         ]
         
-        all_posts = [
-            (tech_posts, 'tech'),
-            (finance_posts, 'finance'), 
-            (life_posts, 'life')
-        ]
+        categories = ['tech', 'finance', 'life']
+        contents = tech_posts + finance_posts + life_posts
+        n_posts = len(contents)
         
-        post_id = 0
-        for posts_list, category in all_posts:
-            for i, content in enumerate(posts_list):
-                # 不同主題有不同的互動水平
-                if category == 'tech':
-                    base_interactions = 150
-                elif category == 'finance':
-                    base_interactions = 100
-                else:  # life
-                    base_interactions = 80
-                
-                likes = base_interactions + np.random.randint(-30, 50)
-                replies = max(1, likes // 5 + np.random.randint(-5, 10))
-                reposts = max(0, likes // 8 + np.random.randint(-3, 8))
-                
-                data.append({
-                    'post_id': f'post_{post_id}',
-                    'username': f'user_{category}_{i}',
-                    'content': content,
-                    'timestamp': base_time - timedelta(hours=np.random.randint(1, 72)),
-                    'likes': likes,
-                    'replies': replies,
-                    'reposts': reposts,
-                    'total_interactions': likes + replies + reposts,
-                    'heat_density': np.random.uniform(20, 90),
-                    'freshness_score': np.random.uniform(0.3, 1.0)
-                })
-                post_id += 1
-        
-        return pd.DataFrame(data)
+        # 不同主題有不同的互動水平，隨機欄位一次向量化生成
+        rng = np.random.default_rng(0)
+        base_interactions = np.array([150, 100, 80]).repeat(5)
+        likes = base_interactions + rng.integers(-30, 50, size=n_posts)
+        replies = np.maximum(1, likes // 5 + rng.integers(-5, 10, size=n_posts))
+        reposts = np.maximum(0, likes // 8 + rng.integers(-3, 8, size=n_posts))
+        hours = rng.integers(1, 72, size=n_posts)
+        
+        return pd.DataFrame({
+            'post_id': [f'post_{i}' for i in range(n_posts)],
+            'username': [f'user_{category}_{i}' for category in categories for i in range(5)],
+            'content': contents,
+            'timestamp': pd.Timestamp(base_time) - pd.to_timedelta(hours, unit='h'),
+            'likes': likes,
+            'replies': replies,
+            'reposts': reposts,
+            'total_interactions': likes + replies + reposts,
+            'heat_density': rng.uniform(20, 90, size=n_posts),
+            'freshness_score': rng.uniform(0.3, 1.0, size=n_posts)
+        })
     
     def test_perform_topic_clustering_basic(self, processor, sample_clustering_df):
         """測試基本主題聚類功能"""
         with patch('process_data.jieba.cut') as mock_cut, \
              patch.object(processor, '_analyze_cluster_sentiment') as mock_sentiment, \
-             patch.object(processor, '_calculate_trending_score') as mock_trending:
+             patch.object(processor, '_trending_score_from_arrays') as mock_trending:
             
             # Mock jieba 分詞
             mock_cut.side_effect = lambda text: text.split()
@@ -192,6 +178,54 @@ class TestClusteringAnalysis:
         empty_name = processor._generate_topic_name([], [])
         assert empty_name == "未知主題"
     
+    def test_generate_topic_name_cached_by_primary_keyword(self, processor):
+        """測試主題名稱按首個關鍵詞快取，類別依序判斷"""
+        from process_data import _topic_name_for
+        
+        _topic_name_for.cache_clear()
+        assert processor._generate_topic_name(['投資', 'ai'], []) == "財經動態 - 投資"
+        assert processor._generate_topic_name(['投資', '美食'], []) == "財經動態 - 投資"
+        assert processor._generate_topic_name(['美食旅行'], []) == "生活分享 - 美食旅行"
+        assert processor._generate_topic_name(['其他'], []) == "熱門話題 - 其他"
+        
+        info = _topic_name_for.cache_info()
+        assert (info.hits, info.misses) == (1, 3)
+    
+    def test_topic_category_patterns_match_substring_rule(self):
+        """測試預編譯的類別正則與逐一子字串比對的分類結果一致"""
+        from process_data import _TOPIC_CATEGORIES, _TOPIC_CATEGORY_PATTERNS
+        
+        samples = ['ai工具', '人工智慧', '股票市場', '社會觀點', '美食生活', '新聞ai', '其他', 'a.i', '']
+        for keyword in samples:
+            expected = next(
+                (category for category, keywords in _TOPIC_CATEGORIES
+                 if any(k in keyword for k in keywords)), None
+            )
+            actual = next(
+                (category for category, pattern in _TOPIC_CATEGORY_PATTERNS
+                 if pattern.search(keyword)), None
+            )
+            assert actual == expected
+    
+    def test_hashed_tfidf_matches_tfidf(self, processor):
+        """測試特徵雜湊向量化與 TfidfVectorizer 選出相同特徵和權重"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        texts = ['ai 技術 發展', 'ai 技術 應用', '投資 理財 市場', '投資 市場 分析',
+                 'ai 投資', '美食 旅行', '美食 分享']
+        
+        matrix, names = processor._hashed_tfidf(texts)
+        
+        reference = TfidfVectorizer(max_features=200, min_df=2, max_df=0.8, ngram_range=(1, 2),
+                                    tokenizer=str.split, token_pattern=None)
+        expected = reference.fit_transform(texts).toarray()
+        expected_names = list(reference.get_feature_names_out())
+        
+        assert matrix.dtype == np.float32
+        assert sorted(names) == sorted(expected_names)
+        order = [expected_names.index(name) for name in names]
+        np.testing.assert_allclose(matrix.toarray(), expected[:, order], rtol=1e-6)
+    
     def test_analyze_cluster_sentiment(self, processor):
         """測試聚類情感分析"""
         # 測試正面內容
@@ -215,6 +249,71 @@ class TestClusteringAnalysis:
         sentiment = processor._analyze_cluster_sentiment([])
         assert sentiment == 'neutral'
     
+    def test_analyze_cluster_sentiment_precomputed(self, processor):
+        """測試使用預先計算的情感分數時不再調用分析器"""
+        contents = ['很棒', '', '普通']
+        
+        with patch.object(processor, 'sentiment_analyzer') as mock_analyzer:
+            scores = [0.6, float('nan'), 0.2]
+            sentiment = processor._analyze_cluster_sentiment(contents, compound_scores=scores)
+            
+            mock_analyzer.polarity_scores.assert_not_called()
+            assert sentiment == 'positive'
+            
+            mock_analyzer.polarity_scores.return_value = {'compound': -0.5}
+            assert processor._sentiment_scores(contents)[0] == -0.5
+            assert np.isnan(processor._sentiment_scores(contents)[1])
+    
+    def test_analyze_cluster_sentiment_series_input(self, processor):
+        """測試內容為 Series、分數為數組時的情感分類"""
+        contents = pd.Series(['很糟', '失望', '   '])
+        
+        with patch.object(processor, 'sentiment_analyzer') as mock_analyzer:
+            mock_analyzer.polarity_scores.side_effect = [{'compound': -0.6}, {'compound': -0.2}]
+            
+            scores = processor._sentiment_scores(contents)
+            assert isinstance(scores, np.ndarray)
+            assert mock_analyzer.polarity_scores.call_count == 2
+            
+            assert processor._analyze_cluster_sentiment(contents, compound_scores=scores) == 'negative'
+            assert processor._analyze_sentiment_for_posts(contents, compound_scores=scores) == pytest.approx(-0.4)
+            assert processor._analyze_cluster_sentiment(contents, compound_scores=np.full(3, np.nan)) == 'neutral'
+    
+    def test_sentiment_scores_mini_batches_match_sequential(self, processor):
+        """測試以進程池分批計算的情感分數與逐篇計算一致"""
+        batches_seen = []
+        
+        class FakeVader:
+            def polarity_scores(self, text):
+                return {'compound': len(text) / 100}
+        
+        class FakePool:
+            def __init__(self, processes):
+                pass
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc):
+                return False
+            def map(self, func, items):
+                batches_seen.extend(len(batch) for batch in items)
+                return [func(batch) for batch in items]
+        
+        contents = ['This is great!', 'Terrible service.', '', 'It is okay.', None] * 3
+        processor.sentiment_analyzer = FakeVader()
+        sequential = processor._sentiment_scores(contents)
+        
+        with patch('process_data.Pool', FakePool), \
+             patch('process_data.SentimentIntensityAnalyzer', FakeVader), \
+             patch('process_data._get_vader', FakeVader), \
+             patch('process_data.SENTIMENT_PARALLEL_MIN', 2), \
+             patch('process_data.SENTIMENT_WORKERS', 4):
+            batched = processor._sentiment_scores(contents, mini_batch_size=4)
+        
+        assert batches_seen == [4, 4, 4, 3]
+        np.testing.assert_array_equal(batched, sequential)
+        assert batched[0] == pytest.approx(0.14)
+        assert np.isnan(batched[2]) and np.isnan(batched[4])
+    
     def test_calculate_trending_score(self, processor):
         """測試趨勢分數計算"""
         current_time = datetime.now(timezone.utc)
@@ -250,6 +349,141 @@ class TestClusteringAnalysis:
         empty_score = processor._calculate_trending_score(empty_df)
         assert empty_score == 0.0
     
+    def test_calculate_trending_score_unsorted_input(self, processor):
+        """測試未排序的輸入得到與按時間跨度計算相同的分數"""
+        current_time = datetime.now(timezone.utc)
+        cluster_data = pd.DataFrame({
+            'timestamp': [
+                current_time - timedelta(hours=1),
+                current_time - timedelta(hours=10),
+                current_time - timedelta(hours=4)
+            ],
+            'total_interactions': [20, 10, 30],
+            'freshness_score': [0.9, 0.3, 0.6]
+        })
+        
+        # 時間跨度 9 小時，互動 60，平均新鮮度 0.6
+        expected = 60 / 9 * 0.6 / 100
+        assert processor._calculate_trending_score(cluster_data) == pytest.approx(expected)
+        
+        same_time = pd.DataFrame({
+            'timestamp': [current_time, current_time],
+            'total_interactions': [10, 20],
+            'freshness_score': [0.5, 0.5]
+        })
+        assert processor._calculate_trending_score(same_time) == 0.0
+    
+    def test_trending_score_loop_matches_pandas(self, processor):
+        """測試趨勢分數編譯核心與 pandas 計算結果一致"""
+        from process_data import _trending_score_loop
+        
+        rng = np.random.default_rng(0)
+        current_time = datetime.now(timezone.utc)
+        cluster_data = pd.DataFrame({
+            'timestamp': [current_time - timedelta(minutes=int(m)) for m in rng.integers(0, 5000, 50)],
+            'total_interactions': rng.integers(0, 500, 50),
+            'freshness_score': rng.random(50)
+        })
+        cluster_data.loc[3, 'freshness_score'] = np.nan
+        
+        with patch('process_data._trending_score_jit', None):
+            expected = processor._calculate_trending_score(cluster_data)
+        with patch('process_data._trending_score_jit', _trending_score_loop):
+            fused = processor._calculate_trending_score(cluster_data)
+        
+        assert type(fused) is float
+        assert fused == pytest.approx(expected)
+    
+    def test_summarize_cluster_from_column_arrays(self, processor):
+        """測試以欄位陣列索引計算的聚類摘要與數據框切片結果一致"""
+        from process_data import _ClusterColumns
+        
+        rng = np.random.default_rng(2)
+        current_time = datetime.now(timezone.utc)
+        df = pd.DataFrame({
+            'content': [f'post {i}' for i in range(20)],
+            'total_interactions': rng.integers(0, 500, 20),
+            'heat_density': rng.random(20),
+            'freshness_score': rng.random(20),
+            'sentiment': rng.uniform(-1, 1, 20),
+            'timestamp': [current_time - timedelta(minutes=int(m)) for m in rng.integers(0, 5000, 20)]
+        })
+        df.loc[4, 'heat_density'] = np.nan
+        rows = np.array([1, 4, 7, 12, 19])
+        cluster_posts = df.iloc[rows]
+        
+        topic = processor._summarize_cluster(2, _ClusterColumns.from_frame(df), rows, ['ai', '技術'])
+        
+        assert topic.topic_id == 3
+        assert topic.post_count == 5
+        assert type(topic.total_interactions) is int
+        assert topic.total_interactions == cluster_posts['total_interactions'].sum()
+        assert topic.average_heat_density == pytest.approx(cluster_posts['heat_density'].mean())
+        assert topic.trending_score == pytest.approx(processor._calculate_trending_score(cluster_posts))
+    
+    def test_cluster_group_stats_match_per_cluster(self):
+        """測試單次分組聚合與逐一聚類計算的互動總數和平均熱度一致"""
+        from process_data import _ClusterColumns
+        
+        rng = np.random.default_rng(4)
+        df = pd.DataFrame({
+            'content': [f'post {i}' for i in range(30)],
+            'total_interactions': rng.integers(0, 500, 30),
+            'heat_density': rng.random(30)
+        })
+        labels = rng.integers(0, 3, 30).astype(np.int32)
+        labels[labels == 2] = 0
+        df.loc[labels == 1, 'heat_density'] = np.nan
+        
+        totals, heat_means = _ClusterColumns.from_frame(df).group_stats(labels, 3)
+        
+        assert totals[0] == df['total_interactions'][labels == 0].sum()
+        assert totals[1] == df['total_interactions'][labels == 1].sum()
+        assert totals[2] == 0
+        assert heat_means[0] == pytest.approx(df['heat_density'][labels == 0].mean())
+        assert np.isnan(heat_means[1]) and np.isnan(heat_means[2])
+
+    def test_clustering_tokenizes_only_posts_above_threshold(self, processor):
+        """測試只有互動數達到門檻的貼文會被分詞"""
+        processor.min_interactions_threshold = 10
+        df = pd.DataFrame({
+            'content': [f'post {i}' for i in range(8)],
+            'total_interactions': [0, 50, 3, 20, 15, 1, 30, 9]
+        })
+        
+        with patch.object(processor, '_tokenize', side_effect=lambda text: text) as mock_tokenize, \
+             patch.object(processor, '_hashed_tfidf', side_effect=ValueError("stop")):
+            assert processor.perform_topic_clustering(df) == []
+        
+        tokenized = [call.args[0] for call in mock_tokenize.call_args_list]
+        assert tokenized == ['post 1', 'post 3', 'post 4', 'post 6']
+    
+    def test_clustering_parallel_summaries_match_sequential(self, processor):
+        """測試並行計算各聚類摘要與依序計算結果一致且順序相同"""
+        rng = np.random.default_rng(1)
+        current_time = datetime.now(timezone.utc)
+        topics = ['ai 技術 發展', '投資 理財 市場', '美食 旅行 分享', '健康 生活 運動']
+        n_posts = 120
+        texts = [f'{topics[i % 4]} 內容{i % 10}' for i in range(n_posts)]
+        df = pd.DataFrame({
+            'content': texts,
+            'tokens': texts,
+            'total_interactions': rng.integers(10, 200, n_posts),
+            'heat_density': rng.random(n_posts),
+            'freshness_score': rng.random(n_posts),
+            'sentiment': rng.uniform(-1, 1, n_posts),
+            'timestamp': [current_time - timedelta(minutes=int(m)) for m in rng.integers(0, 5000, n_posts)]
+        })
+        
+        with patch('process_data.CLUSTER_WORKERS', 1):
+            sequential = processor.perform_topic_clustering(df)
+        with patch('process_data.CLUSTER_WORKERS', 4):
+            parallel = processor.perform_topic_clustering(df)
+        
+        assert len(sequential) > 1
+        assert parallel == sequential
+        assert sum(topic.post_count for topic in sequential) <= n_posts
+    
     def test_clustering_with_different_thresholds(self, processor, sample_clustering_df):
         """測試不同閾值下的聚類結果"""
         original_threshold = processor.min_interactions_threshold
@@ -268,7 +502,7 @@ class TestClusteringAnalysis:
             processor.min_interactions_threshold = 1  # 很低的閾值
             with patch('process_data.jieba.cut') as mock_cut, \
                  patch.object(processor, '_analyze_cluster_sentiment') as mock_sentiment, \
-                 patch.object(processor, '_calculate_trending_score') as mock_trending:
+                 patch.object(processor, '_trending_score_from_arrays') as mock_trending:
                 
                 mock_cut.side_effect = lambda text: text.split()
                 mock_sentiment.return_value = 'positive'
@@ -292,7 +526,7 @@ class TestClusteringAnalysis:
             processor.max_topics = 2
             with patch('process_data.jieba.cut') as mock_cut, \
                  patch.object(processor, '_analyze_cluster_sentiment') as mock_sentiment, \
-                 patch.object(processor, '_calculate_trending_score') as mock_trending:
+                 patch.object(processor, '_trending_score_from_arrays') as mock_trending:
                 
                 mock_cut.side_effect = lambda text: text.split()
                 mock_sentiment.return_value = 'neutral'
@@ -319,6 +553,13 @@ class TestClusteringAnalysis:
             # 即使出錯也應該返回空列表，不應該拋出異常
             assert isinstance(topics, list)
     
+    def test_tokenize_falls_back_to_whitespace_split(self, processor):
+        """測試 jieba 分詞失敗時退回以空白切分並照常過濾"""
+        with patch('process_data.jieba.cut', side_effect=Exception("分詞錯誤")):
+            tokens = processor._tokenize('AI 技術 的 發展 x')
+        
+        assert tokens == 'ai 技術 發展'
+    
     def test_clustering_with_special_characters(self, processor):
         """測試包含特殊字符的文本聚類"""
         special_data = pd.DataFrame({
@@ -338,7 +579,7 @@ class TestClusteringAnalysis:
         
         with patch('process_data.jieba.cut') as mock_cut, \
              patch.object(processor, '_analyze_cluster_sentiment') as mock_sentiment, \
-             patch.object(processor, '_calculate_trending_score') as mock_trending:
+             patch.object(processor, '_trending_score_from_arrays') as mock_trending:
             
             mock_cut.side_effect = lambda text: ['文本', '內容', '測試']
             mock_sentiment.return_value = 'neutral'
@@ -352,21 +593,18 @@ class TestClusteringAnalysis:
     def test_clustering_keyword_extraction_integration(self, processor, sample_clustering_df):
         """測試聚類與關鍵詞提取的集成"""
         with patch('process_data.jieba.cut') as mock_cut, \
-             patch('process_data.TfidfVectorizer') as mock_vectorizer, \
+             patch.object(processor, '_hashed_tfidf') as mock_vectorize, \
              patch.object(processor, '_analyze_cluster_sentiment') as mock_sentiment, \
-             patch.object(processor, '_calculate_trending_score') as mock_trending:
-            
-            # Mock TF-IDF 向量化器
-            mock_tfidf_instance = MagicMock()
-            mock_vectorizer.return_value = mock_tfidf_instance
+             patch.object(processor, '_trending_score_from_arrays') as mock_trending:
             
             # 模擬向量化結果
             mock_tfidf_matrix = MagicMock()
-            mock_tfidf_instance.fit_transform.return_value = mock_tfidf_matrix
-            mock_tfidf_instance.get_feature_names_out.return_value = ['AI', '技術', '投資', '市場', '生活']
+            mock_vectorize.return_value = (
+                mock_tfidf_matrix, np.array(['AI', '技術', '投資', '市場', '生活'], dtype=object)
+            )
             
             # Mock K-means 聚類
-            with patch('process_data.KMeans') as mock_kmeans:
+            with patch('process_data.MiniBatchKMeans') as mock_kmeans:
                 mock_kmeans_instance = MagicMock()
                 mock_kmeans.return_value = mock_kmeans_instance
                 
@@ -395,10 +633,9 @@ class TestClusteringPerformance:
     """聚類分析性能測試"""
     
     @pytest.fixture
-    def processor(self):
+    def processor(self, jieba_ready):
         """創建測試用的數據處理器"""
         with patch('process_data.SupabaseManager'), \
-             patch('process_data.jieba'), \
              patch('process_data.SentimentIntensityAnalyzer'):
             return DataProcessor()
     
@@ -411,8 +648,8 @@ class TestClusteringPerformance:
         large_data = pd.DataFrame({
             'post_id': [f'post_{i}' for i in range(n_posts)],
             'username': [f'user_{i % 100}' for i in range(n_posts)],
-            'content': [f'測試內容 {i % 10}' for i in range(n_posts)],
-            'timestamp': [current_time - timedelta(hours=i % 72) for i in range(n_posts)],
+            'content': [f'測試內容 話題{i % 10}' for i in range(n_posts)],
+            'timestamp': pd.Timestamp(current_time) - pd.to_timedelta(np.arange(n_posts) % 72, unit='h'),
             'total_interactions': np.random.randint(50, 500, n_posts),
             'heat_density': np.random.uniform(20, 90, n_posts),
             'freshness_score': np.random.uniform(0.3, 1.0, n_posts)
@@ -420,7 +657,8 @@ class TestClusteringPerformance:
         
         with patch('process_data.jieba.cut') as mock_cut, \
              patch.object(processor, '_analyze_cluster_sentiment') as mock_sentiment, \
-             patch.object(processor, '_calculate_trending_score') as mock_trending:
+             patch.object(processor, '_trending_score_from_arrays') as mock_trending, \
+             patch.object(pd.DataFrame, 'iterrows', side_effect=AssertionError("iterrows 不應被調用")) as mock_iterrows:
             
             mock_cut.side_effect = lambda text: text.split()
             mock_sentiment.return_value = 'neutral'
@@ -437,6 +675,66 @@ class TestClusteringPerformance:
             
             # 檢查結果
             assert isinstance(topics, list)
+            assert topics
+            mock_iterrows.assert_not_called()
+    
+    def test_clustering_skips_clusters_below_min_size(self, processor):
+        """測試貼文數低於 min_cluster_size 的聚類不會計算摘要"""
+        rng = np.random.default_rng(5)
+        topics = ['ai 技術 發展', '投資 理財 市場', '美食 旅行 分享', '健康 生活 運動']
+        texts = [f'{topics[i % 4]} 內容{i % 10}' for i in range(60)]
+        df = pd.DataFrame({
+            'content': texts,
+            'tokens': texts,
+            'total_interactions': rng.integers(10, 200, 60),
+            'heat_density': rng.random(60)
+        })
+        processor.min_cluster_size = 61
+        
+        with patch.object(processor, '_summarize_cluster') as mock_summarize:
+            assert processor.perform_topic_clustering(df) == []
+        
+        mock_summarize.assert_not_called()
+    
+    def test_clustering_batch_matches_sequential(self, processor):
+        """測試以進程池批次聚類多個時間窗口與逐一聚類結果一致且順序相同"""
+        from dataclasses import astuple
+        
+        rng = np.random.default_rng(3)
+        current_time = datetime.now(timezone.utc)
+        topics = ['ai 技術 發展', '投資 理財 市場', '美食 旅行 分享', '健康 生活 運動']
+        n_posts = 200
+        windows = []
+        for window in range(4):
+            texts = [f'{topics[(i + window) % 4]} 內容{i % 10}' for i in range(n_posts)]
+            windows.append(pd.DataFrame({
+                'content': texts,
+                'tokens': texts,
+                'total_interactions': rng.integers(10, 200, n_posts),
+                'heat_density': rng.random(n_posts),
+                'freshness_score': rng.random(n_posts),
+                'timestamp': pd.Timestamp(current_time) - pd.to_timedelta(rng.integers(0, 5000, n_posts), unit='m')
+            }))
+        # 子進程不會沿用測試中的 mock，關閉情感分析使兩邊結果可比較
+        processor.sentiment_analyzer = None
+        
+        expected = [processor.perform_topic_clustering(df) for df in windows]
+        batched = processor.perform_topic_clustering_batch(windows, workers=2)
+        
+        assert len(batched) == 4
+        assert all(expected)
+        assert [[astuple(t) for t in topics] for topics in batched] == \
+               [[astuple(t) for t in topics] for topics in expected]
+    
+    def test_clustering_batch_falls_back_when_pool_fails(self, processor):
+        """測試進程池無法啟動時改為依序聚類"""
+        windows = [pd.DataFrame(), pd.DataFrame()]
+        
+        with patch('process_data.Pool', side_effect=OSError("no fork")), \
+             patch.object(processor, 'perform_topic_clustering', return_value=[]) as mock_cluster:
+            assert processor.perform_topic_clustering_batch(windows, workers=2) == [[], []]
+        
+        assert mock_cluster.call_count == 2
 
 if __name__ == "__main__":
     # 運行測試
@@ -20,10 +20,9 @@ class TestHeatCalculation:
     """熱度計算測試類"""
     
     @pytest.fixture
-    def processor(self):
+    def processor(self, jieba_ready):
         """創建測試用的數據處理器"""
         with patch('process_data.SupabaseManager'), \
-             patch('process_data.jieba'), \
              patch('process_data.SentimentIntensityAnalyzer'):
             processor = DataProcessor()
             return processor
@@ -137,6 +136,35 @@ class TestHeatCalculation:
         # 最高熱度應該接近100（考慮浮點精度）
         assert result_df['heat_density'].max() >= 99.0
     
+    def test_compute_all_metrics_matches_sequential(self, processor, sample_posts_df):
+        """測試合併計算與逐步計算結果一致"""
+        sample_posts_df.loc[0, 'content'] = '#AI 新聞 @user http://example.com'
+        sample_posts_df.loc[1, 'username'] = 'user1'
+        frozen_now = datetime.now(timezone.utc)
+        
+        sequential = processor.calculate_heat_density(sample_posts_df.copy(), current_time=frozen_now)
+        sequential = processor.calculate_freshness_score(sequential, current_time=frozen_now)
+        sequential = processor.calculate_engagement_rate(sequential)
+        sequential = processor.calculate_viral_potential(sequential)
+        fused = processor.compute_all_metrics(sample_posts_df.copy(), current_time=frozen_now)
+        
+        assert list(fused.columns) == list(sequential.columns)
+        pd.testing.assert_frame_equal(fused, sequential)
+        assert fused.loc[0, ['has_hashtag', 'has_mention', 'has_url']].tolist() == [1, 1, 1]
+    
+    def test_fused_loop_matches_numpy_kernels(self, processor, sample_posts_df):
+        """測試逐元素核心（numba 編譯路徑）與 numpy 核心結果一致"""
+        import process_data
+        sample_posts_df.loc[2, ['likes', 'replies', 'reposts', 'total_interactions']] = 0
+        frozen_now = datetime.now(timezone.utc)
+        
+        with patch('process_data._fused_metrics_jit', None):
+            expected = processor.compute_all_metrics(sample_posts_df.copy(), current_time=frozen_now)
+        with patch('process_data._fused_metrics_jit', process_data._fused_metrics_loop):
+            fused = processor.compute_all_metrics(sample_posts_df.copy(), current_time=frozen_now)
+        
+        pd.testing.assert_frame_equal(fused, expected, check_exact=False, rtol=1e-12)
+    
     def test_empty_dataframe(self, processor):
         """測試空數據框處理"""
         empty_df = pd.DataFrame()
@@ -276,7 +304,7 @@ class TestHeatCalculation:
             'post_id': [f'post_{i}' for i in range(n_posts)],
             'username': [f'user_{i % 100}' for i in range(n_posts)],
             'content': [f'測試內容 {i}' * (i % 10 + 1) for i in range(n_posts)],
-            'timestamp': [current_time - timedelta(hours=i % 72) for i in range(n_posts)],
+            'timestamp': pd.Timestamp(current_time) - pd.to_timedelta(np.arange(n_posts) % 72, unit='h'),
             'likes': np.random.randint(0, 1000, n_posts),
             'replies': np.random.randint(0, 200, n_posts),
             'reposts': np.random.randint(0, 100, n_posts)
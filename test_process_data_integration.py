@@ -20,16 +20,15 @@ class TestProcessDataIntegration:
     """數據處理集成測試類"""
     
     @pytest.fixture
-    def processor(self):
+    def processor(self, jieba_ready):
         """創建測試用的數據處理器"""
         with patch('process_data.SupabaseManager') as mock_db:
             # Mock 數據庫管理器
             mock_db_instance = MagicMock()
-            mock_db.return_value = mock_db_instance
+            mock_db.instance.return_value = mock_db_instance
             
-            # Mock jieba 和情感分析器
-            with patch('process_data.jieba'), \
-                 patch('process_data.SentimentIntensityAnalyzer'):
+            # Mock 情感分析器（jieba 詞典由 jieba_ready 在會話內載入一次）
+            with patch('process_data.SentimentIntensityAnalyzer'):
                 processor = DataProcessor()
                 processor.db_manager = mock_db_instance
                 return processor
@@ -183,6 +182,87 @@ class TestProcessDataIntegration:
         assert (df['freshness_score'] >= 0).all()
         assert (df['freshness_score'] <= 1).all()
     
+    def test_nlp_resources_loaded_once(self):
+        """測試多個處理器共用 jieba 詞典和情感分析器"""
+        import process_data
+        
+        with patch('process_data.SupabaseManager'), \
+             patch('process_data.jieba') as mock_jieba, \
+             patch('process_data.SentimentIntensityAnalyzer') as mock_analyzer_cls, \
+             patch('process_data._JIEBA_READY', False):
+            first = DataProcessor()
+            second = DataProcessor()
+            
+            assert mock_jieba.initialize.call_count == 1
+            assert mock_analyzer_cls.call_count == 1
+            assert first.sentiment_analyzer is second.sentiment_analyzer
+        
+        process_data._load_vader.cache_clear()
+    
+    def test_pre_warm_loads_resources_once(self):
+        """測試 pre_warm 預載入 jieba 詞典，情感分析器載入失敗時不拋出"""
+        import process_data
+        
+        with patch('process_data.jieba') as mock_jieba, \
+             patch('process_data._JIEBA_READY', False), \
+             patch('process_data._get_vader', side_effect=LookupError("vader_lexicon")):
+            DataProcessor.pre_warm()
+            DataProcessor.pre_warm()
+            
+            assert mock_jieba.initialize.call_count == 1
+            assert process_data._JIEBA_READY is True
+    
+    def test_token_disk_cache_reused_across_processors(self, jieba_ready, tmp_path, monkeypatch):
+        """測試分詞結果寫入磁碟緩存，新的處理器再次分詞時直接命中"""
+        monkeypatch.setenv('TOKEN_DISK_CACHE_PATH', str(tmp_path / 'tokens.sqlite'))
+        texts = ['人工智慧技術發展', '股票投資策略', '人工智慧技術發展', '']
+        
+        with patch('process_data.SupabaseManager'), \
+             patch('process_data.SentimentIntensityAnalyzer'):
+            first = DataProcessor()
+            second = DataProcessor()
+        
+        expected = first._tokenize_many(texts)
+        
+        with patch('process_data._segment') as mock_segment:
+            assert second._tokenize_many(texts) == expected
+        
+        mock_segment.assert_not_called()
+        assert expected[0] and expected[3] == ''
+    
+    def test_fetch_raw_posts_column_types(self, processor):
+        """測試原始數據轉換時的空值處理和欄位類型"""
+        processor.db_manager.get_posts_by_date_range.return_value = [
+            {'post_id': 'a', 'username': 'u1', 'content': 'AI', 'likes': 3, 'replies': None,
+             'reposts': 1, 'timestamp': '2024-01-01T00:00:00+00:00', 'scraped_at': '2024-01-01T01:00:00+00:00'},
+            {'post_id': 'b', 'username': 'u2', 'content': None, 'likes': float('nan'), 'replies': 2,
+             'reposts': 0, 'timestamp': '2024-01-02T00:00:00+00:00', 'scraped_at': '2024-01-02T01:00:00+00:00'}
+        ]
+        
+        df = processor.fetch_raw_posts(days_back=7)
+        
+        assert df['likes'].tolist() == [3, 0]
+        assert df['replies'].tolist() == [0, 2]
+        assert df['total_interactions'].tolist() == [4, 2]
+        assert df['total_interactions'].dtype == np.int64
+        assert df['content'].tolist() == ['AI', '']
+        assert pd.api.types.is_datetime64_any_dtype(df['timestamp'])
+        assert list(df.columns[:3]) == ['post_id', 'username', 'content']
+    
+    def test_engagement_rate_uses_user_average(self, processor):
+        """測試參與率以同一用戶的平均互動數為基準"""
+        df = pd.DataFrame({
+            'username': ['alice', 'alice', 'bob', None],
+            'total_interactions': [10, 30, 5, 7]
+        })
+        
+        df = processor.calculate_engagement_rate(df)
+        
+        assert df['user_avg_interactions'].tolist()[:3] == [20.0, 20.0, 5.0]
+        assert df['engagement_rate'].tolist()[:3] == pytest.approx(np.log1p([0.5, 1.5, 1.0]).tolist())
+        assert df['engagement_rate'].iloc[3] == pytest.approx(np.log1p(7.0))
+        assert not isinstance(df['username'].dtype, pd.CategoricalDtype)
+    
     def test_error_handling_and_recovery(self, processor):
         """測試錯誤處理和恢復機制"""
         # 測試數據庫連接錯誤
@@ -364,6 +444,36 @@ class TestProcessDataIntegration:
         assert results['trends_saved'] >= 0
         assert isinstance(results['errors'], int)
     
+    def test_save_processed_data_batched(self, processor):
+        """測試處理結果按批次寫入，而非逐行請求"""
+        post_metrics = [
+            PostMetrics(
+                post_id=f'batch_post_{i}',
+                total_interactions=i,
+                heat_density=float(i),
+                freshness_score=0.5,
+                engagement_rate=1.0,
+                viral_potential=0.1
+            )
+            for i in range(5)
+        ]
+        
+        table = processor.db_manager.client.table.return_value
+        table.upsert.side_effect = lambda rows, on_conflict: MagicMock(
+            execute=MagicMock(return_value=MagicMock(data=rows))
+        )
+        
+        run_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        with patch('process_data.BATCH_SIZE', 2):
+            results = processor.save_processed_data(post_metrics, [], [], current_time=run_time)
+        
+        assert table.upsert.call_count == 3
+        assert results['post_metrics_saved'] == 5
+        assert results['errors'] == 0
+        # 同一批次共用傳入的處理時間
+        processed_at = {row['processed_at'] for call in table.upsert.call_args_list for row in call.args[0]}
+        assert processed_at == {run_time.isoformat()}
+    
     def test_configuration_impact(self, processor, comprehensive_test_data):
         """測試配置參數對處理結果的影響"""
         processor.db_manager.get_posts_by_date_range.return_value = comprehensive_test_data.to_dict('records')
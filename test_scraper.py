@@ -10,7 +10,15 @@ from datetime import datetime, timezone
 from unittest.mock import Mock, patch, MagicMock
 from dataclasses import asdict
 
-from scraper import ThreadsScraper, ThreadsPost
+from scraper import ThreadsScraper, ThreadsPost, ScraperConfig, _post_to_dict, _get_config
+
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    """每個測試重新讀取環境變數和帳號列表"""
+    _get_config.cache_clear()
+    yield
+    _get_config.cache_clear()
 
 class TestThreadsPost:
     """測試 ThreadsPost 數據結構"""
@@ -57,6 +65,44 @@ class TestThreadsPost:
         assert isinstance(post_dict, dict)
         assert post_dict['post_id'] == "test123"
         assert post_dict['username'] == "testuser"
+    
+    def test_post_to_dict_matches_asdict(self):
+        """測試淺拷貝轉換與 asdict 結果一致"""
+        post = ThreadsPost(
+            post_id="test123",
+            username="testuser",
+            content="Test content",
+            timestamp="2025-08-05T12:00:00Z",
+            likes=10,
+            replies=5,
+            reposts=2,
+            images=["image.jpg"],
+            post_url="https://threads.com/@testuser/post/test123",
+            scraped_at="2025-08-05T12:30:00Z"
+        )
+        
+        post_dict = _post_to_dict(post)
+        assert post_dict == asdict(post)
+        assert list(post_dict) == list(asdict(post))
+    
+    def test_threads_post_uses_slots(self):
+        """測試 ThreadsPost 使用 __slots__，實例不帶 __dict__"""
+        post = ThreadsPost(
+            post_id="test123",
+            username="testuser",
+            content="Test content",
+            timestamp="2025-08-05T12:00:00Z",
+            likes=10,
+            replies=5,
+            reposts=2,
+            images=[],
+            post_url="https://threads.com/@testuser/post/test123",
+            scraped_at="2025-08-05T12:30:00Z"
+        )
+        
+        assert not hasattr(post, '__dict__')
+        with pytest.raises(AttributeError):
+            post.unknown_field = 1
 
 class TestThreadsScraper:
     """測試 ThreadsScraper 主類"""
@@ -87,6 +133,17 @@ class TestThreadsScraper:
         assert hasattr(scraper, 'ua')
         assert hasattr(scraper, 'session')
     
+    def test_user_agent_pool(self, scraper):
+        """測試 User-Agent 只在初始化時抽取，之後從預先抽取的列表中選擇"""
+        assert scraper._ua_pool
+        
+        with patch.object(type(scraper.ua), 'random', new_callable=lambda: property(Mock(side_effect=AssertionError))):
+            agents = {scraper._random_user_agent() for _ in range(20)}
+            session = scraper._create_session()
+        
+        assert agents <= set(scraper._ua_pool)
+        assert session.headers['User-Agent'] in scraper._ua_pool
+    
     def test_create_session(self, scraper):
         """測試 HTTP 會話創建"""
         session = scraper._create_session()
@@ -143,6 +200,77 @@ class TestThreadsScraper:
         post_id3 = scraper._generate_post_id(username, "Different content", timestamp)
         assert post_id != post_id3
     
+    def test_generate_post_id_xxh128(self, scraper, monkeypatch):
+        """測試 POST_ID_HASH=xxh128 時使用 xxhash，未安裝時退回 md5"""
+        import hashlib
+        
+        scraper.post_id_hash = 'xxh128'
+        with patch('scraper.xxhash', create=True) as mock_xxhash:
+            mock_xxhash.xxh3_128_hexdigest.return_value = 'f' * 32
+            assert scraper._generate_post_id("u", "c", "t") == 'f' * 32
+            mock_xxhash.xxh3_128_hexdigest.assert_called_once_with(b"u_c_t")
+        
+        monkeypatch.setenv('POST_ID_HASH', 'xxh128')
+        with patch('scraper.XXHASH_AVAILABLE', False):
+            fallback = ThreadsScraper()
+        assert fallback.post_id_hash == 'md5'
+        assert fallback._generate_post_id("u", "c", "t") == hashlib.md5(b"u_c_t").hexdigest()
+        fallback.close()
+    
+    def test_graphql_and_selenium_paths_share_post_id(self, scraper):
+        """測試 POST_ID_HASH=md5-canonical 時同一篇貼文經 GraphQL 和 Selenium 解析得到相同的貼文ID"""
+        scraper.post_id_canonical = True
+        graphql_post = scraper._parse_graphql_post({
+            'taken_at': 1754395200,  # 2025-08-05T12:00:00Z
+            'caption': {'text': '測試貼文\n第二行 '},
+            'code': 'ABC123'
+        }, "testuser", "2025-08-05T12:30:00+00:00")
+        selenium_post = scraper._parse_post_record({
+            'content': '測試貼文\n\n第二行',
+            'timestamp': '2025-08-05T12:00:00.000Z',
+            'has_time': True
+        }, "testuser", "2025-08-05T12:30:00+00:00")
+        
+        assert graphql_post.timestamp != selenium_post.timestamp
+        assert graphql_post.post_id == selenium_post.post_id
+        assert scraper._generate_post_id("u", "c", "2025-08-05T20:00:00+08:00") == \
+               scraper._generate_post_id("u", "c", "2025-08-05T12:00:00Z")
+    
+    def test_generate_post_id_default_keeps_raw_hash(self, scraper):
+        """測試預設 md5 仍對原始字串雜湊，既有貼文ID保持不變"""
+        import hashlib
+        
+        timestamp = "2025-08-05T12:00:00.000Z"
+        assert scraper.post_id_canonical is False
+        assert scraper._generate_post_id("u", " a  b ", timestamp) == \
+               hashlib.md5(f"u_ a  b _{timestamp}".encode('utf-8')).hexdigest()
+    
+    def test_config_loaded_once_and_frozen(self, tmp_path, monkeypatch):
+        """測試配置只載入一次且不可修改"""
+        import dataclasses
+        
+        with open(tmp_path / "accounts.json", 'w', encoding='utf-8') as f:
+            json.dump({"accounts": ["user1"]}, f)
+        
+        original_cwd = os.getcwd()
+        os.chdir(tmp_path)
+        try:
+            monkeypatch.setenv('SCRAPER_WORKERS', '2')
+            with patch('scraper.ScraperConfig.from_env', wraps=ScraperConfig.from_env) as mock_from_env:
+                first = ThreadsScraper()
+                second = ThreadsScraper()
+        finally:
+            os.chdir(original_cwd)
+        
+        assert mock_from_env.call_count == 1
+        assert first.accounts == second.accounts == ["user1"]
+        assert first.accounts is not second.accounts
+        assert first.max_workers == 2
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            _get_config().max_workers = 8
+        first.close()
+        second.close()
+    
     def test_random_delay(self, scraper):
         """測試隨機延遲功能"""
         import time
@@ -198,6 +326,17 @@ class TestThreadsScraper:
         assert driver == mock_driver
         mock_driver.execute_script.assert_called()
     
+    @patch('scraper.webdriver.Chrome')
+    def test_init_driver_blocks_images_and_fonts(self, mock_chrome, scraper):
+        """測試 WebDriver 阻擋圖片和字型下載"""
+        scraper._init_driver()
+        
+        options = mock_chrome.call_args.kwargs['options']
+        prefs = options.experimental_options['prefs']
+        assert prefs['profile.managed_default_content_settings.images'] == 2
+        assert prefs['profile.managed_default_content_settings.fonts'] == 2
+        assert '--blink-settings=imagesEnabled=false' in options.arguments
+    
     def test_parse_post_element_success(self, scraper):
         """測試成功解析貼文元素"""
         # 創建模擬的貼文元素
@@ -242,6 +381,11 @@ class TestThreadsScraper:
         assert post.replies == 5
         assert post.reposts == 5
         assert len(post.images) == 1
+        
+        # 傳入本批抓取時間時直接沿用
+        with patch.object(scraper, '_extract_interaction_count', return_value=5):
+            batch_post = scraper._parse_post_element(mock_element, "testuser", "2025-08-05T13:00:00+00:00")
+        assert batch_post.scraped_at == "2025-08-05T13:00:00+00:00"
     
     def test_parse_post_element_no_content(self, scraper):
         """測試解析沒有內容的貼文元素"""
@@ -253,7 +397,72 @@ class TestThreadsScraper:
         post = scraper._parse_post_element(mock_element, "testuser")
         assert post is None
     
-    def test_save_to_json(self, scraper, tmp_path):
+    def test_extract_post_records_single_script_call(self, scraper):
+        """測試以單次腳本呼叫取得貼文欄位並解析"""
+        mock_driver = Mock()
+        mock_driver.execute_script.return_value = [
+            {'content': 'Record content', 'timestamp': '2025-08-05T12:00:00Z', 'has_time': True,
+             'like': '12 likes', 'reply': '3 replies', 'repost': None,
+             'images': ['https://cdninstagram.com/a.jpg']},
+            {'content': None, 'timestamp': None, 'has_time': True,
+             'like': None, 'reply': None, 'repost': None, 'images': []},
+            {'content': 'No time', 'timestamp': None, 'has_time': False,
+             'like': None, 'reply': None, 'repost': None, 'images': []},
+        ]
+        
+        records = scraper._extract_post_records(mock_driver)
+        assert mock_driver.execute_script.call_count == 1
+        
+        posts = [scraper._parse_post_record(r, "testuser", "2025-08-05T13:00:00+00:00") for r in records]
+        assert posts[1] is None
+        assert posts[2] is None
+        post = posts[0]
+        assert post.content == "Record content"
+        assert post.timestamp == "2025-08-05T12:00:00Z"
+        assert (post.likes, post.replies, post.reposts) == (12, 3, 0)
+        assert post.images == ['https://cdninstagram.com/a.jpg']
+        assert post.scraped_at == "2025-08-05T13:00:00+00:00"
+    
+    def test_wait_for_more_posts(self, scraper):
+        """測試滾動後等到貼文數增加即返回，逾時返回 None"""
+        mock_driver = Mock()
+        mock_driver.execute_script.return_value = 8
+        assert scraper._wait_for_more_posts(mock_driver, 5) == 8
+        
+        scraper.scroll_wait_timeout = 0.1
+        mock_driver.execute_script.return_value = 5
+        assert scraper._wait_for_more_posts(mock_driver, 5) is None
+    
+    def test_driver_wait_cached_per_driver(self, scraper):
+        """測試同一 driver 的 WebDriverWait 只建立一次，換 driver 後重建"""
+        driver_a, driver_b = Mock(), Mock()
+        
+        wait = scraper._driver_wait(driver_a, 2)
+        assert scraper._driver_wait(driver_a, 2) is wait
+        assert scraper._driver_wait(driver_a, 30) is not wait
+        assert scraper._driver_wait(driver_b, 2) is not wait
+    
+    def test_posts_share_username_and_url_strings(self, scraper):
+        """測試同一用戶的貼文共享用戶名和貼文URL字串"""
+        username = "testuser"
+        records = [
+            {'content': f'content {i}', 'timestamp': '2025-08-05T12:00:00Z', 'has_time': True,
+             'like': None, 'reply': None, 'repost': None, 'images': []}
+            for i in range(2)
+        ]
+        
+        posts = [scraper._parse_post_record(r, username, "s") for r in records]
+        
+        assert posts[0].post_url is posts[1].post_url
+        assert posts[0].post_url == f"{scraper.base_url}/@testuser/post/placeholder"
+    
+    def test_extract_post_records_script_failure(self, scraper):
+        """測試腳本執行失敗時返回 None 以改用逐個元素解析"""
+        mock_driver = Mock()
+        mock_driver.execute_script.side_effect = Exception("script error")
+        assert scraper._extract_post_records(mock_driver) is None
+    
+    def test_save_to_json(self, scraper, tmp_path, monkeypatch):
         """測試保存數據到 JSON 文件"""
         posts = [
             ThreadsPost(
@@ -283,7 +492,7 @@ class TestThreadsScraper:
         ]
         
         # 切換到臨時目錄
-        os.chdir(tmp_path)
+        monkeypatch.chdir(tmp_path)
         
         filename = "test_posts.json"
         scraper.save_to_json(posts, filename)
@@ -299,7 +508,7 @@ class TestThreadsScraper:
         assert loaded_data[0]['post_id'] == "test1"
         assert loaded_data[1]['post_id'] == "test2"
     
-    def test_save_to_json_auto_filename(self, scraper, tmp_path):
+    def test_save_to_json_auto_filename(self, scraper, tmp_path, monkeypatch):
         """測試自動生成文件名"""
         posts = [
             ThreadsPost(
@@ -316,7 +525,7 @@ class TestThreadsScraper:
             )
         ]
         
-        os.chdir(tmp_path)
+        monkeypatch.chdir(tmp_path)
         
         with patch('scraper.datetime') as mock_datetime:
             mock_datetime.now.return_value.strftime.return_value = "20250805_123000"
@@ -325,6 +534,61 @@ class TestThreadsScraper:
         expected_filename = "threads_posts_20250805_123000.json"
         assert os.path.exists(expected_filename)
     
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_save_to_jsonl_gz(self, scraper, tmp_path, use_orjson, monkeypatch):
+        """測試以 gzip 壓縮的 JSON Lines 格式保存"""
+        import gzip
+        
+        posts = [
+            ThreadsPost(f"test{i}", "user1", f"中文內容 {i}", "2025-08-05T12:00:00Z",
+                        i, 0, 0, [], "https://threads.com/@user1/post/x", "2025-08-05T12:30:00Z")
+            for i in range(3)
+        ]
+        
+        monkeypatch.chdir(tmp_path)
+        scraper.output_format = 'jsonl.gz'
+        
+        with patch('scraper.ORJSON_AVAILABLE', use_orjson):
+            result = scraper._save_json_result(posts)
+        
+        assert result['saved'] is True
+        assert result['filename'].endswith('.jsonl.gz')
+        with gzip.open(result['filename'], 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert [record['post_id'] for record in records] == ["test0", "test1", "test2"]
+        assert records[0]['content'] == "中文內容 0"
+    
+    def test_save_to_json_orjson_matches_stdlib(self, scraper, tmp_path, monkeypatch):
+        """測試 orjson 與標準庫 json 輸出的內容一致（含中文）"""
+        posts = [
+            ThreadsPost(
+                post_id="test1",
+                username="user1",
+                content="中文內容 😀",
+                timestamp="2025-08-05T12:00:00Z",
+                likes=10,
+                replies=5,
+                reposts=2,
+                images=["image.jpg"],
+                post_url="https://threads.com/@user1/post/test1",
+                scraped_at="2025-08-05T12:30:00Z"
+            )
+        ]
+        
+        monkeypatch.chdir(tmp_path)
+        
+        scraper.save_to_json(posts, "fast.json")
+        with patch('scraper.ORJSON_AVAILABLE', False):
+            scraper.save_to_json(posts, "stdlib.json")
+        
+        with open("fast.json", 'r', encoding='utf-8') as f:
+            fast_text = f.read()
+        with open("stdlib.json", 'r', encoding='utf-8') as f:
+            stdlib_text = f.read()
+        
+        assert "中文內容" in fast_text
+        assert json.loads(fast_text) == json.loads(stdlib_text)
+    
     @patch('scraper.ThreadsScraper._extract_post_data_selenium')
     def test_scrape_user_posts_success(self, mock_extract, scraper):
         """測試成功爬取用戶貼文"""
@@ -350,27 +614,141 @@ class TestThreadsScraper:
         assert posts[0].username == "testuser"
         mock_extract.assert_called_once_with("testuser")
     
+    def test_extract_post_data_http(self, scraper):
+        """測試透過 GraphQL 接口抓取並解析貼文"""
+        scraper.graphql_doc_id = "123"
+        profile = Mock(text='..."user_id":"42"...["LSD",[],{"token":"abc"}]...')
+        graphql = Mock(content=json.dumps({'data': {'mediaData': {'threads': [
+            {'thread_items': [{'post': {
+                'taken_at': 1722859200,
+                'code': 'C0de',
+                'caption': {'text': 'Hello Threads'},
+                'like_count': 12,
+                'text_post_app_info': {'direct_reply_count': 3, 'repost_count': 1},
+                'image_versions2': {'candidates': [{'url': 'https://cdn/img.jpg'}]}
+            }}]},
+            {'thread_items': [{'post': {'caption': None}}]}
+        ]}}}).encode())
+        
+        with patch.object(scraper.session, 'get', return_value=profile), \
+             patch.object(scraper.session, 'post', return_value=graphql) as mock_post:
+            posts = scraper._extract_post_data_http("testuser")
+        
+        assert len(posts) == 1
+        post = posts[0]
+        assert (post.content, post.likes, post.replies, post.reposts) == ('Hello Threads', 12, 3, 1)
+        assert post.images == ['https://cdn/img.jpg']
+        assert post.post_url.endswith('/@testuser/post/C0de')
+        assert post.timestamp == '2024-08-05T12:00:00+00:00'
+        assert post.post_id == scraper._generate_post_id('testuser', 'Hello Threads', post.timestamp)
+        
+        sent = mock_post.call_args.kwargs
+        assert json.loads(sent['data']['variables']) == {'userID': '42'}
+        assert sent['headers']['X-FB-LSD'] == 'abc'
+    
+    def test_extract_post_data_http_respects_post_limit(self, scraper):
+        """測試 GraphQL 路徑與 Selenium 路徑共用 MAX_POSTS_PER_ACCOUNT 上限"""
+        scraper.graphql_doc_id = "123"
+        profile = Mock(text='..."user_id":"42"...["LSD",[],{"token":"abc"}]...')
+        graphql = Mock(content=json.dumps({'data': {'mediaData': {'threads': [
+            {'thread_items': [{'post': {'taken_at': 1722859200 + i, 'caption': {'text': f'post {i}'}}}]}
+            for i in range(3)
+        ]}}}).encode())
+        
+        with patch.object(scraper.session, 'get', return_value=profile), \
+             patch.object(scraper.session, 'post', return_value=graphql), \
+             patch('scraper.MAX_POSTS_PER_ACCOUNT', 2):
+            posts = scraper._extract_post_data_http("testuser")
+        
+        assert [post.content for post in posts] == ['post 0', 'post 1']
+    
+    def test_scrape_user_posts_falls_back_to_selenium(self, scraper):
+        """測試 GraphQL 抓取失敗時退回 Selenium"""
+        scraper.graphql_doc_id = "123"
+        fallback_posts = [ThreadsPost("p1", "testuser", "c", "t", 0, 0, 0, [], "u", "s")]
+        
+        with patch.object(scraper.session, 'get', side_effect=Exception("403")), \
+             patch.object(scraper, '_extract_post_data_selenium', return_value=fallback_posts) as mock_selenium:
+            posts = scraper.scrape_user_posts("testuser")
+        
+        assert posts == fallback_posts
+        mock_selenium.assert_called_once_with("testuser")
+    
     @patch('scraper.ThreadsScraper.scrape_user_posts')
     def test_scrape_all_accounts(self, mock_scrape_user, scraper):
         """測試爬取所有帳號"""
         # 設置測試帳號
         scraper.accounts = ["user1", "user2"]
         
-        # 模擬每個用戶的貼文
-        mock_scrape_user.side_effect = [
-            [ThreadsPost("post1", "user1", "content1", "2025-08-05T12:00:00Z", 
-                        10, 5, 2, [], "url1", "2025-08-05T12:30:00Z")],
-            [ThreadsPost("post2", "user2", "content2", "2025-08-05T13:00:00Z", 
-                        20, 10, 5, [], "url2", "2025-08-05T13:30:00Z")]
-        ]
+        # 模擬每個用戶的貼文（並行爬取時調用順序不固定，按用戶名返回）
+        user_posts = {
+            "user1": [ThreadsPost("post1", "user1", "content1", "2025-08-05T12:00:00Z", 
+                                  10, 5, 2, [], "url1", "2025-08-05T12:30:00Z")],
+            "user2": [ThreadsPost("post2", "user2", "content2", "2025-08-05T13:00:00Z", 
+                                  20, 10, 5, [], "url2", "2025-08-05T13:30:00Z")]
+        }
+        mock_scrape_user.side_effect = lambda username: user_posts[username]
         
-        all_posts = scraper.scrape_all_accounts()
+        with patch.object(scraper, '_random_delay'):
+            all_posts = scraper.scrape_all_accounts()
         
         assert len(all_posts) == 2
         assert all_posts[0].username == "user1"
         assert all_posts[1].username == "user2"
         assert mock_scrape_user.call_count == 2
     
+    def test_scrape_and_save_per_account(self, scraper, tmp_path, monkeypatch):
+        """測試每個帳號完成後即提交數據庫寫入，最後保存一個 JSON 文件"""
+        scraper.accounts = ["user1", "user2", "user3"]
+        user_posts = {
+            "user1": [ThreadsPost("post1", "user1", "c1", "t", 0, 0, 0, [], "u", "s")],
+            "user2": [],
+            "user3": [ThreadsPost("post3", "user3", "c3", "t", 0, 0, 0, [], "u", "s")]
+        }
+        scraper.db_manager = Mock()
+        scraper.db_manager.insert_new_posts_only.return_value = {'success': 1, 'failure': 0, 'skipped': 0}
+        
+        monkeypatch.chdir(tmp_path)
+        with patch.object(scraper, 'scrape_user_posts', side_effect=lambda username: user_posts[username]), \
+             patch.object(scraper, '_random_delay'):
+            posts, results = scraper.scrape_and_save()
+        
+        assert [post.post_id for post in posts] == ["post1", "post3"]
+        saved_batches = [call.args[0] for call in scraper.db_manager.insert_new_posts_only.call_args_list]
+        assert sorted(batch[0].post_id for batch in saved_batches) == ["post1", "post3"]
+        assert results['database'] == {'success': 2, 'failure': 0, 'skipped': 0}
+        assert results['json']['saved'] is True
+        with open(results['json']['filename'], 'r', encoding='utf-8') as f:
+            assert [item['post_id'] for item in json.load(f)] == ["post1", "post3"]
+    
+    def test_scrape_all_accounts_parallel_drivers(self, scraper):
+        """測試並行爬取時每個執行緒使用獨立的 driver，結束後關閉並保持帳號順序"""
+        import threading
+        
+        scraper.accounts = [f"user{i}" for i in range(6)]
+        scraper.max_workers = 3
+        created = []
+        barrier = threading.Barrier(3)
+        
+        def fake_extract(username):
+            driver = scraper.driver
+            if driver is None:
+                driver = Mock()
+                created.append(driver)
+                scraper.driver = driver
+                barrier.wait(timeout=5)
+            return [ThreadsPost(f"post_{username}", username, "c", "t", 0, 0, 0, [], "u", "s")]
+        
+        with patch.object(scraper, '_extract_post_data_selenium', side_effect=fake_extract), \
+             patch.object(scraper, '_random_delay'):
+            all_posts = scraper.scrape_all_accounts()
+        
+        assert [post.username for post in all_posts] == scraper.accounts
+        assert len(created) == 3
+        for driver in created:
+            driver.quit.assert_called_once()
+        assert scraper._drivers == {}
+    
     def test_close(self, scraper):
         """測試資源清理"""
         mock_driver = Mock()
@@ -383,6 +761,25 @@ class TestThreadsScraper:
         
         mock_driver.quit.assert_called_once()
         mock_session.close.assert_called_once()
+    
+    def test_crashed_driver_is_replaced(self, scraper):
+        """測試 Chrome Driver 失效時被丟棄，下一次爬取建立新實例"""
+        from selenium.common.exceptions import WebDriverException
+        
+        crashed = Mock()
+        crashed.get.side_effect = WebDriverException("invalid session id")
+        scraper.driver = crashed
+        
+        with pytest.raises(WebDriverException):
+            scraper._extract_post_data_selenium("testuser")
+        
+        crashed.quit.assert_called_once()
+        assert scraper.driver is None
+        assert scraper._drivers == {}
+        
+        fresh = Mock()
+        with patch('scraper.webdriver.Chrome', return_value=fresh):
+            assert scraper._init_driver() is fresh
 
 class TestScraperIntegration:
     """爬蟲集成測試"""
@@ -20,10 +20,9 @@ class TestTrendAnalysis:
     """趨勢分析測試類"""
     
     @pytest.fixture
-    def processor(self):
+    def processor(self, jieba_ready):
         """創建測試用的數據處理器"""
         with patch('process_data.SupabaseManager'), \
-             patch('process_data.jieba'), \
              patch('process_data.SentimentIntensityAnalyzer'):
             processor = DataProcessor()
             return processor
@@ -86,6 +85,91 @@ class TestTrendAnalysis:
         
         return pd.DataFrame(data)
     
+    def test_tokenize_cached(self, processor):
+        """測試分詞結果緩存，同一文本只分詞一次"""
+        with patch('process_data.jieba.cut') as mock_cut:
+            mock_cut.side_effect = lambda text: ['ai', '的', '技術', '發展', 'x']
+            
+            first = processor._tokenize('AI的技術發展')
+            second = processor._tokenize('AI的技術發展')
+        
+        assert first == second == 'ai 技術 發展'
+        assert mock_cut.call_count == 1
+        assert processor._tokenize('') == ''
+        assert processor._tokenize(None) == ''
+    
+    def test_tokenize_many_parallel(self, processor):
+        """測試超過門檻時透過進程池分詞並寫入緩存"""
+        import process_data
+        
+        class FakePool:
+            def __init__(self, processes, initializer, initargs):
+                initializer(*initargs)
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc):
+                return False
+            def map(self, func, items, chunksize=1):
+                return [func(item) for item in items]
+        
+        texts = ['AI技術發展', '投資理財', 'AI技術發展', '']
+        with patch('process_data.Pool', FakePool), \
+             patch('process_data.TOKENIZE_PARALLEL_MIN', 2), \
+             patch('process_data.TOKENIZE_WORKERS', 4), \
+             patch('process_data.jieba.cut') as mock_cut:
+            mock_cut.side_effect = lambda text: text.split('技') if '技' in text else [text]
+            tokens = processor._tokenize_many(texts)
+        
+        assert tokens == ['ai 術發展', '投資理財', 'ai 術發展', '']
+        assert mock_cut.call_count == 2
+        assert processor._token_cache['AI技術發展'] == 'ai 術發展'
+        assert process_data._worker_stopwords is processor.chinese_stopwords
+    
+    def test_extract_keywords_with_pretokenized(self, processor):
+        """測試傳入已分詞文本時不再調用分詞"""
+        processor.keyword_min_freq = 1
+        texts = ['AI技術', 'AI應用', '投資理財']
+        tokens = ['ai 技術', 'ai 應用', '投資 理財 2024']
+        
+        with patch('process_data.jieba.cut') as mock_cut:
+            keywords = processor.extract_keywords(texts, max_features=10, tokens=tokens)
+        
+        mock_cut.assert_not_called()
+        words = [kw for kw, _ in keywords]
+        assert 'ai' in words
+        assert '2024' not in words
+        # 分數為原生 float，可直接序列化
+        assert all(type(score) is float for _, score in keywords)
+    
+    def test_extract_keywords_hashed_matches_tfidf(self, processor):
+        """測試特徵雜湊提取的關鍵詞分數與 TfidfVectorizer 一致"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        processor.keyword_min_freq = 2
+        tokens = ['ai 技術 發展', 'ai 技術 應用', '投資 理財 市場', '投資 市場 分析',
+                  'ai 投資', '美食 旅行', '美食 分享']
+        
+        keywords = processor.extract_keywords(tokens, max_features=100, tokens=tokens)
+        
+        reference = TfidfVectorizer(max_features=100, min_df=2, max_df=0.8, ngram_range=(1, 2),
+                                    tokenizer=str.split, token_pattern=None)
+        matrix = reference.fit_transform(tokens)
+        expected = dict(zip(reference.get_feature_names_out(), np.asarray(matrix.mean(axis=0)).ravel()))
+        
+        assert sorted(word for word, _ in keywords) == sorted(expected)
+        for word, score in keywords:
+            assert score == pytest.approx(expected[word], rel=1e-6)
+    
+    def test_top_k_indices_matches_stable_sort(self):
+        """測試部分排序結果與完整穩定排序一致（含同分）"""
+        from process_data import _top_k_indices
+        
+        scores = np.array([0.2, 0.5, 0.1, 0.5, 0.3, 0.2, 0.5, 0.0])
+        expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        
+        for k in (1, 3, 5, 8, 20):
+            assert _top_k_indices(scores, k).tolist() == expected[:k]
+    
     def test_extract_keywords_basic(self, processor):
         """測試基本關鍵詞提取功能"""
         texts = [
@@ -241,6 +325,29 @@ class TestTrendAnalysis:
         assert isinstance(momentum, (int, float))
         assert momentum >= 0
     
+    def test_build_keyword_postings(self, processor):
+        """測試倒排索引與子字串比對結果一致"""
+        contents = ['AI技術發展', '美食分享', None, 'ai應用與AI晶片', '']
+        postings = processor._build_keyword_postings(contents, ['ai', '美食', '旅遊'])
+        
+        assert postings == {'ai': [0, 3], '美食': [1], '旅遊': []}
+        
+        expected = pd.Series(contents).str.contains('ai', case=False, na=False)
+        assert list(expected[expected].index) == postings['ai']
+    
+    def test_day_buckets_match_local_dates(self):
+        """測試整數日序號與 .dt.date 的日期一致"""
+        from process_data import _day_buckets
+        
+        timestamps = pd.Series(pd.to_datetime(
+            ['2024-01-02T23:30:00+08:00', '2024-01-03T00:10:00+08:00', None]
+        ))
+        buckets = _day_buckets(timestamps)
+        
+        expected = [(d - datetime(1970, 1, 1).date()).days for d in timestamps.dt.date[:2]]
+        assert buckets[:2].tolist() == expected
+        assert buckets[2] < 0
+    
     def test_sentiment_analysis_for_posts(self, processor):
         """測試貼文情感分析"""
         # 測試正面內容